@@ -0,0 +1,299 @@
+# backend/bot/backfill.py
+import os
+import json
+import time
+import logging
+import argparse
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .candle_archive import CandleArchive, get_candle_archive
+from .rate_limiter import KrakenRateLimiter, get_rate_limiter
+from .strategy import DEMO_ALLOCATIONS
+
+TRADE_COLUMNS = ['price', 'volume', 'time']
+
+
+def trades_to_candles(trades: pd.DataFrame, interval: int = 5, start: Optional[int] = None,
+                      end: Optional[int] = None, previous_close: Optional[float] = None) -> pd.DataFrame:
+    """Resample trades (price, volume, time) into OHLC candles in the Kraken OHLC layout.
+
+    Given the previous close, intervals without trades from `start` up to
+    `end` (or the last trade) get a flat candle at that close with zero
+    volume, so the history has no holes.
+    """
+    step = interval * 60
+    price = trades['price'].to_numpy(dtype=float)
+    volume = trades['volume'].to_numpy(dtype=float)
+    bucket = (trades['time'].to_numpy(dtype=float) // step * step).astype(np.int64)
+    frame = pd.DataFrame({'price': price, 'volume': volume, 'value': price * volume, 'bucket': bucket})
+    grouped = frame.groupby('bucket', sort=True)
+    candles = pd.DataFrame({
+        'open': grouped['price'].first(),
+        'high': grouped['price'].max(),
+        'low': grouped['price'].min(),
+        'close': grouped['price'].last(),
+        'volume': grouped['volume'].sum(),
+        'value': grouped['value'].sum(),
+        'count': grouped.size()
+    })
+    candles['vwap'] = (candles['value'] / candles['volume'].where(candles['volume'] > 0)).fillna(candles['close'])
+
+    if previous_close is not None and start is not None:
+        first = start
+    elif not candles.empty:
+        first = int(candles.index[0])
+    else:
+        return pd.DataFrame(columns=list(CandleArchive.COLUMNS))
+    last = end - step if end is not None else (int(candles.index[-1]) if not candles.empty else first - step)
+    candles = candles.reindex(np.arange(first, last + step, step, dtype=np.int64))
+    if candles['close'].isna().any():
+        candles['close'] = candles['close'].ffill()
+        if previous_close is not None:
+            candles['close'] = candles['close'].fillna(previous_close)
+        for col in ['open', 'high', 'low', 'vwap']:
+            candles[col] = candles[col].fillna(candles['close'])
+        candles[['volume', 'count']] = candles[['volume', 'count']].fillna(0)
+
+    candles['time'] = candles.index
+    return candles.dropna(subset=['close']).reset_index(drop=True)[list(CandleArchive.COLUMNS)]
+
+
+class HistoryBackfill:
+    """Resumable download of deep candle history into the CandleArchive.
+
+    Kraken's OHLC endpoint only serves the most recent 720 candles, whatever
+    `since` asks for, so older history is rebuilt from the Trades endpoint:
+    its `since` cursor pages forward through every trade, 1000 at a time, and
+    each page is resampled into candles. Each run first archives the recent
+    OHLC window, then fills every hole between the requested start and now.
+
+    Requests go through the process-wide KrakenRateLimiter and back off when
+    Kraken reports the limit was exceeded. After every page the trade cursor
+    is checkpointed to a JSON file and the finished candles are archived, so
+    an interrupted backfill resumes where it stopped, and ranges that have
+    been scanned are not requested again.
+    """
+
+    def __init__(self, api, archive: Optional[CandleArchive] = None, checkpoint_path: Optional[str] = None,
+                 rate_limiter: Optional[KrakenRateLimiter] = None, max_retries: int = 5):
+        self.logger = logging.getLogger("HistoryBackfill")
+        self.api = api
+        self.archive = archive or get_candle_archive()
+        self.interval = self.archive.interval
+        self.step = self.interval * 60
+        self.checkpoint_path = checkpoint_path or os.path.join(self.archive.root, f"backfill_{self.interval}m.json")
+        self.rate_limiter = rate_limiter or get_rate_limiter()
+        self.rate_limiter.attach(api)
+        self.max_retries = max_retries
+        self.requests = 0
+        self._lock = threading.Lock()
+        self.checkpoint = self._load_checkpoint()
+
+    # Checkpoint
+
+    def _load_checkpoint(self) -> Dict[str, dict]:
+        try:
+            with open(self.checkpoint_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            self.logger.error(f"Error reading backfill checkpoint {self.checkpoint_path}: {str(e)}")
+            return {}
+
+    def _save_checkpoint(self):
+        os.makedirs(os.path.dirname(self.checkpoint_path) or '.', exist_ok=True)
+        tmp_path = self.checkpoint_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.checkpoint, f, indent=2)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    # Requests
+
+    def _query(self, method: str, params: dict) -> dict:
+        """One public request; waits out rate limit errors, raises on anything else"""
+        for attempt in range(self.max_retries + 1):
+            self.requests += 1
+            response = self.api.query_public(method, params)
+            errors = response.get('error') or []
+            if not errors:
+                return response['result']
+            message = ', '.join(errors)
+            if 'Rate limit' not in message and 'call frequency' not in message:
+                raise RuntimeError(f"Kraken {method} failed: {message}")
+            backoff = min(60.0, 2.0 ** attempt)
+            self.rate_limiter.penalize('public', backoff)
+        raise RuntimeError(f"Kraken {method} still rate limited after {self.max_retries} retries")
+
+    @staticmethod
+    def _rows(result: dict) -> list:
+        # The result is keyed by Kraken's own pair name, which may differ from the request
+        return next((rows for key, rows in result.items() if key != 'last'), [])
+
+    def fetch_ohlc(self, symbol: str) -> pd.DataFrame:
+        """The most recent candles Kraken serves, including the one still forming"""
+        rows = self._rows(self._query('OHLC', {'pair': symbol, 'interval': self.interval}))
+        frame = pd.DataFrame(rows, columns=['time', 'open', 'high', 'low', 'close', 'vwap', 'volume', 'count'])
+        return frame.apply(pd.to_numeric, errors='coerce')
+
+    def fetch_trades(self, symbol: str, since: str) -> Tuple[pd.DataFrame, str]:
+        """Up to 1000 trades after the `since` cursor and the cursor of the next page"""
+        result = self._query('Trades', {'pair': symbol, 'since': since})
+        rows = [row[:3] for row in self._rows(result)]
+        trades = pd.DataFrame(rows, columns=TRADE_COLUMNS).apply(pd.to_numeric, errors='coerce')
+        return trades.dropna().astype(float), str(result.get('last', since))
+
+    # Backfill
+
+    def _closed_before(self) -> int:
+        """Start of the candle that is still forming"""
+        return int(time.time()) // self.step * self.step
+
+    def _gaps(self, symbol: str, start: int, end: int, scanned_from: Optional[int]) -> List[Tuple[int, int]]:
+        """Missing [from, to) candle ranges of symbol between start and end"""
+        times = self.archive.read_arrays(symbol, start, end)['time']
+        if not len(times):
+            return [(start, end)] if scanned_from is None or scanned_from > start else []
+        gaps = []
+        if times[0] > start and (scanned_from is None or scanned_from > start):
+            gaps.append((start, int(times[0])))
+        holes = np.flatnonzero(np.diff(times) > self.step)
+        gaps.extend((int(times[i]) + self.step, int(times[i + 1])) for i in holes)
+        if times[-1] + self.step < end:
+            gaps.append((int(times[-1]) + self.step, end))
+        return gaps
+
+    def _previous_close(self, symbol: str, before: int) -> Optional[float]:
+        closes = self.archive.read_arrays(symbol, before - self.step, before)['close']
+        return float(closes[-1]) if len(closes) else None
+
+    def _fill_gap(self, symbol: str, gap_start: int, gap_end: int, cursor: Optional[str] = None,
+                  stop_event: Optional[threading.Event] = None, max_requests: Optional[int] = None) -> bool:
+        """Rebuild candles in [gap_start, gap_end) from trades; False if stopped before the end"""
+        state = self.checkpoint.setdefault(symbol, {})
+        if cursor is None:
+            cursor = str(gap_start * 10 ** 9 - 1)
+            next_bucket = gap_start
+        else:
+            # Everything before the interval the cursor points into is archived
+            next_bucket = max(gap_start, (int(cursor) + 1) // 10 ** 9 // self.step * self.step)
+        previous_close = self._previous_close(symbol, next_bucket)
+        carry = pd.DataFrame(columns=TRADE_COLUMNS, dtype=float)
+
+        while True:
+            if (stop_event is not None and stop_event.is_set()) or \
+                    (max_requests is not None and self.requests >= max_requests):
+                return False
+
+            trades, last = self.fetch_trades(symbol, cursor)
+            exhausted = trades.empty or last == cursor
+            if not carry.empty:
+                trades = pd.concat([carry, trades], ignore_index=True)
+            buckets = trades['time'].to_numpy(dtype=float) // self.step * self.step
+            done = exhausted or buckets[-1] >= gap_end
+            if done:
+                # Close the gap, or as much of it as has closed when the trades ran out
+                end = min(gap_end, self._closed_before())
+                complete = buckets < end
+                carry = carry.iloc[0:0]
+            else:
+                # The newest interval may continue on the next page
+                end = None
+                complete = buckets < buckets[-1]
+                carry = trades[~complete]
+
+            candles = trades_to_candles(trades[complete & (buckets >= gap_start)], self.interval,
+                                        start=next_bucket, end=end, previous_close=previous_close)
+            if not candles.empty:
+                self.archive.append(symbol, candles)
+                next_bucket = int(candles['time'].iloc[-1]) + self.step
+                previous_close = float(candles['close'].iloc[-1])
+
+            # Resuming re-reads the trades of the interval that is still open
+            cursor = last
+            state.update({'gap': [gap_start, gap_end],
+                          'cursor': str(int(carry['time'].iloc[0] * 10 ** 9) - 1) if not carry.empty else last})
+            with self._lock:
+                self._save_checkpoint()
+            if done:
+                break
+
+        state.pop('gap', None)
+        state.pop('cursor', None)
+        return True
+
+    def backfill_symbol(self, symbol: str, days: float, stop_event: Optional[threading.Event] = None,
+                        max_requests: Optional[int] = None) -> int:
+        """Fill the archive of symbol back to `days` ago; returns the number of candles added"""
+        before = self.archive.count(symbol)
+        end = self._closed_before()
+        start = (end - int(days * 24 * 60 * 60)) // self.step * self.step
+        state = self.checkpoint.setdefault(symbol, {})
+
+        recent = self.fetch_ohlc(symbol)
+        self.archive.append(symbol, recent[recent['time'] < end])
+
+        if 'gap' in state and 'cursor' in state:
+            gap_start, gap_end = state['gap']
+            self.logger.info(f"Resuming {symbol} backfill at {pd.to_datetime(int(state['cursor']), unit='ns')}")
+            if not self._fill_gap(symbol, gap_start, gap_end, state['cursor'], stop_event, max_requests):
+                return self.archive.count(symbol) - before
+
+        for gap_start, gap_end in self._gaps(symbol, start, end, state.get('scanned_from')):
+            self.logger.info(f"Backfilling {symbol} from {pd.to_datetime(gap_start, unit='s')} "
+                             f"to {pd.to_datetime(gap_end, unit='s')}")
+            if not self._fill_gap(symbol, gap_start, gap_end, None, stop_event, max_requests):
+                return self.archive.count(symbol) - before
+
+        # Nothing traded before the earliest archived candle; do not ask again
+        state['scanned_from'] = min(start, state.get('scanned_from', start))
+        with self._lock:
+            self._save_checkpoint()
+        return self.archive.count(symbol) - before
+
+    def run(self, symbols, days: float, stop_event: Optional[threading.Event] = None,
+            max_requests: Optional[int] = None) -> Dict[str, int]:
+        """Backfill every symbol in turn; max_requests bounds the requests of this run"""
+        added = {}
+        for symbol in symbols:
+            if (stop_event is not None and stop_event.is_set()) or \
+                    (max_requests is not None and self.requests >= max_requests):
+                break
+            try:
+                added[symbol] = self.backfill_symbol(symbol, days, stop_event, max_requests)
+                self.logger.info(f"Backfill of {symbol}: {added[symbol]} candles added, "
+                                 f"{self.archive.count(symbol)} archived")
+            except Exception as e:
+                self.logger.error(f"Error backfilling {symbol}: {str(e)}")
+        return added
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Download deep candle history into the candle archive")
+    parser.add_argument('symbols', nargs='*', help="Pairs to backfill (default: the demo symbols)")
+    parser.add_argument('--days', type=float, default=90)
+    parser.add_argument('--interval', type=int, default=5)
+    parser.add_argument('--archive-dir', help="Candle archive directory (default: CANDLE_ARCHIVE_DIR or candle_archive)")
+    parser.add_argument('--checkpoint', help="Progress file (default: inside the archive directory)")
+    parser.add_argument('--max-requests', type=int, help="Stop after this many requests; rerun to continue")
+    parser.add_argument('--api-url', help="Kraken REST base URL, e.g. a local kraken_stub")
+    args = parser.parse_args()
+
+    import krakenex
+
+    logging.basicConfig(level=logging.INFO)
+    api = krakenex.API()
+    if args.api_url:
+        api.uri = args.api_url
+    backfill = HistoryBackfill(api, get_candle_archive(args.interval, args.archive_dir), args.checkpoint)
+    added = backfill.run(args.symbols or list(DEMO_ALLOCATIONS), args.days, max_requests=args.max_requests)
+    for symbol, count in added.items():
+        print(f"{symbol}: {count} candles added, {backfill.archive.count(symbol)} archived")
+
+
+if __name__ == "__main__":
+    main()
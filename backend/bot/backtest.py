@@ -0,0 +1,271 @@
+# backend/bot/backtest.py
+import math
+import logging
+import argparse
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from .candle_store import CandleStore
+from .candle_archive import get_candle_archive
+from .indicator_engine import IndicatorEngine
+from .position_triggers import ExitRules, PositionTriggerEngine, ma_reversals
+from .strategy import (DEMO_ALLOCATIONS, INITIAL_CAPITAL, MARKET_CONDITIONS, ORDER_REQUIREMENTS,
+                       DEFAULT_ORDER_REQUIREMENTS, StrategyParams, market_condition_frame, market_cycles,
+                       position_size, signal_frame)
+
+_ACTIONS = {'hold': 0, 'buy': 1, 'sell': 2}
+
+
+class BacktestResult:
+    """Equity curve, trade list and summary metrics of one backtest run"""
+
+    def __init__(self, equity: pd.DataFrame, trades: pd.DataFrame, metrics: dict):
+        self.equity = equity
+        self.trades = trades
+        self.metrics = metrics
+
+    def to_dict(self) -> dict:
+        return {
+            'metrics': self.metrics,
+            'trades': self.trades.to_dict('records'),
+            'equity': [
+                {'timestamp': ts.isoformat(), 'equity': row.equity, 'drawdown': row.drawdown}
+                for ts, row in self.equity.iterrows()
+            ]
+        }
+
+
+class Backtester:
+    """Replays stored candles through the demo bot's signal, sizing and exit rules.
+
+    Indicators, market cycles, signals, market condition checks and MA
+    reversals are precomputed for every candle with vectorized pandas/numpy
+    code from indicator_engine, strategy and position_triggers, the same
+    functions DemoKrakenBot evaluates on its latest candle. Only the
+    path-dependent part, fills against the demo balance and the exit engine,
+    runs bar by bar, mirroring execute_trade_demo and the demo position monitor.
+
+    Differences from live demo trading: fills happen at the candle close, the
+    bid/ask spread check is skipped (there are no historical quotes), the
+    demo's low balance reset is not applied, and a buy signal for a symbol
+    that already has an open position is ignored instead of replacing it.
+    """
+
+    def __init__(self, symbols: Optional[Dict[str, float]] = None, initial_balance: float = INITIAL_CAPITAL,
+                 interval: int = 5, exit_rules: Optional[ExitRules] = None, max_position_size: float = 0.15,
+                 min_position_value: float = 10.0, min_zusd_balance: float = 5.0,
+                 market_conditions: Optional[dict] = None, params: Optional[StrategyParams] = None):
+        self.logger = logging.getLogger("Backtester")
+        self.symbols = dict(symbols or DEMO_ALLOCATIONS)
+        self.initial_balance = initial_balance
+        self.interval = interval
+        self.exit_rules = exit_rules or ExitRules()
+        self.max_position_size = max_position_size
+        self.min_position_value = min_position_value
+        self.min_zusd_balance = min_zusd_balance
+        self.market_conditions = market_conditions or MARKET_CONDITIONS
+        self.params = params or StrategyParams()
+        self.engine = IndicatorEngine()
+
+    @staticmethod
+    def load_candles(symbols, data_dir: str = 'candle_data', interval: int = 5,
+                     archive_dir: Optional[str] = None) -> Dict[str, pd.DataFrame]:
+        """Read the archived and persisted candles of each symbol"""
+        store = CandleStore(None, interval=interval, data_dir=data_dir,
+                            archive=get_candle_archive(interval, archive_dir))
+        candles = {}
+        for symbol in symbols:
+            frame = store.history(symbol)
+            if frame.empty:
+                frame = store.stored_frame(symbol)
+            if not frame.empty:
+                candles[symbol] = frame
+        return candles
+
+    def precompute(self, candles: pd.DataFrame) -> pd.DataFrame:
+        """Indicators and market cycles of one symbol's full history; independent of the params"""
+        candles = candles.sort_values('time')
+        candles = candles[~candles['time'].duplicated(keep='last')].reset_index(drop=True)
+        df = self.engine.compute(candles)
+        df['market_cycle'] = market_cycles(df)
+        return df
+
+    def prepare(self, symbol: str, df: pd.DataFrame) -> pd.DataFrame:
+        """Per-candle rule outcomes of a precomputed history under this run's params"""
+        cycles = df['market_cycle'] if 'market_cycle' in df.columns else None
+        signals = signal_frame(df, symbol, params=self.params, cycles=cycles)
+        conditions = market_condition_frame(df, self.market_conditions)
+        return pd.DataFrame({
+            'time': df['time'].astype('int64'),
+            'close': df['close'].astype(float),
+            'action': signals['action'].map(_ACTIONS),
+            'confidence': signals['confidence'],
+            'tradable': conditions['tradable'],
+            'reversal': ma_reversals(df)
+        })
+
+    def run(self, candles: Dict[str, pd.DataFrame]) -> BacktestResult:
+        """Simulate demo trading over the given {symbol: candles} history"""
+        return self.run_precomputed({symbol: self.precompute(frame) for symbol, frame in candles.items()
+                                     if symbol in self.symbols and not frame.empty})
+
+    def run_precomputed(self, histories: Dict[str, pd.DataFrame]) -> BacktestResult:
+        """Simulate demo trading over histories already passed through precompute()"""
+        symbols = [symbol for symbol in self.symbols if symbol in histories and not histories[symbol].empty]
+        if not symbols:
+            raise ValueError("No candles to backtest")
+        frames = {symbol: self.prepare(symbol, histories[symbol]) for symbol in symbols}
+
+        # Align every symbol to one timeline; a symbol without a candle at a
+        # timestamp keeps its last close for valuation and does not trade
+        timeline = np.unique(np.concatenate([frame['time'].to_numpy() for frame in frames.values()]))
+        times = pd.to_datetime(timeline, unit='s').to_pydatetime()
+        columns = {}
+        for symbol, frame in frames.items():
+            aligned = frame.set_index('time').reindex(timeline)
+            has_bar = aligned['close'].notna().to_numpy()
+            columns[symbol] = (
+                has_bar.tolist(),
+                aligned['close'].ffill().to_numpy().tolist(),
+                aligned['action'].fillna(0).astype(int).to_numpy().tolist(),
+                aligned['confidence'].fillna(0.5).to_numpy().tolist(),
+                aligned['tradable'].astype('boolean').fillna(False).to_numpy(dtype=bool).tolist(),
+                aligned['reversal'].astype('boolean').fillna(False).to_numpy(dtype=bool).tolist()
+            )
+
+        self.cash = self.initial_balance
+        self.positions: Dict[str, dict] = {}
+        self.trades: List[dict] = []
+        self.triggers = PositionTriggerEngine(self.exit_rules)
+        equity_curve = np.empty(len(timeline))
+        balance_curve = np.empty(len(timeline))
+
+        for i, now in enumerate(times):
+            # Signals, as in the demo trading loop
+            for symbol in symbols:
+                has_bar, close, action, confidence, tradable, _ = columns[symbol]
+                if not has_bar[i] or action[i] == 0 or not tradable[i]:
+                    continue
+                signal = {'action': 'buy' if action[i] == 1 else 'sell', 'confidence': confidence[i]}
+                if signal['action'] == 'sell' and symbol not in self.positions:
+                    continue
+                if signal['action'] == 'buy' and symbol in self.positions:
+                    continue
+                self._fill(symbol, signal, close[i], now, self._equity(columns, i), 'signal')
+
+            # Exits, as in the demo position monitor
+            for symbol in list(self.positions):
+                _, close, _, _, _, reversal = columns[symbol]
+                self.triggers.track(symbol, self.positions[symbol], now=now)
+                self.triggers.set_reversal(symbol, reversal[i], now)
+                for _, reason in self.triggers.on_price(symbol, close[i], now):
+                    self._fill(symbol, {'action': 'sell', 'confidence': 1.0}, close[i], now,
+                               self._equity(columns, i), reason)
+
+            balance_curve[i] = self.cash
+            equity_curve[i] = self._equity(columns, i)
+
+        equity = pd.DataFrame({'balance': balance_curve, 'equity': equity_curve},
+                              index=pd.DatetimeIndex(times, name='timestamp'))
+        equity['drawdown'] = equity['equity'] / equity['equity'].cummax() - 1
+        trades = pd.DataFrame(self.trades)
+        return BacktestResult(equity, trades, self._metrics(equity, trades))
+
+    def _equity(self, columns: dict, i: int) -> float:
+        equity = self.cash
+        for symbol, position in self.positions.items():
+            equity += position['volume'] * columns[symbol][1][i]
+        return equity
+
+    def _fill(self, symbol: str, signal: dict, price: float, now: datetime, equity: float, reason: str):
+        """Apply one demo trade; same sizing and minimum volume rules as execute_trade_demo"""
+        size = position_size(self.cash, equity, self.symbols[symbol], signal, self.max_position_size,
+                             self.min_zusd_balance, self.min_position_value)
+        if size <= 0 or not price or price <= 0:
+            return
+        min_volume = ORDER_REQUIREMENTS.get(symbol, DEFAULT_ORDER_REQUIREMENTS)['min_vol']
+
+        if signal['action'] == 'sell':
+            position = self.positions.get(symbol)
+            if position is None or position['volume'] < min_volume:
+                return
+            quantity = position['volume']
+            sale_value = quantity * price
+            entry_value = quantity * position['entry_price']
+            profit_loss = sale_value - entry_value
+            self.cash += sale_value
+            del self.positions[symbol]
+            self.triggers.untrack(symbol)
+            self.trades.append({
+                'timestamp': now, 'symbol': symbol, 'type': 'sell', 'price': price,
+                'quantity': quantity, 'value': sale_value, 'balance_after': self.cash,
+                'profit_loss': profit_loss, 'pnl_percentage': profit_loss / entry_value * 100,
+                'entry_price': position['entry_price'], 'reason': reason
+            })
+            return
+
+        quantity = size / price
+        if quantity < min_volume:
+            quantity = min_volume
+            size = quantity * price
+        if size > self.cash:
+            return
+        self.cash -= size
+        self.positions[symbol] = {'volume': quantity, 'entry_price': price, 'entry_time': now, 'high_price': price}
+        self.trades.append({
+            'timestamp': now, 'symbol': symbol, 'type': 'buy', 'price': price,
+            'quantity': quantity, 'value': size, 'balance_after': self.cash,
+            'profit_loss': 0.0, 'pnl_percentage': 0.0, 'entry_price': price, 'reason': reason
+        })
+
+    def _metrics(self, equity: pd.DataFrame, trades: pd.DataFrame) -> dict:
+        final_equity = float(equity['equity'].iloc[-1])
+        returns = equity['equity'].pct_change().dropna()
+        bars_per_year = 365 * 24 * 60 / self.interval
+        std = returns.std()
+        sharpe = float(returns.mean() / std * math.sqrt(bars_per_year)) if std and std > 0 else 0.0
+        sells = trades[trades['type'] == 'sell'] if not trades.empty else trades
+        return {
+            'initial_balance': self.initial_balance,
+            'final_equity': final_equity,
+            'total_pnl': final_equity - self.initial_balance,
+            'total_return_pct': (final_equity / self.initial_balance - 1) * 100,
+            'max_drawdown_pct': float(equity['drawdown'].min()) * 100,
+            'sharpe': sharpe,
+            'trades': len(trades),
+            'closed_trades': len(sells),
+            'win_rate': float((sells['profit_loss'] > 0).mean()) if len(sells) else 0.0,
+            'open_positions': len(self.positions),
+            'start': equity.index[0].isoformat(),
+            'end': equity.index[-1].isoformat(),
+            'bars': len(equity)
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest the demo strategy on stored candles")
+    parser.add_argument('--data-dir', default='candle_data')
+    parser.add_argument('--archive-dir', help="Candle archive directory (default: CANDLE_ARCHIVE_DIR or candle_archive)")
+    parser.add_argument('--interval', type=int, default=5)
+    parser.add_argument('--balance', type=float, default=INITIAL_CAPITAL)
+    parser.add_argument('--trades', help="Write the trade list to this CSV file")
+    parser.add_argument('--equity', help="Write the equity curve to this CSV file")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    backtester = Backtester(initial_balance=args.balance, interval=args.interval)
+    candles = Backtester.load_candles(backtester.symbols, args.data_dir, args.interval, args.archive_dir)
+    result = backtester.run(candles)
+    for key, value in result.metrics.items():
+        print(f"{key}: {value}")
+    if args.trades:
+        result.trades.to_csv(args.trades, index=False)
+    if args.equity:
+        result.equity.to_csv(args.equity)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+# backend/bot/candle_archive.py
+import os
+import re
+import shutil
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+_MONTH = re.compile(r'^\d{4}-\d{2}$')
+_VERSION = re.compile(r'^v(\d+)$')
+
+
+class CandleArchive:
+    """Columnar on-disk OHLCV history, partitioned by symbol and month.
+
+    Each partition is a directory ``<root>/<symbol>/<interval>m/<YYYY-MM>/``
+    whose ``CURRENT`` file names the live version, a subdirectory ``v<N>/``
+    holding one ``.npy`` file per column (int64 times and counts, float64
+    prices and volumes), sorted by time. Reads memory-map the column files, so
+    loading history costs no parsing and a range within one month is a
+    zero-copy view. Versions are never modified: a write rebuilds the months it
+    touches as new versions and atomically swaps each pointer, so a reader
+    opens every column of one version. The previous version is kept until the
+    next write, and a reader that still loses the race retries on the new one.
+    """
+
+    COLUMNS = {
+        'time': np.int64,
+        'open': np.float64,
+        'high': np.float64,
+        'low': np.float64,
+        'close': np.float64,
+        'vwap': np.float64,
+        'volume': np.float64,
+        'count': np.int64
+    }
+
+    def __init__(self, root: str = 'candle_archive', interval: int = 5):
+        self.logger = logging.getLogger("CandleArchive")
+        self.root = root
+        self.interval = interval
+        self._lock = threading.Lock()
+
+    def _symbol_dir(self, symbol: str) -> str:
+        return os.path.join(self.root, symbol, f"{self.interval}m")
+
+    def _partition_path(self, symbol: str, month: str) -> str:
+        return os.path.join(self._symbol_dir(symbol), month)
+
+    @staticmethod
+    def _current_version(path: str) -> Optional[str]:
+        """Name of the live version of a partition; '' for the flat layout of older archives"""
+        try:
+            with open(os.path.join(path, 'CURRENT'), encoding='utf-8') as f:
+                return f.read().strip()
+        except FileNotFoundError:
+            return '' if os.path.exists(os.path.join(path, 'time.npy')) else None
+
+    @staticmethod
+    def month_of(times: np.ndarray) -> np.ndarray:
+        """YYYY-MM partition key of each epoch-second timestamp"""
+        return np.datetime_as_string(np.asarray(times, dtype='int64').astype('datetime64[s]'), unit='M')
+
+    def symbols(self) -> List[str]:
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(name for name in os.listdir(self.root) if os.path.isdir(self._symbol_dir(name)))
+
+    def months(self, symbol: str) -> List[str]:
+        """Published partitions of symbol, oldest first"""
+        directory = self._symbol_dir(symbol)
+        if not os.path.isdir(directory):
+            return []
+        return sorted(name for name in os.listdir(directory)
+                      if _MONTH.match(name) and self._current_version(os.path.join(directory, name)) is not None)
+
+    def read_partition(self, symbol: str, month: str, mmap: bool = True,
+                       retries: int = 3) -> Dict[str, np.ndarray]:
+        """Column arrays of one month, all from one version; memory-mapped read-only unless mmap is False"""
+        path = self._partition_path(symbol, month)
+        mode = 'r' if mmap else None
+        for attempt in range(retries):
+            version = self._current_version(path)
+            if version is None:
+                raise FileNotFoundError(f"No archived partition {path}")
+            try:
+                return {col: np.load(os.path.join(path, version, f"{col}.npy"), mmap_mode=mode)
+                        for col in self.COLUMNS}
+            except FileNotFoundError:
+                # The version was retired while we opened it; the pointer has moved on
+                if attempt == retries - 1:
+                    raise
+
+    def read_arrays(self, symbol: str, start: Optional[float] = None,
+                    end: Optional[float] = None) -> Dict[str, np.ndarray]:
+        """Column arrays for start <= time < end; views of the mapped files when one month covers the range"""
+        months = self.months(symbol)
+        if start is not None:
+            first = str(self.month_of([int(start)])[0])
+            months = [month for month in months if month >= first]
+        if end is not None:
+            last = str(self.month_of([int(end)])[0])
+            months = [month for month in months if month <= last]
+
+        parts = []
+        for month in months:
+            columns = self.read_partition(symbol, month)
+            times = columns['time']
+            lo = int(np.searchsorted(times, start, 'left')) if start is not None else 0
+            hi = int(np.searchsorted(times, end, 'left')) if end is not None else len(times)
+            if hi > lo:
+                parts.append({col: values[lo:hi] for col, values in columns.items()})
+
+        if not parts:
+            return {col: np.empty(0, dtype=dtype) for col, dtype in self.COLUMNS.items()}
+        if len(parts) == 1:
+            return parts[0]
+        return {col: np.concatenate([part[col] for part in parts]) for col in self.COLUMNS}
+
+    def read(self, symbol: str, start: Optional[float] = None, end: Optional[float] = None) -> pd.DataFrame:
+        """Candles for start <= time < end in the CandleStore frame layout"""
+        columns = self.read_arrays(symbol, start, end)
+        index = pd.DatetimeIndex(columns['time'].astype('datetime64[s]'), name='dtime')
+        return pd.DataFrame(columns, index=index, copy=False)
+
+    def count(self, symbol: str) -> int:
+        return sum(len(self.read_partition(symbol, month)['time']) for month in self.months(symbol))
+
+    def last_time(self, symbol: str) -> Optional[int]:
+        """Time of the newest archived candle of symbol"""
+        months = self.months(symbol)
+        if not months:
+            return None
+        times = self.read_partition(symbol, months[-1])['time']
+        return int(times[-1]) if len(times) else None
+
+    def time_range(self, symbol: str) -> Optional[Tuple[int, int]]:
+        months = self.months(symbol)
+        if not months:
+            return None
+        first = self.read_partition(symbol, months[0])['time']
+        return int(first[0]), self.last_time(symbol)
+
+    def append(self, symbol: str, candles: pd.DataFrame) -> int:
+        """Merge candles into the archive; a stored candle with the same time is replaced"""
+        if candles is None or candles.empty:
+            return 0
+        frame = pd.DataFrame({
+            col: pd.to_numeric(candles[col], errors='coerce').to_numpy() if col in candles.columns else 0
+            for col in self.COLUMNS
+        }).dropna(subset=['time', 'close'])
+        if frame.empty:
+            return 0
+        frame = frame.fillna(0).astype(self.COLUMNS)
+        frame['month'] = self.month_of(frame['time'].to_numpy())
+
+        with self._lock:
+            self._recover(symbol)
+            for month, rows in frame.groupby('month', sort=True):
+                rows = rows.drop(columns='month')
+                if month in self.months(symbol):
+                    existing = pd.DataFrame(self.read_partition(symbol, month, mmap=False))
+                    rows = pd.concat([existing, rows], ignore_index=True)
+                rows = rows.drop_duplicates('time', keep='last').sort_values('time')
+                self._write_partition(symbol, month, rows)
+        return len(frame)
+
+    def _recover(self, symbol: str):
+        """Clean up after a writer that crashed mid-rewrite; runs under the write lock"""
+        directory = self._symbol_dir(symbol)
+        if not os.path.isdir(directory):
+            return
+        names = set(os.listdir(directory))
+        for name in names:
+            path = os.path.join(directory, name)
+            if name.endswith('.tmp'):
+                shutil.rmtree(path, ignore_errors=True)
+            elif name.endswith('.old'):
+                # Older archives renamed a partition aside before swapping in its rewrite
+                if name[:-4] in names:
+                    shutil.rmtree(path, ignore_errors=True)
+                else:
+                    os.replace(path, os.path.join(directory, name[:-4]))
+
+    def _write_partition(self, symbol: str, month: str, rows: pd.DataFrame):
+        path = self._partition_path(symbol, month)
+        os.makedirs(path, exist_ok=True)
+        current = self._current_version(path)
+        versions = sorted(int(m.group(1)) for m in map(_VERSION.match, os.listdir(path)) if m)
+        version = f"v{versions[-1] + 1 if versions else 1}"
+
+        version_path = os.path.join(path, version)
+        shutil.rmtree(version_path, ignore_errors=True)
+        os.makedirs(version_path)
+        for col, dtype in self.COLUMNS.items():
+            np.save(os.path.join(version_path, f"{col}.npy"), rows[col].to_numpy(dtype=dtype))
+
+        pointer_tmp = os.path.join(path, 'CURRENT.tmp')
+        with open(pointer_tmp, 'w', encoding='utf-8') as f:
+            f.write(version)
+        os.replace(pointer_tmp, os.path.join(path, 'CURRENT'))
+
+        # Keep the version just replaced for readers that resolved it a moment ago
+        for name in os.listdir(path):
+            if _VERSION.match(name) and name not in (version, current):
+                shutil.rmtree(os.path.join(path, name), ignore_errors=True)
+        if current == '':
+            for col in self.COLUMNS:
+                try:
+                    os.remove(os.path.join(path, f"{col}.npy"))
+                except FileNotFoundError:
+                    pass
+
+_shared_archives: Dict[Tuple[str, int], CandleArchive] = {}
+_shared_lock = threading.Lock()
+
+
+def get_candle_archive(interval: int = 5, root: Optional[str] = None) -> CandleArchive:
+    """The process-wide archive for a directory and interval, so concurrent bots share its write lock"""
+    root = root or os.environ.get('CANDLE_ARCHIVE_DIR', 'candle_archive')
+    with _shared_lock:
+        key = (os.path.abspath(root), interval)
+        if key not in _shared_archives:
+            _shared_archives[key] = CandleArchive(root, interval)
+        return _shared_archives[key]
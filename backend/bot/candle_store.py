@@ -0,0 +1,240 @@
+# backend/bot/candle_store.py
+import os
+import time
+import pickle
+import logging
+import threading
+from typing import Dict, Optional
+
+import pandas as pd
+
+
+class CandleStore:
+    """Per-symbol OHLC window kept in memory and on disk.
+
+    Only candles newer than the stored Kraken ``last`` cursor are requested on
+    each refresh; they are cleaned and merged into the existing window instead
+    of re-downloading and re-parsing the whole lookback period every cycle.
+    Closed candles are also appended to an optional CandleArchive, which keeps
+    the history that falls out of the window. REST updates run on worker
+    threads while streamed candles arrive on the event loop, so every merge
+    into a symbol's window happens under that symbol's lock; the exchange
+    request itself is made outside it.
+    """
+
+    NUMERIC_COLUMNS = ['open', 'high', 'low', 'close', 'vwap', 'volume']
+
+    def __init__(self, kraken_api, interval: int = 5, lookback_days: int = 7,
+                 data_dir: str = 'candle_data', archive=None):
+        self.logger = logging.getLogger("CandleStore")
+        self.k = kraken_api
+        self.interval = interval
+        self.lookback_days = lookback_days
+        self.data_dir = data_dir
+        self.frames: Dict[str, pd.DataFrame] = {}
+        self.cursors: Dict[str, int] = {}
+        self.archive = archive
+        self.archived: Dict[str, int] = {}
+        self._locks: Dict[str, threading.RLock] = {}
+        self._locks_lock = threading.Lock()
+
+        try:
+            os.makedirs(self.data_dir, exist_ok=True)
+        except Exception as e:
+            self.logger.error(f"Could not create candle directory {self.data_dir}: {str(e)}")
+
+    def lock(self, symbol: str) -> threading.RLock:
+        """Lock serialising changes to the window of symbol"""
+        with self._locks_lock:
+            if symbol not in self._locks:
+                self._locks[symbol] = threading.RLock()
+            return self._locks[symbol]
+
+    def _path(self, symbol: str) -> str:
+        return os.path.join(self.data_dir, f"{symbol}_{self.interval}m.pkl")
+
+    def _window_start(self) -> float:
+        return time.time() - (self.lookback_days * 24 * 60 * 60)
+
+    def load(self, symbol: str) -> bool:
+        """Load a previously persisted window for symbol, if any"""
+        path = self._path(symbol)
+        if not os.path.exists(path):
+            return False
+        try:
+            with open(path, 'rb') as f:
+                state = pickle.load(f)
+            frame = state['frame']
+            frame = frame[frame['time'] >= self._window_start()]
+            if frame.empty:
+                return False
+            self.frames[symbol] = frame
+            self.cursors[symbol] = int(state['last'])
+            self.logger.info(f"Loaded {len(frame)} stored candles for {symbol}")
+            return True
+        except Exception as e:
+            self.logger.error(f"Error loading stored candles for {symbol}: {str(e)}")
+            return False
+
+    def stored_frame(self, symbol: str) -> pd.DataFrame:
+        """Read the persisted candles for symbol without trimming them to the lookback window"""
+        path = self._path(symbol)
+        if not os.path.exists(path):
+            return pd.DataFrame()
+        try:
+            with open(path, 'rb') as f:
+                return pickle.load(f)['frame']
+        except Exception as e:
+            self.logger.error(f"Error reading stored candles for {symbol}: {str(e)}")
+            return pd.DataFrame()
+
+    def save(self, symbol: str):
+        """Persist the current window and cursor for symbol"""
+        if symbol not in self.frames:
+            return
+        try:
+            tmp_path = self._path(symbol) + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                pickle.dump({'frame': self.frames[symbol], 'last': self.cursors[symbol]}, f,
+                            protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self._path(symbol))
+        except Exception as e:
+            self.logger.error(f"Error saving candles for {symbol}: {str(e)}")
+
+    def _clean(self, ohlc: pd.DataFrame) -> pd.DataFrame:
+        """Apply the numeric conversion and sanity filters to freshly fetched rows only"""
+        ohlc = ohlc.copy()
+        for col in self.NUMERIC_COLUMNS:
+            if col in ohlc.columns:
+                ohlc[col] = pd.to_numeric(ohlc[col], errors='coerce')
+        ohlc['time'] = ohlc['time'].astype('int64')
+
+        ohlc = ohlc.dropna(subset=['close', 'volume'])
+        ohlc = ohlc[(ohlc['close'] > 0) & (ohlc['volume'] > 0)]
+        return ohlc
+
+    def _merge(self, frame: Optional[pd.DataFrame], new_rows: pd.DataFrame) -> pd.DataFrame:
+        """Append new candles, letting a re-fetched candle replace its stored copy"""
+        if frame is None or frame.empty:
+            merged = new_rows
+        elif new_rows.empty:
+            merged = frame
+        else:
+            # The last stored candle is usually the still-forming one; the
+            # refreshed copy from the exchange supersedes it. Streamed candles
+            # newer than the fetched rows are kept.
+            merged = pd.concat([frame[frame['time'] < new_rows['time'].iloc[0]], new_rows,
+                                frame[frame['time'] > new_rows['time'].iloc[-1]]])
+            if not merged['time'].is_monotonic_increasing:
+                merged = merged.sort_values('time')
+            merged = merged[~merged['time'].duplicated(keep='last')]
+
+        return merged[merged['time'] >= self._window_start()]
+
+    def update(self, symbol: str) -> pd.DataFrame:
+        """Fetch candles newer than the stored cursor and merge them into the window"""
+        with self.lock(symbol):
+            if symbol not in self.frames:
+                self.load(symbol)
+            frame = self.frames.get(symbol)
+            cursor = self.cursors.get(symbol)
+        since = cursor if frame is not None and cursor is not None else self._window_start()
+
+        ohlc, last = self.k.get_ohlc_data(symbol, interval=self.interval, since=since, ascending=True)
+        if ohlc is None or ohlc.empty:
+            return frame if frame is not None else pd.DataFrame()
+        new_rows = self._clean(ohlc)
+
+        with self.lock(symbol):
+            # Merge into the current window; candles may have streamed in meanwhile
+            frame = self.frames.get(symbol)
+            # Kraken only serves the most recent 720 candles; if the stored cursor is
+            # older than that, the response no longer connects to our window.
+            first_time = int(ohlc['time'].min())
+            if frame is not None and cursor is not None and first_time > cursor + self.interval * 60:
+                self.logger.info(f"Gap detected in stored candles for {symbol}, resetting window")
+                frame = None
+
+            self.frames[symbol] = self._merge(frame, new_rows)
+            previous_cursor = self.cursors.get(symbol)
+            self.cursors[symbol] = int(last)
+
+            if previous_cursor != self.cursors[symbol]:
+                self.save(symbol)
+            self._archive_closed(symbol)
+            merged = self.frames[symbol]
+
+        self.logger.info(f"Fetched {len(new_rows)} new candles for {symbol} "
+                         f"({len(merged)} in window)")
+        return merged
+
+    def apply_candle(self, symbol: str, candle: dict) -> Optional[pd.DataFrame]:
+        """Merge one streamed candle, possibly still forming, into the window.
+
+        The REST cursor is left alone, so the next update() after a stream
+        outage still fetches everything that was missed.
+        """
+        index = pd.DatetimeIndex([pd.to_datetime(candle['time'], unit='s')], name='dtime')
+        row = self._clean(pd.DataFrame([candle], index=index))
+
+        with self.lock(symbol):
+            if symbol not in self.frames:
+                self.load(symbol)
+            if row.empty:
+                return self.frames.get(symbol)
+
+            frame = self.frames.get(symbol)
+            if frame is not None and not frame.empty:
+                row = row[[col for col in frame.columns if col in row.columns]]
+            self.frames[symbol] = self._merge(frame, row)
+            self._archive_closed(symbol)
+            return self.frames[symbol]
+
+    def _archive_closed(self, symbol: str):
+        """Append candles that have closed since the last call to the archive"""
+        frame = self.frames.get(symbol)
+        if self.archive is None or frame is None or frame.empty:
+            return
+        if symbol not in self.archived:
+            self.archived[symbol] = self.archive.last_time(symbol)
+        closed = frame['time'] <= time.time() - self.interval * 60
+        if self.archived[symbol] is not None:
+            closed &= frame['time'] > self.archived[symbol]
+        if not closed.any():
+            return
+        rows = frame[closed]
+        try:
+            self.archive.append(symbol, rows)
+            self.archived[symbol] = int(rows['time'].iloc[-1])
+        except Exception as e:
+            self.logger.error(f"Error archiving candles for {symbol}: {str(e)}")
+
+    def history(self, symbol: str, lookback_days: Optional[float] = None) -> pd.DataFrame:
+        """Archived candles joined with the current window, e.g. for training and backtests"""
+        with self.lock(symbol):
+            if symbol not in self.frames:
+                self.load(symbol)
+            window = self.frames.get(symbol)
+        if self.archive is None:
+            return window.copy() if window is not None else pd.DataFrame()
+
+        start = time.time() - lookback_days * 24 * 60 * 60 if lookback_days is not None else None
+        if window is not None and start is not None:
+            window = window[window['time'] >= start]
+        end = int(window['time'].iloc[0]) if window is not None and not window.empty else None
+        archived = self.archive.read(symbol, start=start, end=end)
+        if window is None or window.empty:
+            return archived
+        if archived.empty:
+            return window.copy()
+        return pd.concat([archived, window[archived.columns.intersection(window.columns)]])
+
+    def get_window(self, symbol: str, lookback_days: Optional[int] = None) -> pd.DataFrame:
+        """Return a copy of the stored window, optionally trimmed to a shorter lookback"""
+        frame = self.frames.get(symbol)
+        if frame is None or frame.empty:
+            return pd.DataFrame()
+        if lookback_days is not None and lookback_days < self.lookback_days:
+            cutoff = time.time() - (lookback_days * 24 * 60 * 60)
+            frame = frame[frame['time'] >= cutoff]
+        return frame.copy()
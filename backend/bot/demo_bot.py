@@ -8,12 +8,11 @@ import threading
 import pickle
 import joblib
 from sklearn.ensemble import RandomForestClassifier
-import sqlite3
 import pandas as pd
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 from sklearn.preprocessing import StandardScaler
 from scipy import stats
-import ta
 import logging
 from typing import Optional, Dict, List
 import asyncio
@@ -38,6 +37,27 @@ from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
 from sklearn.calibration import CalibratedClassifierCV
 
+from .candle_store import CandleStore
+from .storage import get_storage
+from .market_data_store import MarketDataStore, market_data_rows
+from .candle_archive import get_candle_archive
+from .backfill import HistoryBackfill
+from .demo_state_store import DemoStateStore
+from .ring_buffer import EquityHistory, TradeHistory
+from .demo_journal import DemoJournal, apply_event
+from .exchange_client import AsyncKrakenClient
+from .price_cache import get_price_cache
+from .market_stream import get_market_stream
+from .position_triggers import ExitRules, PositionTriggerEngine, ma_reversal
+from .strategy import (DEMO_ALLOCATIONS, MARKET_CONDITIONS, ORDER_REQUIREMENTS, DEFAULT_ORDER_REQUIREMENTS,
+                       MAX_CONFIRMATIONS, SIGNAL_LOOKBACK, load_tuned_params, market_condition_frame,
+                       market_cycles, position_size, signal_frame)
+from .indicator_engine import IndicatorEngine
+from .feature_pipeline import FeaturePipeline
+from .inference_export import export_serving_model, load_serving_model
+from .model_registry import ModelRegistry
+from .training_worker import TrainingWorker
+
 # Constants for rate limiting and cleanup
 API_CALLS_PER_SECOND = 0.5  # 2 seconds between calls
 CLEANUP_INTERVAL = 3600     # Cleanup every hour
@@ -80,12 +100,18 @@ class TransformerBlock(tf.keras.layers.Layer):
         return self.layernorm2(out1 + ffn_output)
 
 class AITradingEnhancer:
-    def __init__(self):
+    def __init__(self, pipeline: Optional[FeaturePipeline] = None):
+        self.pipeline = pipeline if pipeline is not None else FeaturePipeline()
         self.lstm_model = None
         self.transformer_model = None
         self.feature_scaler = StandardScaler()
         self.sequence_length = 100
         self.n_features = 9 
+        # Per-symbol scaled windows used for inference: {'time': last candle time, 'window': array}
+        self.inference_buffers = {}
+        # Exported serving function used instead of Keras predict when available
+        self.serving_model = None
+        self.export_dir = os.path.join('models', 'ai_serving')
         
     def build_lstm_model(self):
         """Build LSTM model with updated input dimensions"""
@@ -128,38 +154,68 @@ class AITradingEnhancer:
         )
         return model
 
-    def prepare_sequence_data(self, df: pd.DataFrame, sequence_length: int = 100):
+    def export_inference(self, export_dir: Optional[str] = None) -> bool:
+        """Export the trained models as a serving function and switch inference to it"""
+        if self.lstm_model is None or self.transformer_model is None:
+            return False
+        serving_model = export_serving_model(
+            self.lstm_model, self.transformer_model, self.feature_scaler,
+            export_dir or self.export_dir, self.sequence_length, self.n_features
+        )
+        if serving_model is None:
+            return False
+        self.serving_model = serving_model
+        return True
+
+    def load_inference(self, export_dir: Optional[str] = None) -> bool:
+        """Load a previously exported serving function together with its scaler"""
+        serving_model = load_serving_model(export_dir or self.export_dir)
+        if serving_model is None:
+            return False
+        self.serving_model = serving_model
+        self.feature_scaler = serving_model.feature_scaler
+        self.inference_buffers = {}
+        return True
+
+    def prepare_sequence_data(self, df: pd.DataFrame, sequence_length: int = 100, fit_scaler: bool = True):
         """Prepare sequential data with minimal output"""
         try:
-            features = [
-                'returns', 'log_returns', 'rolling_std_20', 'volume_ma_ratio',
-                'rsi', 'macd', 'bb_width', 'adx', 'sma_20'
-            ]
+            features = FeaturePipeline.SEQUENCE_FEATURES
+            if not self.pipeline.has_features(df, features):
+                df = self.pipeline.transform_history(df)
             
-            missing_features = [f for f in features if f not in df.columns]
-            if missing_features:
-                raise ValueError(f"Missing required features: {missing_features}")
+            values = df[features].to_numpy(dtype=np.float64)
+            n_windows = len(values) - sequence_length
+            if n_windows <= 0:
+                raise ValueError("No valid sequences could be created")
             
-            X = []
-            y = []
+            # Window i covers rows i..i+L-1; it is valid when none of them has a NaN
+            nan_rows = np.concatenate(([0], np.cumsum(np.isnan(values).any(axis=1))))
+            valid = (nan_rows[sequence_length:sequence_length + n_windows] - nan_rows[:n_windows]) == 0
+            if not valid.any():
+                raise ValueError("No valid sequences could be created")
             
-            for i in range(len(df) - sequence_length):
-                sequence = df[features].iloc[i:i+sequence_length].values
-                if np.isnan(sequence).any():
-                    continue
-                X.append(sequence)
-                next_return = df['returns'].iloc[i+sequence_length]
-                y.append(1 if next_return > 0 else 0)
+            # Number of valid windows containing each row, so the scaler sees
+            # every row with the same weight as when fitting on stacked windows
+            valid_count = np.concatenate(([0], np.cumsum(valid)))
+            rows = np.arange(len(values))
+            coverage = (valid_count[np.minimum(rows + 1, n_windows)] -
+                        valid_count[np.clip(rows - sequence_length + 1, 0, n_windows)])
+            covered = coverage > 0
             
-            if not X:
-                raise ValueError("No valid sequences could be created")
+            scaled = values.copy()
+            if fit_scaler:
+                self.feature_scaler.fit(values[covered], sample_weight=coverage[covered])
+                # Buffered inference windows were scaled with the old statistics
+                self.inference_buffers = {}
+            scaled[covered] = self.feature_scaler.transform(values[covered])
             
-            X = np.array(X)
-            y = np.array(y)
+            # (windows, sequence_length, features) view over the scaled rows
+            windows = sliding_window_view(scaled, sequence_length, axis=0)[:n_windows].transpose(0, 2, 1)
+            X = windows if valid.all() else windows[valid]
             
-            X_reshaped = X.reshape(-1, X.shape[-1])
-            X_scaled = self.feature_scaler.fit_transform(X_reshaped)
-            X = X_scaled.reshape(X.shape)
+            next_returns = df['returns'].to_numpy(dtype=np.float64)[sequence_length:]
+            y = (next_returns > 0).astype(int)[valid]
             
             return X, y
             
@@ -167,41 +223,134 @@ class AITradingEnhancer:
             print(f"Error preparing sequence data: {str(e)}")
             return np.array([]), np.array([])
 
-    def predict_next_movement(self, current_data: pd.DataFrame) -> dict:
-        """Combine predictions from multiple models"""
+    def fit(self, df: pd.DataFrame, epochs: int = 10, batch_size: int = 32) -> bool:
+        """Build and train both sequence models on df"""
         try:
             # Prepare sequence data
-            X, _ = self.prepare_sequence_data(current_data, self.sequence_length)
-            if len(X) == 0:
-                return {'confidence': 0.5, 'direction': 'hold'}
-            
-            # Get predictions from both models
-            if self.lstm_model is not None and self.transformer_model is not None:
-                lstm_pred = self.lstm_model.predict(X[-1:], verbose=0)[0][0]
-                transformer_pred = self.transformer_model.predict(X[-1:], verbose=0)[0][0]
-                
-                # Combine predictions with weights
-                combined_pred = (lstm_pred * 0.4 + transformer_pred * 0.6)
-                
-                # Convert to confidence score centered around 0.5
-                confidence = 0.5 + (combined_pred - 0.5) * 0.1
-                
-                # Ensure confidence stays in reasonable bounds
-                confidence = max(0.45, min(0.55, confidence))
-                
-                return {
-                    'confidence': confidence,
-                    'direction': 'buy' if combined_pred > 0.5 else 'sell'
-                }
+            X, y = self.prepare_sequence_data(df, self.sequence_length)
+            
+            if len(X) < 1000:  # Minimum required samples
+                print("Insufficient data for AI training")
+                return False
+            
+            # Split data
+            train_size = int(len(X) * 0.8)
+            X_train, X_test = X[:train_size], X[train_size:]
+            y_train, y_test = y[:train_size], y[train_size:]
+            
+            # Build and train LSTM
+            self.lstm_model = self.build_lstm_model()
+            self.lstm_model.fit(
+                X_train, y_train,
+                epochs=epochs,
+                batch_size=batch_size,
+                validation_data=(X_test, y_test),
+                verbose=1
+            )
+            
+            # Build and train Transformer
+            self.transformer_model = self.build_transformer_model()
+            self.transformer_model.fit(
+                X_train, y_train,
+                epochs=epochs,
+                batch_size=batch_size,
+                validation_data=(X_test, y_test),
+                verbose=1
+            )
+            
+            return True
+            
+        except Exception as e:
+            print(f"Error training AI models: {str(e)}")
+            traceback.print_exc()
+            return False
+
+    def prepare_inference_window(self, df: pd.DataFrame, symbol: Optional[str] = None) -> Optional[np.ndarray]:
+        """Build only the latest scaled window, using the scaler frozen at training time"""
+        if not hasattr(self.feature_scaler, 'mean_') or len(df) < self.sequence_length:
+            return None
+        
+        features = FeaturePipeline.SEQUENCE_FEATURES
+        if not self.pipeline.has_features(df, features):
+            df = self.pipeline.transform_history(df.iloc[-(self.sequence_length + 100):])
+        
+        buffer = self.inference_buffers.get(symbol) if symbol is not None else None
+        if buffer is not None and 'time' in df.columns:
+            times = df['time'].to_numpy()
+            pos = int(np.searchsorted(times, buffer['time']))
+            if pos < len(times) and times[pos] == buffer['time']:
+                # Re-scale the last buffered candle (it may have been revised) plus any new ones
+                new_rows = self.feature_scaler.transform(df[features].iloc[pos:].to_numpy(dtype=np.float64))
+                window = np.concatenate([buffer['window'][:-1], new_rows])[-self.sequence_length:]
+            else:
+                buffer = None
+        
+        if buffer is None or 'time' not in df.columns:
+            window = self.feature_scaler.transform(
+                df[features].iloc[-self.sequence_length:].to_numpy(dtype=np.float64))
+        
+        if symbol is not None and 'time' in df.columns:
+            self.inference_buffers[symbol] = {'time': df['time'].iloc[-1], 'window': window}
+        
+        if np.isnan(window).any():
+            return None
+        return window
+    
+    def predict_next_movement(self, current_data: pd.DataFrame, symbol: Optional[str] = None) -> dict:
+        """Combine predictions from multiple models"""
+        return self.predict_batch({symbol: current_data})[symbol]
+    
+    def _combine_predictions(self, lstm_pred: float, transformer_pred: float) -> dict:
+        """Turn the two model outputs into a bounded confidence"""
+        # Combine predictions with weights
+        combined_pred = (lstm_pred * 0.4 + transformer_pred * 0.6)
+        
+        # Convert to confidence score centered around 0.5
+        confidence = 0.5 + (combined_pred - 0.5) * 0.1
+        
+        # Ensure confidence stays in reasonable bounds
+        confidence = max(0.45, min(0.55, confidence))
+        
+        return {
+            'confidence': confidence,
+            'direction': 'buy' if combined_pred > 0.5 else 'sell'
+        }
+    
+    def predict_batch(self, frames: Dict[Optional[str], pd.DataFrame]) -> Dict[Optional[str], dict]:
+        """Predict every symbol with one forward pass per model"""
+        results = {symbol: {'confidence': 0.5, 'direction': 'hold'} for symbol in frames}
+        try:
+            if self.serving_model is None and (self.lstm_model is None or self.transformer_model is None):
+                return results
+            
+            symbols = []
+            windows = []
+            for symbol, df in frames.items():
+                window = self.prepare_inference_window(df, symbol)
+                if window is not None:
+                    symbols.append(symbol)
+                    windows.append(window)
+            if not windows:
+                return results
+            
+            X = np.stack(windows)
+            if self.serving_model is not None:
+                lstm_preds, transformer_preds = self.serving_model.predict(X)
+            else:
+                lstm_preds = self.lstm_model.predict(X, batch_size=len(X), verbose=0)[:, 0]
+                transformer_preds = self.transformer_model.predict(X, batch_size=len(X), verbose=0)[:, 0]
             
-            return {'confidence': 0.5, 'direction': 'hold'}
+            for symbol, lstm_pred, transformer_pred in zip(symbols, lstm_preds, transformer_preds):
+                results[symbol] = self._combine_predictions(lstm_pred, transformer_pred)
+            
+            return results
             
         except Exception as e:
             print(f"Error in AI prediction: {str(e)}")
-            return {'confidence': 0.5, 'direction': 'hold'}
+            return results
         
 class MLModelManager:
-    def __init__(self):
+    def __init__(self, pipeline: Optional[FeaturePipeline] = None):
         self.logger = logging.getLogger("MLModelManager")
         if not self.logger.handlers:
             handler = logging.StreamHandler()
@@ -216,116 +365,17 @@ class MLModelManager:
         self.feature_importance = {}
         self.is_trained = False
         self.min_samples = 100
-        self._feature_names = [
-            'close',
-            'returns',
-            'log_returns',
-            'rolling_std_20',
-            'rolling_std_50',
-            'volume',
-            'volume_ma_ratio',
-            'volume_std',
-            'rsi',
-            'rsi_divergence',
-            'mom_14',
-            'mom_30',
-            'macd',
-            'macd_signal',
-            'macd_diff',
-            'bb_width',
-            'bb_position',
-            'sma_20',
-            'sma_50',
-            'sma_20_50_ratio',
-            'atr',
-            'adx',
-            'adx_pos',
-            'adx_neg'
-        ]
+        self.pipeline = pipeline if pipeline is not None else FeaturePipeline()
+        self._feature_names = FeaturePipeline.FEATURE_COLUMNS.copy()
 
     def get_model_features(self) -> List[str]:
         """Get list of required features in the correct order"""
         return self._feature_names.copy()
 
     def prepare_features(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Create comprehensive features ensuring all required columns exist"""
+        """Select model features, computing them through the shared pipeline if needed"""
         try:
-            # Verify required columns exist
-            required_columns = ['open', 'high', 'low', 'close', 'volume']
-            missing_columns = [col for col in required_columns if col not in df.columns]
-            if missing_columns:
-                raise ValueError(f"Missing required columns: {missing_columns}")
-                
-            # Create copy to avoid modifying original
-            df_copy = df.copy()
-            
-            # Ensure numeric
-            for col in required_columns:
-                df_copy[col] = pd.to_numeric(df_copy[col], errors='coerce')
-                
-            # Remove any rows with NaN values in required columns
-            df_copy = df_copy.dropna(subset=required_columns)
-            
-            # Now create features
-            features = pd.DataFrame(index=df_copy.index)
-            
-            # Price-based features
-            features['close'] = df_copy['close']
-            features['returns'] = df_copy['close'].pct_change()
-            features['log_returns'] = np.log1p(features['returns'])
-            features['rolling_std_20'] = features['returns'].rolling(window=20, min_periods=1).std()
-            features['rolling_std_50'] = features['returns'].rolling(window=50, min_periods=1).std()
-            
-            # Volume features
-            features['volume'] = df_copy['volume']
-            vol_ma = df_copy['volume'].rolling(window=20, min_periods=1).mean()
-            features['volume_ma_ratio'] = df_copy['volume'] / vol_ma
-            features['volume_std'] = df_copy['volume'].rolling(window=20, min_periods=1).std()
-            
-            # Technical indicators
-            # RSI
-            rsi = ta.momentum.RSIIndicator(close=df_copy['close'], window=14)
-            features['rsi'] = rsi.rsi()
-            features['rsi_divergence'] = features['rsi'].diff()
-            
-            # Momentum
-            features['mom_14'] = ta.momentum.ROCIndicator(close=df_copy['close'], window=14).roc()
-            features['mom_30'] = ta.momentum.ROCIndicator(close=df_copy['close'], window=30).roc()
-            
-            # MACD
-            macd = ta.trend.MACD(close=df_copy['close'])
-            features['macd'] = macd.macd()
-            features['macd_signal'] = macd.macd_signal()
-            features['macd_diff'] = macd.macd_diff()
-            
-            # Bollinger Bands
-            bb = ta.volatility.BollingerBands(close=df_copy['close'])
-            features['bb_width'] = (bb.bollinger_hband() - bb.bollinger_lband()) / bb.bollinger_mavg()
-            features['bb_position'] = (df_copy['close'] - bb.bollinger_lband()) / (bb.bollinger_hband() - bb.bollinger_lband())
-            
-            # Moving averages
-            features['sma_20'] = df_copy['close'].rolling(window=20).mean()
-            features['sma_50'] = df_copy['close'].rolling(window=50).mean()
-            features['sma_20_50_ratio'] = features['sma_20'] / features['sma_50']
-            
-            # ATR
-            features['atr'] = ta.volatility.AverageTrueRange(
-                high=df_copy['high'],
-                low=df_copy['low'],
-                close=df_copy['close']
-            ).average_true_range()
-            
-            # ADX
-            adx = ta.trend.ADXIndicator(high=df_copy['high'], low=df_copy['low'], close=df_copy['close'])
-            features['adx'] = adx.adx()
-            features['adx_pos'] = adx.adx_pos()
-            features['adx_neg'] = adx.adx_neg()
-            
-            # Clean up
-            features = features.replace([np.inf, -np.inf], np.nan)
-            features = features.fillna(method='ffill').fillna(method='bfill').fillna(0)
-            
-            return features
+            return self.pipeline.select(df, self._feature_names)
             
         except Exception as e:
             raise ValueError(f"Error preparing features: {str(e)}")
@@ -469,73 +519,87 @@ class MLModelManager:
 
     def predict(self, features: pd.DataFrame) -> dict:
         """Make predictions with scaled confidence matching other indicators"""
+        return self.predict_batch({None: features})[None]
+
+    def _confidence_from_probability(self, buy_prob: float, latest: pd.Series) -> dict:
+        """Map the model's buy probability to a bounded confidence with technical confirmation"""
+        # Center the buy probability around 0.5
+        # Transform from [0, 1] to [0.45, 0.55]
+        final_confidence = 0.5 + (buy_prob - 0.5) * 0.1
+
+        # Add technical confirmation adjustments
+        adjustment = 0
+
+        # RSI confirmation (small adjustment)
+        if 'rsi' in latest:
+            rsi = latest['rsi']
+            if rsi < 30 and buy_prob > 0.5:  # Oversold + bullish signal
+                adjustment += 0.01
+            elif rsi > 70 and buy_prob < 0.5:  # Overbought + bearish signal
+                adjustment -= 0.01
+
+        # MACD confirmation (small adjustment)
+        if 'macd' in latest and 'macd_signal' in latest:
+            macd_diff = latest['macd'] - latest['macd_signal']
+            if macd_diff > 0 and buy_prob > 0.5:  # Positive MACD + bullish
+                adjustment += 0.01
+            elif macd_diff < 0 and buy_prob < 0.5:  # Negative MACD + bearish
+                adjustment -= 0.01
+
+        # Volume confirmation (tiny adjustment)
+        if 'volume_ma_ratio' in latest:
+            vol_ratio = latest['volume_ma_ratio']
+            if vol_ratio > 1.2:  # High volume
+                if buy_prob > 0.5:
+                    adjustment += 0.005
+                else:
+                    adjustment -= 0.005
+
+        # Apply adjustment while maintaining bounds
+        final_confidence = max(0.47, min(0.53, final_confidence + adjustment))
+
+        # Determine action based on confidence
+        if final_confidence > 0.52:
+            action = 'buy'
+        elif final_confidence < 0.47:
+            action = 'sell'
+        else:
+            action = 'hold'
+
+        self.logger.info(f"ML Prediction: raw_prob={buy_prob:.3f}, "
+                        f"adj={adjustment:.3f}, "
+                        f"final={final_confidence:.3f}")
+
+        return {
+            'action': action,
+            'confidence': final_confidence
+        }
+
+    def predict_batch(self, features: Dict[Optional[str], pd.DataFrame]) -> Dict[Optional[str], dict]:
+        """Score the latest row of every symbol with a single predict_proba call"""
+        results = {symbol: {'action': 'hold', 'confidence': 0.5} for symbol in features}
         if not self.is_trained or self.model is None:
-            return {'action': 'hold', 'confidence': 0.5}
+            return results
                 
         try:
-            features_ordered = features[self._feature_names].copy()
-            features_scaled = self.scaler.transform(features_ordered)
-            
-            # Get raw probabilities
-            raw_probs = self.model.predict_proba(features_scaled)[-1]
-            buy_prob = raw_probs[1]
-            
-            # Center the buy probability around 0.5
-            # Transform from [0, 1] to [0.45, 0.55]
-            final_confidence = 0.5 + (buy_prob - 0.5) * 0.1
-            
-            # Add technical confirmation adjustments
-            latest = features.iloc[-1]
-            adjustment = 0
-            
-            # RSI confirmation (small adjustment)
-            if 'rsi' in latest:
-                rsi = latest['rsi']
-                if rsi < 30 and buy_prob > 0.5:  # Oversold + bullish signal
-                    adjustment += 0.01
-                elif rsi > 70 and buy_prob < 0.5:  # Overbought + bearish signal
-                    adjustment -= 0.01
-            
-            # MACD confirmation (small adjustment)
-            if 'macd' in latest and 'macd_signal' in latest:
-                macd_diff = latest['macd'] - latest['macd_signal']
-                if macd_diff > 0 and buy_prob > 0.5:  # Positive MACD + bullish
-                    adjustment += 0.01
-                elif macd_diff < 0 and buy_prob < 0.5:  # Negative MACD + bearish
-                    adjustment -= 0.01
-            
-            # Volume confirmation (tiny adjustment)
-            if 'volume_ma_ratio' in latest:
-                vol_ratio = latest['volume_ma_ratio']
-                if vol_ratio > 1.2:  # High volume
-                    if buy_prob > 0.5:
-                        adjustment += 0.005
-                    else:
-                        adjustment -= 0.005
+            symbols = [symbol for symbol, frame in features.items() if frame is not None and not frame.empty]
+            if not symbols:
+                return results
             
-            # Apply adjustment while maintaining bounds
-            final_confidence = max(0.47, min(0.53, final_confidence + adjustment))
+            # Only the latest row of each symbol is scored
+            latest_rows = pd.concat([features[symbol][self._feature_names].iloc[-1:] for symbol in symbols])
+            features_scaled = self.scaler.transform(latest_rows)
             
-            # Determine action based on confidence
-            if final_confidence > 0.52:
-                action = 'buy'
-            elif final_confidence < 0.47:
-                action = 'sell'
-            else:
-                action = 'hold'
+            # Get raw probabilities
+            raw_probs = self.model.predict_proba(features_scaled)
+            for symbol, probs in zip(symbols, raw_probs):
+                results[symbol] = self._confidence_from_probability(probs[1], features[symbol].iloc[-1])
             
-            self.logger.info(f"ML Prediction: raw_prob={buy_prob:.3f}, "
-                            f"adj={adjustment:.3f}, "
-                            f"final={final_confidence:.3f}")
-                
-            return {
-                'action': action,
-                'confidence': final_confidence
-            }
+            return results
 
         except Exception as e:
             self.logger.error(f"Error in prediction: {str(e)}")
-            return {'action': 'hold', 'confidence': 0.5}
+            return results
 
 class PositionTracker:
     def __init__(self):
@@ -571,92 +635,66 @@ class PositionTracker:
             }
         return None
 
-class DemoRateLimiter:
-    """Specialized rate limiter for demo mode that doesn't use Kraken API"""
-    def __init__(self):
-        self.last_price_fetch = {}
-        self.cache_duration = 5  # Cache prices for 10 seconds
-        self.error_count = 0
-        self.backoff_time = 1.0
-        self.max_backoff = 30.0  # Maximum backoff time in seconds
-
-    def should_fetch_price(self, symbol):
-        """Determine if we should fetch a new price or use cached one"""
-        now = time.time()
-        if symbol not in self.last_price_fetch:
-            self.last_price_fetch[symbol] = {"time": now - self.cache_duration - 1, "price": None}
-            return True
-            
-        time_since_last = now - self.last_price_fetch[symbol]["time"]
-        return time_since_last > self.cache_duration
-        
-    def update_price(self, symbol, price):
-        """Update the cached price"""
-        self.last_price_fetch[symbol] = {"time": time.time(), "price": price}
-        
-    def get_cached_price(self, symbol):
-        """Get cached price if available"""
-        if symbol in self.last_price_fetch:
-            return self.last_price_fetch[symbol]["price"]
-        return None
-
-    async def wait(self):
-        """Add a wait method to handle rate limiting between API calls"""
-        # Simple implementation - just add a small delay between operations
-        await asyncio.sleep(0.5)
-            
-    async def handle_rate_limit_error(self, seconds_exceeded=0):
-        """Handle rate limit exceeded errors with exponential backoff"""
-        # Track errors
-        self.error_count += 1
-        
-        # If we know how much we exceeded by, use that information
-        if seconds_exceeded > 0:
-            # Add a buffer to the exceeded time
-            wait_time = seconds_exceeded + 1.0
-        else:
-            # Exponential backoff with cap
-            self.backoff_time = min(self.max_backoff, self.backoff_time * 2)
-            wait_time = self.backoff_time
-        
-        # Log the backoff
-        logging.info(f"Rate limit exceeded, backing off for {wait_time:.2f} seconds (error #{self.error_count})")
-        
-        # Wait the required time
-        await asyncio.sleep(wait_time)
-        
-    def reset_backoff(self):
-        """Reset backoff after successful operations"""
-        if self.error_count > 0:
-            logging.info(f"Resetting rate limiter after {self.error_count} errors")
-        self.backoff_time = 1.0
-        self.error_count = 0
-        
 class DemoKrakenBot:
     def __init__(self):
         """Initialize the demo trading bot"""
         # Initialize logging first
         self.logger = self._setup_logging()
         self.db_name = 'crypto_trading.db'
+        # Pooled WAL-mode connections shared with every bot using this file
+        self.storage = get_storage(self.db_name)
+        # Market data keyed by (symbol, ts) in day partitions
+        self.market_store = MarketDataStore(self.storage)
         
         try:
-            # Initialize API and rate limiting
+            # Initialize API and rate limiting; request pacing itself is done by
+            # the shared KrakenRateLimiter behind self.exchange
             self.timeframe = 5  # 5-minute intervals
-            self.last_api_call = time.time()
             self.api_retry_delay = 1.0
             self.max_retry_delay = 60
-            # Initialize the demo rate limiter
-            self.demo_rate_limiter = DemoRateLimiter()
-            
-            # Add randomness for jitter in rate limiting
-            import random
-            self.random = random
             
             # Initialize Kraken API - Direct connection to ensure fresh data
             self.kraken = krakenex.API()
             self.k = KrakenAPI(self.kraken, retry=0.5)
             self.running = True
             
+            # Blocking Kraken calls are made from a bounded thread pool
+            self.exchange = AsyncKrakenClient(self.k)
+            
+            # Last prices shared with every other bot in the process
+            self.price_cache = get_price_cache(self.kraken)
+            
+            # Incrementally refreshed OHLC windows per symbol; closed candles
+            # are kept in the columnar archive beyond the window
+            self.candle_store = CandleStore(self.k, interval=self.timeframe,
+                                            archive=get_candle_archive(self.timeframe))
+            
+            # Older history comes from the resumable trades backfill; each start
+            # spends at most BACKFILL_REQUESTS public calls continuing it
+            self.backfill = HistoryBackfill(self.kraken, self.candle_store.archive)
+            self.backfill_requests = int(os.environ.get('BACKFILL_REQUESTS', '60'))
+            
+            # MARKET_DATA_MODE=stream pushes prices and candles over Kraken's
+            # WebSocket feed instead of polling REST every cycle
+            self.market_data_mode = os.environ.get('MARKET_DATA_MODE', 'rest')
+            self.market_stream = get_market_stream(self.timeframe) if self.market_data_mode == 'stream' else None
+            self.stream_synced = {}
+            self.stream_tasks = {}
+            # Guards every read-modify-write of the demo balance, positions and
+            # histories; trades, sizing and stream-driven exits run on pool threads
+            self.ledger_lock = threading.RLock()
+            
+            # Account state
+            self.demo_balance = {'ZUSD': 100000.0}
+            self.demo_positions = {}
+            # Fixed-capacity ring buffers; the oldest entries drop out as new ones arrive
+            self.trade_history = TradeHistory(capacity=100)
+            self.portfolio_history = EquityHistory(capacity=1000, entries=[{
+                'timestamp': datetime.now(),
+                'balance': 100000.0,
+                'equity': 100000.0
+            }])
+            
             # Initialize components
             self.position_tracker = PositionTracker()
             self.init_database()
@@ -664,41 +702,44 @@ class DemoKrakenBot:
             # Initialize ML and AI components
             self.model_manager = MLModelManager()
             self.ai_enhancer = AITradingEnhancer()
+            self.ai_trained = False
+            self.model_name = 'trading_model.joblib'
+            self.training_worker = TrainingWorker()
+            self.training_task = None
             
             # Training state
             self.is_initially_trained = False
             self.training_completed = False
             self.min_training_data = 100
+            self.training_lookback_days = 90  # Archived history used for training
             self.initial_training_hours = 1
             self.start_time = datetime.now()
-            
-            # Account state
-            self.demo_balance = {'ZUSD': 100000.0}
-            self.demo_positions = {}
-            self.trade_history = []
-            self.portfolio_history = [{
-                'timestamp': datetime.now(),
-                'balance': 100000.0,
-                'equity': 100000.0
-            }]
         
             # Trading pairs and allocations
-            self.symbols = {
-                "SOLUSD": 0.20,
-                "AVAXUSD": 0.20,
-                "XRPUSD": 0.20,
-                "XDGUSD": 0.15,
-                "SHIBUSD": 0.10,
-                "PEPEUSD": 0.15
-            }
+            self.symbols = dict(DEMO_ALLOCATIONS)
+            # One registry per bot kind and symbol universe
+            self.model_registry = ModelRegistry(name=f"demo_{os.path.splitext(self.model_name)[0]}",
+                                                symbols=self.symbols)
+            self.price_cache.register(self.symbols)
+                
+            # Per-coin signal thresholds and exit rule overrides; a tuned set
+            # written by param_sweep is loaded with STRATEGY_PARAMS=<json file>
+            self.strategy_params, exit_overrides = load_tuned_params(os.environ.get('STRATEGY_PARAMS'))
                 
             # Risk parameters
             self.max_drawdown = 0.50
             self.trailing_stop_pct = 0.012
+            # Absolute stop/target prices of open positions, checked per tick
+            self.position_triggers = PositionTriggerEngine(ExitRules(**{
+                'trailing_stop_pct': self.trailing_stop_pct,
+                'max_drawdown': self.max_drawdown,
+                **exit_overrides
+            }))
             self.max_trades_per_hour = 2
             self.trade_cooldown = 600
             self.last_trade_time = {}
             self.max_position_size = 0.15
+            self.max_spread_pct = 0.01  # Skip entries when bid/ask is wider than 1%
             self.min_position_value = 10.0
             self.max_total_risk = 0.10
             self.stop_loss_pct = 0.008
@@ -717,13 +758,25 @@ class DemoKrakenBot:
             self.volatility_window = 20
             self.volume_ma_window = 20
             self.prediction_threshold = 0.2
+
+            # Streaming indicator state per symbol
+            self.indicator_engine = IndicatorEngine(
+                sma_short=self.sma_short,
+                sma_long=self.sma_long,
+                rsi_window=self.rsi_period,
+                macd_fast=self.macd_fast,
+                macd_slow=self.macd_slow,
+                macd_signal=self.macd_signal
+            )
+
+            # Indicators are computed once per candle set and shared by the
+            # technical rules and both model families
+            self.feature_pipeline = FeaturePipeline(self.indicator_engine)
+            self.model_manager.pipeline = self.feature_pipeline
+            self.ai_enhancer.pipeline = self.feature_pipeline
             
             # Market conditions
-            self.market_conditions = {
-                'high_volatility': 0.05,
-                'low_liquidity': 1000,
-                'excessive_spread': 0.03
-            }
+            self.market_conditions = dict(MARKET_CONDITIONS)
             
             # Performance tracking
             self.performance_metrics = {}
@@ -818,8 +871,11 @@ class DemoKrakenBot:
     def get_demo_positions(self):
         """Get current demo positions"""
         try:
+            # Copy under the ledger lock; trades may change the positions meanwhile
+            with self.ledger_lock:
+                positions = [(symbol, dict(pos)) for symbol, pos in self.demo_positions.items()]
             formatted_positions = []
-            for symbol, pos in self.demo_positions.items():
+            for symbol, pos in positions:
                 current_price = self.get_latest_price(symbol)
                 if current_price:
                     entry_price = pos['entry_price']
@@ -885,40 +941,15 @@ class DemoKrakenBot:
     def cleanup_old_data(self):
         """Cleanup old data to manage memory usage"""
         try:
-            # Connect to database
-            conn = sqlite3.connect(self.db_name)
-            c = conn.cursor()
-        
-            # Keep only last 7 days of market data
-            c.execute('''DELETE FROM market_data 
-                        WHERE timestamp < date('now', '-7 days')''')
-        
-            # Keep only last 1000 portfolio history entries
-            if len(self.portfolio_history) > 1000:
-                self.portfolio_history = self.portfolio_history[-1000:]
-                
-            # Keep only last 100 trades
-            if len(self.trade_history) > 100:
-                self.trade_history = self.trade_history[-100:]
-        
-            # Update database with cleaned data
-            c.execute('DELETE FROM demo_portfolio_history')
-            for entry in self.portfolio_history:
-                c.execute('INSERT INTO demo_portfolio_history VALUES (?, ?, ?)',
-                         (entry['timestamp'].isoformat(), entry['balance'],
-                          entry['equity']))
-        
-            c.execute('DELETE FROM demo_trade_history')
-            for trade in self.trade_history:
-                c.execute('''INSERT INTO demo_trade_history 
-                            VALUES (?, ?, ?, ?, ?, ?, ?)''',
-                         (trade['timestamp'].isoformat(), trade['symbol'],
-                          trade['type'], trade['price'], trade['quantity'],
-                          trade['value'], trade['balance_after']))
-        
-            # Commit changes and close connection
-            conn.commit()
-            conn.close()
+            # Keep only last 7 days of market data; expired days are dropped whole
+            self.market_store.drop_expired()
+        
+            # The in-memory histories are ring buffers that drop their oldest
+            # entries as they fill; drop the stored rows that fell out of them
+            self.state_store.trim(
+                trades_since=self.trade_history[0]['timestamp'] if self.trade_history else None,
+                portfolio_since=self.portfolio_history[0]['timestamp'] if self.portfolio_history else None
+            )
         
             # Force garbage collection
             import gc
@@ -928,69 +959,51 @@ class DemoKrakenBot:
         except Exception as e:
             self.logger.error(f"Error during cleanup: {str(e)}")
     
-    async def wait_for_api(self, exceeded_by=0):
-        """Improved rate limiting with adaptive delays"""
-        try:
-            current_time = time.time()
-            time_since_last_call = current_time - self.last_api_call
-            
-            # Base delay
-            base_delay = 1.0
-            
-            # Add additional delay if rate limit was exceeded
-            if exceeded_by > 0:
-                self.api_retry_delay = min(self.api_retry_delay * 1.5, self.max_retry_delay)
-                await asyncio.sleep(self.api_retry_delay)
-            else:
-                # Gradually reduce delay if not exceeded
-                self.api_retry_delay = max(1.0, self.api_retry_delay * 0.9)
-            
-            # Add jitter to prevent synchronized calls
-            jitter = random.uniform(0.1, 0.5)
-            
-            # Ensure minimum spacing between calls
-            if time_since_last_call < base_delay:
-                await asyncio.sleep(base_delay - time_since_last_call + jitter)  # Add jitter
-            
-            self.last_api_call = time.time()
-            
-        except Exception as e:
-            self.logger.error(f"Error in API rate limiting: {str(e)}")
-            await asyncio.sleep(1.0)  # Safe default delay
+    def position_prices(self, symbols: Optional[List[str]] = None) -> Dict[str, Optional[float]]:
+        """Latest prices of the open positions; call without holding the ledger lock"""
+        with self.ledger_lock:
+            held = [symbol for symbol in self.demo_positions if symbols is None or symbol in symbols]
+        return {symbol: self.get_latest_price(symbol) for symbol in held}
     
     def calculate_total_equity(self):
         """Calculate total portfolio value including positions"""
         try:
-            equity = self.demo_balance['ZUSD']
-            
-            for symbol, position in self.demo_positions.items():
-                current_price = self.get_latest_price(symbol)
-                if current_price:
-                    position_value = position['volume'] * current_price
-                    equity += position_value
-            
-            return equity
+            prices = self.position_prices()
+            with self.ledger_lock:
+                return self._equity(prices)
         
         except Exception as e:
             self.logger.error(f"Error calculating total equity: {str(e)}")
             return self.demo_balance['ZUSD']
     
+    def _equity(self, prices: Dict[str, Optional[float]]) -> float:
+        """Equity at the given prices, else the last cached ones; call with the ledger lock held"""
+        equity = self.demo_balance['ZUSD']
+        for symbol, position in self.demo_positions.items():
+            current_price = prices.get(symbol) or self.price_cache.peek(symbol)
+            if current_price:
+                equity += position['volume'] * current_price
+        return equity
+    
     def get_portfolio_metrics(self):
         """Get current portfolio performance metrics"""
         try:
-            current_equity = self.calculate_total_equity()
             initial_balance = 100000.0
             
-            metrics = {
-                'current_equity': current_equity,
-                'initial_balance': initial_balance,
-                'total_pnl': current_equity - initial_balance,
-                'pnl_percentage': ((current_equity - initial_balance) / initial_balance) * 100,
-                'positions': self.demo_positions,
-                'balance': self.demo_balance,
-                'trade_history': self.trade_history[-10:],  # Last 10 trades
-                'portfolio_history': self.portfolio_history[-100:]  # Last 100 data points
-            }
+            # One consistent view of the ledger; the copies are safe to serialize later
+            prices = self.position_prices()
+            with self.ledger_lock:
+                current_equity = self._equity(prices)
+                metrics = {
+                    'current_equity': current_equity,
+                    'initial_balance': initial_balance,
+                    'total_pnl': current_equity - initial_balance,
+                    'pnl_percentage': ((current_equity - initial_balance) / initial_balance) * 100,
+                    'positions': {symbol: dict(pos) for symbol, pos in self.demo_positions.items()},
+                    'balance': dict(self.demo_balance),
+                    'trade_history': self.trade_history.records(10),  # Last 10 trades
+                    'portfolio_history': self.portfolio_history.records(100)  # Last 100 data points
+                }
         
             # Log metrics
             self.logger.info("\n=== Portfolio Metrics ===")
@@ -1007,38 +1020,11 @@ class DemoKrakenBot:
                 'total_pnl': 0,
                 'pnl_percentage': 0,
                 'positions': {},
-                'balance': self.demo_balance,
+                'balance': dict(self.demo_balance),
                 'trade_history': [],
                 'portfolio_history': []
             }
             
-    async def wait_for_api(self, exceeded_by=0):
-        """Improved rate limiting with adaptive delays"""
-        try:
-            current_time = time.time()
-            time_since_last_call = current_time - self.last_api_call
-            
-            # Base delay
-            base_delay = 1.0
-            
-            # Add additional delay if rate limit was exceeded
-            if exceeded_by > 0:
-                self.api_retry_delay = min(self.api_retry_delay * 1.5, self.max_retry_delay)
-                await asyncio.sleep(self.api_retry_delay)
-            else:
-                # Gradually reduce delay if not exceeded
-                self.api_retry_delay = max(1.0, self.api_retry_delay * 0.9)
-            
-            # Ensure minimum spacing between calls
-            if time_since_last_call < base_delay:
-                await asyncio.sleep(base_delay - time_since_last_call + 0.1)  # Add small buffer
-            
-            self.last_api_call = time.time()
-            
-        except Exception as e:
-            self.logger.error(f"Error in API rate limiting: {str(e)}")
-            await asyncio.sleep(1.0)  # Safe default delay
-    
     def _setup_logging(self) -> logging.Logger:
         """Set up logging configuration for console output"""
         logger = logging.getLogger("KrakenCryptoBot")
@@ -1078,34 +1064,82 @@ class DemoKrakenBot:
             self.logger.error(f"Error formatting price for {symbol}: {str(e)}")
             return str(price)
     
+    async def start_market_stream(self) -> bool:
+        """Subscribe to the shared WebSocket feed and react to its updates"""
+        if self.market_stream is None:
+            return False
+        self.market_stream.add_listener('ticker', self.on_stream_ticker)
+        self.market_stream.add_listener('candle', self.on_stream_candle)
+        await self.market_stream.subscribe(self.symbols)
+        started = self.market_stream.start() is not None
+        if started:
+            self.logger.info("Streaming market data over WebSocket")
+        return started
+
+    def stream_is_synced(self, symbol: str) -> bool:
+        """Whether the stored window for symbol is complete up to the live feed"""
+        return (self.market_stream is not None and self.market_stream.is_live()
+                and self.stream_synced.get(symbol) == self.market_stream.connection_id)
+
+    def _schedule_stream_task(self, key, coro_fn, *args):
+        """Run at most one background job per key, dropping events while it is busy"""
+        task = self.stream_tasks.get(key)
+        if task is not None and not task.done():
+            return
+        self.stream_tasks[key] = asyncio.ensure_future(coro_fn(*args))
+
+    async def sync_stream_candles(self, symbol: str):
+        """Catch the stored window up over REST once per stream connection"""
+        connection_id = self.market_stream.connection_id
+        try:
+            await self.exchange.call_public('OHLC', self.candle_store.update, symbol)
+            self.stream_synced[symbol] = connection_id
+        except Exception as e:
+            self.logger.error(f"Error syncing candles for {symbol}: {str(e)}")
+
+    def on_stream_candle(self, symbol: str, candle: dict, closed: bool):
+        """Apply a streamed candle and advance the indicators when a candle closes"""
+        if symbol not in self.symbols:
+            return
+        try:
+            self.candle_store.apply_candle(symbol, candle)
+            if self.stream_synced.get(symbol) != self.market_stream.connection_id:
+                self._schedule_stream_task(('sync', symbol), self.sync_stream_candles, symbol)
+            elif closed:
+                window = self.candle_store.get_window(symbol)
+                self.feature_pipeline.transform(symbol, window)
+                self.position_triggers.set_reversal(symbol, ma_reversal(window))
+        except Exception as e:
+            self.logger.error(f"Error applying streamed candle for {symbol}: {str(e)}")
+
+    async def iter_market_data(self, symbols):
+        """Fetch candle windows for all symbols concurrently, yielding each as soon as it arrives"""
+        async def fetch(symbol):
+            return symbol, await self.get_historical_data(symbol)
+        
+        tasks = [asyncio.create_task(fetch(symbol)) for symbol in symbols]
+        try:
+            for next_result in asyncio.as_completed(tasks):
+                yield await next_result
+        finally:
+            for task in tasks:
+                task.cancel()
+
     async def get_historical_data(self, symbol: str, lookback_days: int = 7) -> pd.DataFrame:
         """Fetch and preprocess historical data with proper rate limiting"""
         try:
-            # Wait for rate limiter before making API call
-            await self.wait_for_api()
-            
             try:
-                since = time.time() - (lookback_days * 24 * 60 * 60)
-                ohlc, last = self.k.get_ohlc_data(symbol, interval=self.timeframe, since=since)
+                # Only candles newer than the stored cursor are downloaded; the
+                # exchange client paces the request against the public budget.
+                # While the WebSocket feed is live the window is already current.
+                if not self.stream_is_synced(symbol):
+                    await self.exchange.call_public('OHLC', self.candle_store.update, symbol)
                 
                 # On success, reduce the retry delay gradually
                 self.api_retry_delay = max(1.0, self.api_retry_delay * 0.9)
                 
-                if ohlc is not None and not ohlc.empty:
-                    # Convert all numeric columns to float
-                    numeric_columns = ['open', 'high', 'low', 'close', 'volume']
-                    for col in numeric_columns:
-                        if col in ohlc.columns:
-                            ohlc[col] = pd.to_numeric(ohlc[col], errors='coerce')
-                    
-                    # Remove any rows with NaN values in critical columns
-                    ohlc = ohlc.dropna(subset=['close', 'volume'])
-                    
-                    # Ensure positive values
-                    ohlc = ohlc[ohlc['close'] > 0]
-                    ohlc = ohlc[ohlc['volume'] > 0]
-                    
-                    self.logger.info(f"Successfully fetched {len(ohlc)} rows of data for {symbol}")
+                ohlc = self.candle_store.get_window(symbol, lookback_days)
+                if not ohlc.empty:
                     return ohlc
                     
                 self.logger.warning(f"No historical data returned for {symbol}")
@@ -1123,10 +1157,10 @@ class DemoKrakenBot:
                     self.api_retry_delay = min(self.max_retry_delay, self.api_retry_delay * 2)
                     backoff_time = self.api_retry_delay + seconds_exceeded
                     
-                    self.logger.warning(f"Rate limit exceeded, backing off for {backoff_time:.2f} seconds")
-                    await asyncio.sleep(backoff_time)
+                    # Drain the shared budget so every concurrent fetch backs off, not just this one
+                    self.exchange.rate_limiter.penalize('public', backoff_time)
                     
-                    # Retry recursively after backoff
+                    # Retry recursively; the request waits in the bucket until the backoff has passed
                     return await self.get_historical_data(symbol, lookback_days)
                 else:
                     # For other exceptions, re-raise to be caught by the outer try/except
@@ -1142,8 +1176,9 @@ class DemoKrakenBot:
             if len(df) < self.sma_long:
                 return None
         
-            # Calculate indicators first
-            df = self.calculate_indicators(df)
+            # Calculate indicators first, unless the engine already did
+            if not self.feature_pipeline.has_features(df):
+                df = self.calculate_indicators(df)
             
             latest = df.iloc[-1]
         
@@ -1175,159 +1210,11 @@ class DemoKrakenBot:
     def calculate_indicators(self, df: pd.DataFrame) -> pd.DataFrame:
         """Calculate technical indicators ensuring all required indicators exist"""
         try:
-            df = df.copy()
-            
-            # Basic price features
-            df['returns'] = df['close'].pct_change()
-            df['log_returns'] = np.log1p(df['returns'])
-            df['rolling_std_20'] = df['returns'].rolling(window=20, min_periods=1).std()
-            
-            # Moving averages (ensure these are calculated first)
-            df['sma_short'] = df['close'].rolling(window=self.sma_short, min_periods=1).mean()
-            df['sma_long'] = df['close'].rolling(window=self.sma_long, min_periods=1).mean()
-            df['sma_20'] = df['close'].rolling(window=20, min_periods=1).mean()
-            df['sma_50'] = df['close'].rolling(window=50, min_periods=1).mean()
-            
-            # Volume features
-            vol_ma = df['volume'].rolling(window=20, min_periods=1).mean()
-            df['volume_ma_ratio'] = df['volume'] / vol_ma
-            
-            # RSI
-            rsi_indicator = ta.momentum.RSIIndicator(close=df['close'], window=14)
-            df['rsi'] = rsi_indicator.rsi()
-            
-            # MACD
-            macd_indicator = ta.trend.MACD(close=df['close'])
-            df['macd'] = macd_indicator.macd()
-            df['macd_signal'] = macd_indicator.macd_signal()
-            df['macd_diff'] = macd_indicator.macd_diff()
-            
-            # Bollinger Bands
-            bb_indicator = ta.volatility.BollingerBands(close=df['close'])
-            df['bb_width'] = (bb_indicator.bollinger_hband() - bb_indicator.bollinger_lband()) / bb_indicator.bollinger_mavg()
-            
-            # ADX
-            adx_indicator = ta.trend.ADXIndicator(high=df['high'], low=df['low'], close=df['close'])
-            df['adx'] = adx_indicator.adx()
-            
-            # Additional features for ML model
-            df['rolling_std_50'] = df['returns'].rolling(window=50, min_periods=1).std()
-            df['volume_std'] = df['volume'].rolling(window=20, min_periods=1).std()
-            df['rsi_divergence'] = df['rsi'].diff()
-            df['mom_14'] = ta.momentum.ROCIndicator(close=df['close'], window=14).roc()
-            df['mom_30'] = ta.momentum.ROCIndicator(close=df['close'], window=30).roc()
-            df['adx_pos'] = adx_indicator.adx_pos()
-            df['adx_neg'] = adx_indicator.adx_neg()
-            
-            # Clean up
-            df = df.replace([np.inf, -np.inf], np.nan)
-            df = df.fillna(method='ffill').fillna(method='bfill').fillna(0)
-            
-            return df
+            return self.feature_pipeline.transform_history(df)
             
         except Exception as e:
             raise ValueError(f"Error calculating indicators: {str(e)}")
     
-    def calculate_advanced_indicators(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Calculate advanced technical indicators with proper error handling"""
-        try:
-            # Create a copy to avoid modifying the original
-            df = df.copy()
-            
-            # Ensure we have required columns and they're numeric
-            required_columns = ['high', 'low', 'close', 'volume']
-            for col in required_columns:
-                if col not in df.columns:
-                    raise ValueError(f"Missing required column: {col}")
-                df[col] = pd.to_numeric(df[col], errors='coerce')
-            
-            # Remove any rows with NaN values in required columns
-            df = df.dropna(subset=required_columns)
-            
-            # Calculate SMAs first
-            df['sma_20'] = df['close'].rolling(window=20, min_periods=1).mean()
-            df['sma_50'] = df['close'].rolling(window=50, min_periods=1).mean()
-            df['sma_20_50_ratio'] = df['sma_20'] / df['sma_50']
-            
-            # Price-based features with error handling
-            df['returns'] = df['close'].pct_change().fillna(0)
-            df['log_returns'] = np.log1p(df['returns'])
-            df['rolling_std_20'] = df['returns'].rolling(window=20, min_periods=1).std()
-            df['rolling_std_50'] = df['returns'].rolling(window=50, min_periods=1).std()
-            
-            # Volume features
-            df['volume_sma'] = df['volume'].rolling(window=20, min_periods=1).mean()
-            df['volume_ma_ratio'] = df['volume'] / df['volume_sma'].replace(0, np.nan)
-            df['volume_std'] = df['volume'].rolling(window=20, min_periods=1).std()
-            
-            try:
-                # RSI with error handling
-                rsi_indicator = ta.momentum.RSIIndicator(close=df['close'].replace(0, np.nan), window=14)
-                df['rsi'] = rsi_indicator.rsi()
-                df['rsi_divergence'] = df['rsi'].diff()
-                
-                # Momentum
-                df['mom_14'] = ta.momentum.ROCIndicator(close=df['close'], window=14).roc()
-                df['mom_30'] = ta.momentum.ROCIndicator(close=df['close'], window=30).roc()
-                
-                # MACD
-                macd_indicator = ta.trend.MACD(
-                    close=df['close'],
-                    window_fast=self.macd_fast,
-                    window_slow=self.macd_slow,
-                    window_sign=self.macd_signal
-                )
-                df['macd'] = macd_indicator.macd()
-                df['macd_signal'] = macd_indicator.macd_signal()
-                df['macd_diff'] = macd_indicator.macd_diff()
-                
-                # Bollinger Bands with error handling
-                bb_indicator = ta.volatility.BollingerBands(close=df['close'])
-                bb_high = bb_indicator.bollinger_hband()
-                bb_low = bb_indicator.bollinger_lband()
-                bb_mid = bb_indicator.bollinger_mavg()
-                
-                # Safely calculate BB metrics
-                df['bb_width'] = (bb_high - bb_low) / bb_mid.replace(0, np.nan)
-                df['bb_position'] = (df['close'] - bb_low) / (bb_high - bb_low).replace(0, np.nan)
-                
-                # ATR and ADX with error handling
-                df['atr'] = ta.volatility.AverageTrueRange(
-                    high=df['high'],
-                    low=df['low'],
-                    close=df['close'],
-                    window=14
-                ).average_true_range()
-                
-                adx_indicator = ta.trend.ADXIndicator(
-                    high=df['high'],
-                    low=df['low'],
-                    close=df['close'],
-                    window=14
-                )
-                df['adx'] = adx_indicator.adx()
-                df['adx_pos'] = adx_indicator.adx_pos()
-                df['adx_neg'] = adx_indicator.adx_neg()
-                
-            except Exception as e:
-                self.logger.error(f"Error calculating technical indicators: {str(e)}")
-                raise
-            
-            # Final cleanup
-            df = df.replace([np.inf, -np.inf], np.nan)
-            df = df.fillna(method='ffill').fillna(method='bfill').fillna(0)
-            
-            # Verify all required features are present and non-null
-            for col in df.columns:
-                if df[col].isnull().any():
-                    self.logger.warning(f"Column {col} contains null values after processing")
-            
-            return df
-            
-        except Exception as e:
-            self.logger.error(f"Error calculating advanced indicators: {str(e)}")
-            raise
-        
     def analyze_market_state(self, df: pd.DataFrame) -> dict:
         """Analyze current market state with proper error handling"""
         try:
@@ -1392,56 +1279,8 @@ class DemoKrakenBot:
         """Detect current market cycle with greater sensitivity to avoid risky markets"""
         if len(df) < 50:
             return "unknown"
-            
-        # Calculate key metrics
-        # Price momentum - Look at multiple timeframes
-        momentum_short = df['close'].pct_change(5).iloc[-1]  # 5-period momentum
-        momentum_medium = df['close'].pct_change(20).iloc[-1]  # 20-period momentum
-        
-        # Volatility with more accurate measurement
-        volatility = df['close'].pct_change().rolling(20).std().iloc[-1]
-        
-        # Volume trend with multiple timeframes
-        volume_trend_short = df['volume'].rolling(5).mean().iloc[-1] / df['volume'].rolling(20).mean().iloc[-1]
-        volume_trend_medium = df['volume'].rolling(10).mean().iloc[-1] / df['volume'].rolling(30).mean().iloc[-1]
-        
-        # Moving average relationships
-        ma_cross = df['sma_20'].iloc[-1] / df['sma_50'].iloc[-1]
-        
-        # Check for price breakouts
-        recent_high = df['high'].rolling(20).max().iloc[-1]
-        recent_low = df['low'].rolling(20).min().iloc[-1]
-        price_range = recent_high - recent_low
-        breakout_threshold = price_range * 0.03  # 3% of the range
-        
-        # Determine market cycle with stricter criteria
-        if (momentum_short > 0.01 and momentum_medium > 0.03 and 
-            ma_cross > 1.01 and volume_trend_short > 1.1 and
-            df['close'].iloc[-1] > df['sma_50'].iloc[-1] and
-            volatility < 0.025):
-            return "bull_trend"  # Strong bullish trend
-            
-        elif (momentum_short < -0.01 and momentum_medium < -0.03 and
-              ma_cross < 0.99 and volume_trend_short > 1.1 and
-              df['close'].iloc[-1] < df['sma_50'].iloc[-1]):
-            return "bear_trend"  # Strong bearish trend
-            
-        elif volatility > 0.03:  # Reduced threshold to catch more volatile markets
-            return "high_volatility"  # Choppy/volatile market
-            
-        elif (abs(momentum_medium) < 0.015 and volatility < 0.02 and
-              abs(ma_cross - 1.0) < 0.01):
-            # Check if price is near support in ranging market
-            if df['close'].iloc[-1] < df['sma_20'].iloc[-1] and df['close'].iloc[-1] > df['sma_50'].iloc[-1]:
-                return "ranging_support"  # Ranging near support - potential buy
-            else:
-                return "ranging"  # Regular ranging - less ideal for new entries
-                
-        elif df['close'].iloc[-1] > recent_high - breakout_threshold and volume_trend_short > 1.2:
-            return "breakout"  # Potential breakout with volume confirmation
-            
-        else:
-            return "mixed"  # Mixed or unclear market conditions
+        # Same rules the backtester evaluates on every candle
+        return market_cycles(df.tail(SIGNAL_LOOKBACK)).iloc[-1]
     
     def generate_enhanced_signals(self, df: pd.DataFrame, symbol: str) -> dict:
         """Generate highly selective trading signals optimized per coin"""
@@ -1449,190 +1288,60 @@ class DemoKrakenBot:
             if len(df) < self.sma_long:
                 return {'action': 'hold', 'confidence': 0.5}
     
-            df = self.calculate_advanced_indicators(df)
-            latest = df.iloc[-1]
-            prev = df.iloc[-2] if len(df) > 1 else latest
-            
-            # COIN-SPECIFIC VOLUME THRESHOLDS - FURTHER REDUCED
-            volume_thresholds = {
-                'SOLUSD': 0.5,    # More liquid coin, higher threshold
-                'AVAXUSD': 0.5,   # More liquid coin, higher threshold
-                'XRPUSD': 0.3,    # Medium liquidity, medium threshold
-                'XDGUSD': 0.1,    # Lower liquidity, lower threshold
-                'SHIBUSD': 0.01,  # Ultra-low threshold for SHIB
-                'PEPEUSD': 0.01   # Ultra-low threshold for PEPE
-            }
+            # Indicators normally come precomputed from the incremental engine
+            df = self.feature_pipeline.ensure(df)
             
-            # Default threshold if symbol not found
-            default_threshold = 0.3
-            
-            # Get appropriate threshold for this symbol
-            volume_threshold = volume_thresholds.get(symbol, default_threshold)
+            # The per-coin rules live in strategy.py so the backtester replays
+            # exactly the same decisions; only the last candle is evaluated here
+            latest = df.iloc[-1]
+            row = signal_frame(df.tail(SIGNAL_LOOKBACK), symbol, params=self.strategy_params).iloc[-1]
+            volume_threshold = self.strategy_params.get('volume_threshold', symbol)
+            min_confirmations_needed = self.strategy_params.get('required_confirmations', symbol)
+            volume_ratio = latest['volume_ma_ratio']
+            market_cycle = row['market_cycle']
             
-            # VOLUME FILTER - Use the coin-specific threshold
-            volume_ratio = latest['volume_ma_ratio'] 
-            if volume_ratio < volume_threshold:
+            if not row['volume_ok']:
                 self.logger.info(f"Insufficient volume ({volume_ratio:.2f}) for {symbol}, threshold: {volume_threshold}, avoiding trade")
                 return {'action': 'hold', 'confidence': 0.5}
             
-            # Key indicators
-            sma20 = latest['sma_20']
-            sma50 = latest['sma_50']
-            trend = 1 if sma20 > sma50 else -1
-            rsi = latest['rsi']
-            macd = latest['macd']
-            macd_signal = latest['macd_signal']
-            current_price = latest['close']
-            bb_position = latest['bb_position'] if 'bb_position' in latest else 0
-            if pd.isna(bb_position):
-                bb_position = 0
-            
-            # Market cycle detection - ONLY trade in favorable market conditions
-            market_cycle = self.detect_market_cycle(df)
             self.logger.info(f"Detected market cycle for {symbol}: {market_cycle}")
-            
-            # EXPANDED FAVORABLE MARKETS - Allow more market conditions
-            favorable_markets = {
-                'SOLUSD': ["bull_trend", "ranging", "breakout", "ranging_support", "low_volatility", "mixed"],
-                'AVAXUSD': ["bull_trend", "ranging", "breakout", "ranging_support", "low_volatility", "mixed"],
-                'XRPUSD': ["bull_trend", "ranging", "ranging_support", "breakout", "low_volatility"], 
-                'XDGUSD': ["bull_trend", "breakout", "ranging_support"],
-                'SHIBUSD': ["bull_trend", "breakout"],
-                'PEPEUSD': ["bull_trend", "breakout"]
-            }
-            
-            # Get favorable markets for this coin
-            allowed_markets = favorable_markets.get(symbol, ["bull_trend"])
-            
-            # MARKET CONDITION FILTER - Only trade in coin-specific favorable markets
-            if market_cycle not in allowed_markets:
+            if not row['market_ok']:
                 self.logger.info(f"Avoiding trades for {symbol} in {market_cycle} market")
                 return {'action': 'hold', 'confidence': 0.5}
             
-            # Build confirmation chain system
-            confirmations = 0
-            max_confirmations = 6
-            
-            # Price above BOTH key MAs
-            if current_price > sma20 and current_price > sma50:
-                confirmations += 1
-                self.logger.info("✓ Price above key moving averages")
-            
-            # RSI in ideal range (not overbought) - RELAXED CRITERIA
-            if rsi > 40 and rsi < 65:  # Wider range (40-65 instead of 45-60)
-                confirmations += 1
-                self.logger.info("✓ RSI in ideal range")
-            
-            # Volume confirmation - RELAXED CRITERIA
-            if volume_ratio > volume_threshold:  # Just above threshold is sufficient
-                confirmations += 1
-                self.logger.info("✓ Sufficient volume confirmation")
-            
-            # MACD confirmation - RELAXED CRITERIA
-            if macd > macd_signal:  # Just need to be above signal line
-                confirmations += 1
-                self.logger.info("✓ MACD bullish")
-            
-            # Trend confirmation
-            if trend > 0:
-                confirmations += 1
-                self.logger.info("✓ Bullish trend confirmed")
-            
-            # BB position not overextended - RELAXED CRITERIA
-            if bb_position > -0.4 and bb_position < 0.4:  # Wider range (-0.4/0.4 instead of -0.3/0.3)
-                confirmations += 1
-                self.logger.info("✓ Price within reasonable Bollinger Band range")
-            
-            # Initialize confidence at neutral
-            confidence = 0.5
-            
-            # COIN-SPECIFIC REQUIRED CONFIRMATIONS - REDUCED
-            required_confirmations = {
-                'SOLUSD': 4,      # Lower risk, require 4/6 confirmations
-                'AVAXUSD': 4,     # Lower risk, require 4/6 confirmations
-                'XRPUSD': 4,      # Medium risk, require 4/6 confirmations
-                'XDGUSD': 5,      # Higher risk, require 5/6 confirmations
-                'SHIBUSD': 5,     # Very high risk, require 5/6 confirmations
-                'PEPEUSD': 5      # Extremely high risk, require 5/6 confirmations
-            }
-            
-            default_required_confirmations = 5  # Default to requiring 5 confirmations
-            min_confirmations_needed = required_confirmations.get(symbol, default_required_confirmations)
-            
-            # EXTREMELY SELECTIVE BUY - Require coin-specific confirmation count
-            if (confirmations >= min_confirmations_needed and trend > 0):  # Simplified condition
-                # Coin-specific confidence boost
-                confidence_boost = {
-                    'SOLUSD': 0.17,    # Higher confidence in SOL
-                    'AVAXUSD': 0.17,   # Higher confidence in AVAX
-                    'XRPUSD': 0.16,    # Medium confidence in XRP
-                    'XDGUSD': 0.15,    # Lower confidence in DOGE
-                    'SHIBUSD': 0.14,   # Lower confidence in SHIB
-                    'PEPEUSD': 0.14    # Lower confidence in PEPE
-                }
-                
-                default_boost = 0.15
-                boost = confidence_boost.get(symbol, default_boost)
-                
-                confidence = 0.5 + boost  # Coin-specific confidence boost
-                self.logger.info(f"BUY SIGNAL: {confirmations}/{max_confirmations} confirmations")
-                
-            # MORE AGGRESSIVE PROFIT TAKING (SELL)
-            elif (
-                (trend < 0 and macd < macd_signal) or  # Trend and MACD turning negative
-                (rsi > 70) or  # RSI getting overbought
-                (bb_position > 0.8)  # Price near upper Bollinger Band
-            ):
-                confidence = 0.35  # Strong sell
-                self.logger.info(f"PROFIT TAKING SIGNAL")
-            
-            # Ensure confidence stays within bounds
-            confidence = max(0.3, min(0.7, confidence))
-            
-            # COIN-SPECIFIC BUY THRESHOLD - LOWERED
-            buy_thresholds = {
-                'SOLUSD': 0.62,    # Lower risk, lower threshold
-                'AVAXUSD': 0.62,   # Lower risk, lower threshold
-                'XRPUSD': 0.63,    # Medium risk, medium threshold
-                'XDGUSD': 0.64,    # Higher risk, higher threshold
-                'SHIBUSD': 0.65,   # Very high risk, very high threshold
-                'PEPEUSD': 0.65    # Extremely high risk, very high threshold
-            }
+            checks = [
+                ('above_mas', "✓ Price above key moving averages"),
+                ('rsi_ok', "✓ RSI in ideal range"),
+                ('volume_confirmed', "✓ Sufficient volume confirmation"),
+                ('macd_bullish', "✓ MACD bullish"),
+                ('trend_bullish', "✓ Bullish trend confirmed"),
+                ('bb_ok', "✓ Price within reasonable Bollinger Band range")
+            ]
+            for column, message in checks:
+                if row[column]:
+                    self.logger.info(message)
             
-            default_buy_threshold = 0.64
-            buy_threshold = buy_thresholds.get(symbol, default_buy_threshold)
+            confirmations = int(row['confirmations'])
+            confidence = float(row['confidence'])
+            action = row['action']
+            rsi = latest['rsi']
             
-            # MUCH MORE SELECTIVE BUY THRESHOLD - Require extremely high confidence
-            if confidence > buy_threshold:
-                action = 'buy'
-            elif confidence < 0.42:  # Eager to take profits (changed from 0.45 to 0.42)
-                action = 'sell'
-            else:
-                action = 'hold'
-    
-            # FINAL SAFETY CHECKS:
-            # 1. Don't buy without enough confirmations
-            if action == 'buy' and confirmations < min_confirmations_needed:
-                action = 'hold'
-                self.logger.info(f"Buy rejected: Only {confirmations}/{min_confirmations_needed} confirmations")
-            
-            # 2. RSI filter for buys - RELAXED
-            if action == 'buy' and rsi > 70:  # Only reject extremely overbought
-                action = 'hold'
-                self.logger.info(f"Buy rejected: RSI too high at {rsi:.2f}")
-            
-            # 3. Check if price is trending up in last few candles - REMOVED
-            # This check was too strict and was rejecting good entries
+            if confirmations >= min_confirmations_needed and row['trend_bullish']:
+                self.logger.info(f"BUY SIGNAL: {confirmations}/{MAX_CONFIRMATIONS} confirmations")
+                if action != 'buy' and rsi > 70:
+                    self.logger.info(f"Buy rejected: RSI too high at {rsi:.2f}")
+            elif confidence < 0.5:
+                self.logger.info(f"PROFIT TAKING SIGNAL")
     
             # Log final decision
             self.logger.info(f"{symbol} Analysis:")
             self.logger.info(f"Market Cycle: {market_cycle}")
-            self.logger.info(f"Confirmations: {confirmations}/{max_confirmations}")
+            self.logger.info(f"Confirmations: {confirmations}/{MAX_CONFIRMATIONS}")
             self.logger.info(f"Required Confirmations: {min_confirmations_needed}")
-            self.logger.info(f"Trend: {'Bullish' if trend > 0 else 'Bearish'}")
+            self.logger.info(f"Trend: {'Bullish' if row['trend_bullish'] else 'Bearish'}")
             self.logger.info(f"RSI: {rsi:.2f}")
             self.logger.info(f"Volume Ratio: {volume_ratio:.2f} (Threshold: {volume_threshold})")
-            self.logger.info(f"MACD: {macd:.6f}, Signal: {macd_signal:.6f}")
+            self.logger.info(f"MACD: {latest['macd']:.6f}, Signal: {latest['macd_signal']:.6f}")
             self.logger.info(f"Final Signal: {action.upper()} ({confidence:.3f})")
             
             return {'action': action, 'confidence': confidence}
@@ -1644,116 +1353,18 @@ class DemoKrakenBot:
     
     def get_minimum_order_requirements(self, symbol: str) -> dict:
         """Get minimum order requirements for a given symbol"""
-        try:
-            # Define minimum requirements for each symbol
-            requirements = {
-                'SOLUSD': {
-                    'min_vol': 0.1,      # Minimum volume
-                    'min_price': 0.01,   # Minimum price
-                    'price_decimals': 4,  # Price decimal places
-                    'vol_decimals': 8    # Volume decimal places
-                },
-                'AVAXUSD': {
-                    'min_vol': 0.1,
-                    'min_price': 0.01,
-                    'price_decimals': 4,
-                    'vol_decimals': 8
-                },
-                'XRPUSD': {
-                    'min_vol': 10.0,
-                    'min_price': 0.00001,
-                    'price_decimals': 5,
-                    'vol_decimals': 8
-                },
-                'XDGUSD': {
-                    'min_vol': 50.0,
-                    'min_price': 0.00001,
-                    'price_decimals': 6,
-                    'vol_decimals': 8
-                },
-                'SHIBUSD': {
-                    'min_vol': 50000.0,
-                    'min_price': 0.000001,
-                    'price_decimals': 8,
-                    'vol_decimals': 8
-                },
-                'PEPEUSD': {
-                    'min_vol': 50000.0,
-                    'min_price': 0.000001,
-                    'price_decimals': 8,
-                    'vol_decimals': 8
-                }
-            }
-            
-            if symbol not in requirements:
-                self.logger.error(f"No requirements defined for {symbol}")
-                # Return default requirements
-                return {
-                    'min_vol': 0.1,
-                    'min_price': 0.01,
-                    'price_decimals': 8,
-                    'vol_decimals': 8
-                }
-                
-            return requirements[symbol]
-            
-        except Exception as e:
-            self.logger.error(f"Error getting minimum requirements for {symbol}: {str(e)}")
-            # Return safe default values
-            return {
-                'min_vol': 0.1,
-                'min_price': 0.01,
-                'price_decimals': 8,
-                'vol_decimals': 8
-            }
+        if symbol not in ORDER_REQUIREMENTS:
+            self.logger.error(f"No requirements defined for {symbol}")
+            return dict(DEFAULT_ORDER_REQUIREMENTS)
+        return dict(ORDER_REQUIREMENTS[symbol])
     
     async def train_ai_models(self, historical_data: pd.DataFrame):
         """Train the AI models with historical data"""
-        try:
-            self.logger.info("Training AI models...")
-            
-            # Prepare sequence data
-            X, y = self.ai_enhancer.prepare_sequence_data(historical_data)
-            
-            if len(X) < 1000:  # Minimum required samples
-                self.logger.warning("Insufficient data for AI training")
-                return False
-            
-            # Split data
-            train_size = int(len(X) * 0.8)
-            X_train, X_test = X[:train_size], X[train_size:]
-            y_train, y_test = y[:train_size], y[train_size:]
-            
-            # Build and train LSTM
-            self.ai_enhancer.lstm_model = self.ai_enhancer.build_lstm_model()
-            self.ai_enhancer.lstm_model.fit(
-                X_train, y_train,
-                epochs=10,
-                batch_size=32,
-                validation_data=(X_test, y_test),
-                verbose=1
-            )
-            
-            # Build and train Transformer
-            self.ai_enhancer.transformer_model = self.ai_enhancer.build_transformer_model()
-            self.ai_enhancer.transformer_model.fit(
-                X_train, y_train,
-                epochs=10,
-                batch_size=32,
-                validation_data=(X_test, y_test),
-                verbose=1
-            )
-            
-            self.ai_trained = True
-            self.logger.info("AI models trained successfully")
-            return True
-            
-        except Exception as e:
-            self.logger.error(f"Error training AI models: {str(e)}")
-            return False
-    
-    def format_order_quantity(self, symbol: str, quantity: float) -> str:
-        """Format the order quantity according to symbol requirements"""
+        self.logger.info("Training AI models...")
+        return await self.train_models(historical_data, train_ml=False)
+    
+    def format_order_quantity(self, symbol: str, quantity: float) -> str:
+        """Format the order quantity according to symbol requirements"""
         try:
             requirements = self.get_minimum_order_requirements(symbol)
             decimals = requirements['vol_decimals']
@@ -1797,16 +1408,29 @@ class DemoKrakenBot:
     def execute_trade_demo(self, symbol: str, signal: dict, price: float = None):
         """Simplified synchronous version for demo trades with live price data"""
         try:
-            # Always get fresh price at execution time
+            # Prices and quotes are resolved before the ledger lock is taken,
+            # so no exchange request runs while it is held
             if price is None or price <= 0:
                 price = self.get_latest_price(symbol)
-                
+            if signal['action'] == 'buy':
+                self.price_cache.snapshot(symbol)
+            prices = self.position_prices()
+        except Exception as e:
+            self.logger.error(f"Demo trade execution error: {e}")
+            return None
+        with self.ledger_lock:
+            return self._execute_trade_demo(symbol, signal, price, prices)
+
+    def _execute_trade_demo(self, symbol: str, signal: dict, price: Optional[float],
+                            prices: Dict[str, Optional[float]]):
+        try:
             if not price or price <= 0:
                 self.logger.error(f"Invalid price for {symbol}: {price}")
                 return None
+            prices = {**prices, symbol: price}
                 
             # Calculate position size using demo balance
-            position_size = self.calculate_position_size(symbol, signal)
+            position_size = self._position_size(symbol, signal, prices)
             if position_size <= 0:
                 return None
                 
@@ -1858,15 +1482,19 @@ class DemoKrakenBot:
                     self.portfolio_history.append({
                         'timestamp': datetime.now(),
                         'balance': self.demo_balance['ZUSD'],
-                        'equity': self.calculate_total_equity()
+                        'equity': self._equity(prices)
                     })
                     
+                    self._journal_fill(symbol, trade)
                     self.logger.info(f"Demo SELL executed: {quantity} {symbol} @ ${price}")
                     self.logger.info(f"P&L: ${profit_loss:.2f} ({pnl_percentage:.2f}%)")
                     return {'status': 'success', 'trade': trade}
                         
             # BUY LOGIC  
             elif signal['action'] == 'buy':
+                if not self.spread_acceptable(symbol):
+                    return None
+                    
                 quantity = position_size / price
                 
                 # Ensure minimum volume
@@ -1909,9 +1537,10 @@ class DemoKrakenBot:
                 self.portfolio_history.append({
                     'timestamp': datetime.now(),
                     'balance': self.demo_balance['ZUSD'],
-                    'equity': self.calculate_total_equity()
+                    'equity': self._equity(prices)
                 })
                 
+                self._journal_fill(symbol, trade)
                 self.logger.info(f"Demo BUY executed: {quantity} {symbol} @ ${price}")
                 return {'status': 'success', 'trade': trade}
                     
@@ -1921,6 +1550,19 @@ class DemoKrakenBot:
             self.logger.error(f"Demo trade execution error: {e}")
             return None
             
+    def _journal_fill(self, symbol: str, trade: dict):
+        """Make a demo fill durable before it is reported"""
+        try:
+            self.journal.append('fill', {
+                'symbol': symbol,
+                'trade': trade,
+                'balance': {'ZUSD': self.demo_balance['ZUSD'], symbol: self.demo_balance.get(symbol, 0)},
+                'position': self.demo_positions.get(symbol),
+                'equity': self.portfolio_history[-1]
+            })
+        except Exception as e:
+            self.logger.error(f"Error journaling demo fill for {symbol}: {str(e)}")
+            
     def update_trade_history(self, symbol: str, action: str, quantity: float):
         """Update local tracking of positions based on executed trades"""
         if symbol not in self.trade_history:
@@ -1955,7 +1597,7 @@ class DemoKrakenBot:
             positions_to_close = []  # Track positions that need to be closed
             
             for symbol, position in self.demo_positions.items():
-                current_price = self.get_latest_price(symbol)
+                current_price = await self.exchange.run_blocking(self.get_latest_price, symbol)
                 if not current_price:
                     self.logger.warning(f"Could not get current price for {symbol}")
                     continue
@@ -2050,26 +1692,29 @@ class DemoKrakenBot:
 
     def check_and_reset_balance(self):
         """Check if balance is too low and reset if needed"""
-        if self.demo_balance['ZUSD'] < self.min_zusd_balance:
-            self.logger.warning(f"Balance ${self.demo_balance['ZUSD']:.2f} below minimum ${self.min_zusd_balance}")
-            # Reset to a reasonable amount
-            self.demo_balance['ZUSD'] = 10000.0  # Smaller reset amount
-            self.save_demo_state()
-            self.logger.info(f"Demo balance reset to ${self.demo_balance['ZUSD']:.2f}")
-            return True
-        return False
+        with self.ledger_lock:
+            if self.demo_balance['ZUSD'] < self.min_zusd_balance:
+                self.logger.warning(f"Balance ${self.demo_balance['ZUSD']:.2f} below minimum ${self.min_zusd_balance}")
+                # Reset to a reasonable amount
+                self.demo_balance['ZUSD'] = 10000.0  # Smaller reset amount
+                self.save_demo_state()
+                self.logger.info(f"Demo balance reset to ${self.demo_balance['ZUSD']:.2f}")
+                return True
+            return False
         
     async def initialize_position_tracking(self):
         """Initialize demo position tracking"""
         try:
-            # For demo bot, we start with no positions
-            self.demo_positions = {}
-            self.portfolio_history = [{
-                'timestamp': datetime.now(),
-                'balance': self.demo_balance['ZUSD'],
-                'equity': self.demo_balance['ZUSD']
-            }]
-            self.logger.info("Demo position tracking initialized")
+            # Positions and history recovered by load_demo_state carry over;
+            # the restart only adds a fresh equity point
+            equity = await self.exchange.run_blocking(self.calculate_total_equity)
+            with self.ledger_lock:
+                self.portfolio_history.append({
+                    'timestamp': datetime.now(),
+                    'balance': self.demo_balance['ZUSD'],
+                    'equity': equity
+                })
+            self.logger.info(f"Demo position tracking initialized with {len(self.demo_positions)} open positions")
             return True
         except Exception as e:
             self.logger.error(f"Error initializing demo position tracking: {str(e)}")
@@ -2078,17 +1723,8 @@ class DemoKrakenBot:
     def setup_database(self):
         """Set up SQLite database for storing trading data"""
         try:
-            conn = sqlite3.connect(self.db_name)
-            c = conn.cursor()
-        
-            # Create market data table
-            c.execute('''CREATE TABLE IF NOT EXISTS market_data
-                        (timestamp TEXT, symbol TEXT, price REAL,
-                        volume REAL, rsi REAL, macd REAL, trend INTEGER,
-                        volatility REAL, close REAL)''')
-        
-            conn.commit()
-            conn.close()
+            # Create the market data catalog; migrates the old market_data table
+            self.market_store.create_tables()
         
         except Exception as e:
             self.logger.error(f"Database setup error: {str(e)}")
@@ -2096,11 +1732,8 @@ class DemoKrakenBot:
     def store_trade_data(self, trade_data: dict):
         """Store trade information in database"""
         try:
-            conn = sqlite3.connect(self.db_name)
-            c = conn.cursor()
-        
             # Store trade data
-            c.execute('''INSERT INTO trades VALUES
+            self.storage.execute('''INSERT INTO trades VALUES
                         (?,?,?,?,?,?,?)''', (
                 datetime.now().isoformat(),
                 trade_data['symbol'],
@@ -2111,219 +1744,149 @@ class DemoKrakenBot:
                 str(trade_data.get('market_conditions', {}))
             ))
         
-            conn.commit()
-            conn.close()
-        
         except Exception as e:
             self.logger.error(f"Error storing trade data: {str(e)}")
         
     def store_market_data(self, symbol: str, df: pd.DataFrame):
-        """Store market data with support for both single symbol and batch operations"""
+        """Store market data rows keyed by symbol and candle time; re-stored candles replace their row"""
         try:
-            conn = sqlite3.connect(self.db_name)
-        
-            if isinstance(df.index, pd.DatetimeIndex):
-                df = df.reset_index()
-        
-            # Handle both single symbol and batch data
-            if 'symbol' not in df.columns:
-                df['symbol'] = symbol
-        
-            # Convert timestamp to string if needed
-            if 'timestamp' not in df.columns and 'timestamp' in df.index.names:
-                df['timestamp'] = df.index.get_level_values('timestamp').astype(str)
-            elif 'timestamp' not in df.columns:
-                df['timestamp'] = pd.Timestamp.now().isoformat()
-        
-            # Prepare the required columns
-            market_data = pd.DataFrame({
-                'timestamp': df['timestamp'],
-                'symbol': df['symbol'] if 'symbol' in df.columns else symbol,
-                'close': df['close'],
-                'volume': df['volume'],
-                'rsi': df['rsi'],
-                'macd': df['macd'],
-                'trend': (df['sma_short'] > df['sma_long']).astype(int) if 'sma_short' in df.columns else 0,
-                'volatility': df['volatility'] if 'volatility' in df.columns else df['close'].pct_change().rolling(20).std()
-            })
-        
-            # Store data in chunks to prevent memory issues
-            chunk_size = 1000
-            for i in range(0, len(market_data), chunk_size):
-                chunk = market_data.iloc[i:i + chunk_size]
-                chunk.to_sql('market_data', conn, if_exists='append', index=False)
-        
-            self.logger.info(f"Stored {len(market_data)} rows of market data")
-            conn.close()
+            rows = market_data_rows(symbol, df)
+            self.market_store.store(symbol, rows)
+
+            self.logger.info(f"Stored {len(rows)} rows of market data")
         
         except Exception as e:
             self.logger.error(f"Error storing market data: {str(e)}")
     
+    async def run_initial_training(self):
+        """Initial training as a background task; signals fall back to technicals until it finishes"""
+        training_success = await self.perform_initial_training()
+        if training_success:
+            self.training_completed = True
+            self.logger.info("Initial training completed successfully!")
+        else:
+            self.logger.error("Initial training failed!")
+
+    def load_models(self) -> bool:
+        """Load the latest compatible trained models from the registry"""
+        try:
+            metadata = self.model_registry.load_latest(self.model_manager, self.ai_enhancer)
+            if metadata is None:
+                return False
+            self.is_initially_trained = True
+            self.ai_trained = bool(metadata.get('has_ai'))
+            self.logger.info(f"Using stored models (version {metadata['version']}, "
+                             f"data window {metadata.get('data_window')})")
+            return True
+        except Exception as e:
+            self.logger.error(f"Error loading stored models: {str(e)}")
+            return False
+
+    def save_models(self, data: Optional[pd.DataFrame] = None):
+        """Store the current models as a new registry version"""
+        try:
+            self.model_registry.save(self.model_manager, self.ai_enhancer, data)
+        except Exception as e:
+            self.logger.error(f"Error saving models: {str(e)}")
+
+    async def collect_training_data(self) -> Optional[pd.DataFrame]:
+        """Refresh every symbol and combine its archived history into one training frame"""
+        all_data = []
+        for symbol in self.symbols:
+            try:
+                # Refresh the window, then train on the archived history as well
+                await self.get_historical_data(symbol)
+                df = self.candle_store.history(symbol, self.training_lookback_days)
+                if df is not None and not df.empty:
+                    df = self.feature_pipeline.transform_history(df)
+                    all_data.append(df)
+                    self.logger.info(f"Collected {len(df)} samples for {symbol}")
+            except Exception as e:
+                self.logger.error(f"Error collecting data for {symbol}: {str(e)}")
+
+        if not all_data:
+            self.logger.warning("No historical data available for training")
+            return None
+        return pd.concat(all_data, ignore_index=True)
+
     async def perform_initial_training(self):
         """Perform initial model training including AI models"""
         try:
             self.logger.info("Starting initial model training...")
             
-            # Get historical data for all symbols
-            all_data = []
-            for symbol in self.symbols:
-                try:
-                    df = await self.get_historical_data(symbol)
-                    if df is not None and not df.empty:
-                        df = self.calculate_indicators(df)
-                        all_data.append(df)
-                        self.logger.info(f"Collected {len(df)} samples for {symbol}")
-                except Exception as e:
-                    self.logger.error(f"Error collecting data for {symbol}: {str(e)}")
-        
-            if not all_data:
-                self.logger.warning("No historical data available for training")
+            if self.backfill_requests > 0:
+                await self.exchange.run_blocking(self.backfill.run, list(self.symbols), self.training_lookback_days,
+                                                 max_requests=self.backfill.requests + self.backfill_requests)
+            
+            combined_df = await self.collect_training_data()
+            if combined_df is None:
                 return False
-        
-            # Combine all data
-            combined_df = pd.concat(all_data, ignore_index=True)
             
-            # Train ML Model
+            # Fit on the training worker; the current models keep serving meanwhile
+            return await self.train_models(combined_df)
+            
+        except Exception as e:
+            self.logger.error(f"Error in initial training: {str(e)}")
+            return False
+
+    def _fit_models(self, data: pd.DataFrame, train_ml: bool = True) -> tuple:
+        """Fit fresh model instances on data; runs on the training worker thread"""
+        model_manager = None
+        if train_ml:
             try:
-                features_df = self.model_manager.prepare_features(combined_df)
-                labels = self.model_manager.create_labels(combined_df)
+                model_manager = MLModelManager(self.feature_pipeline)
+                features_df = model_manager.prepare_features(data)
+                labels = model_manager.create_labels(data)
                 
-                training_success = self.model_manager.train_model(features_df, labels)
-                if training_success:
-                    self.is_initially_trained = True
+                if model_manager.train_model(features_df, labels):
                     self.logger.info("ML model trained successfully")
                 else:
                     self.logger.error("ML model training failed")
-                    return False
+                    return None, None
             except Exception as e:
                 self.logger.error(f"Error in ML training: {str(e)}")
-                return False
-        
-            # Train AI Models
-            try:
-                self.logger.info("Starting AI model training...")
-                # Prepare sequence data
-                X, y = self.ai_enhancer.prepare_sequence_data(combined_df)
-                
-                if len(X) < 1000:  # Minimum required samples
-                    self.logger.warning("Insufficient data for AI training")
-                    return False
-                
-                # Split data
-                train_size = int(len(X) * 0.8)
-                X_train, X_test = X[:train_size], X[train_size:]
-                y_train, y_test = y[:train_size], y[train_size:]
-                
-                # Build and train LSTM
-                self.logger.info("Training LSTM model...")
-                self.ai_enhancer.lstm_model = self.ai_enhancer.build_lstm_model()
-                self.ai_enhancer.lstm_model.fit(
-                    X_train, y_train,
-                    epochs=10,
-                    batch_size=32,
-                    validation_data=(X_test, y_test),
-                    verbose=1
-                )
-                
-                # Build and train Transformer
-                self.logger.info("Training Transformer model...")
-                self.ai_enhancer.transformer_model = self.ai_enhancer.build_transformer_model()
-                self.ai_enhancer.transformer_model.fit(
-                    X_train, y_train,
-                    epochs=10,
-                    batch_size=32,
-                    validation_data=(X_test, y_test),
-                    verbose=1
-                )
-                
-                self.ai_trained = True
-                self.logger.info("AI models trained successfully")
-                
-            except Exception as e:
-                self.logger.error(f"Error in AI training: {str(e)}")
-                self.logger.error(traceback.format_exc())
-                return False
-        
-            return self.is_initially_trained and self.ai_trained
-            
-        except Exception as e:
-            self.logger.error(f"Error in initial training: {str(e)}")
-            return False
-    
-    def calculate_advanced_indicators(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Calculate advanced technical indicators"""
+                return None, None
+
+        self.logger.info("Starting AI model training...")
+        ai_enhancer = AITradingEnhancer(self.feature_pipeline)
+        if ai_enhancer.fit(data):
+            self.logger.info("AI models trained successfully")
+        else:
+            self.logger.warning("AI model training failed")
+            ai_enhancer = None
+
+        # Persist before swapping in; this also exports the AI serving function.
+        # Only freshly fitted models are saved, never the serving ones: a failed
+        # AI fit is stored as an unfitted enhancer, so the version has no AI models
+        if model_manager is not None or ai_enhancer is not None:
+            stored_manager = model_manager or self.model_manager
+            if stored_manager.is_trained:
+                self.model_registry.save(stored_manager, ai_enhancer or AITradingEnhancer(self.feature_pipeline), data)
+
+        return model_manager, ai_enhancer
+
+    async def train_models(self, data: pd.DataFrame, train_ml: bool = True) -> bool:
+        """Fit new models off the event loop and swap them in when fitting finishes"""
         try:
-            # Create a copy to avoid modifying the original
-            df = df.copy()
-            
-            # Ensure we have required columns
-            required_columns = ['high', 'low', 'close', 'volume']
-            for col in required_columns:
-                if col not in df.columns:
-                    raise ValueError(f"Missing required column: {col}")
-            
-            # Basic price and volume features
-            df['returns'] = df['close'].pct_change()
-            df['log_returns'] = np.log1p(df['returns'].fillna(0))
-            df['rolling_std_20'] = df['returns'].rolling(window=20, min_periods=1).std()
-            df['rolling_std_50'] = df['returns'].rolling(window=50, min_periods=1).std()
-            
-            # Volume features
-            df['volume_sma'] = df['volume'].rolling(window=20, min_periods=1).mean()
-            df['volume_ma_ratio'] = df['volume'] / df['volume_sma']
-            df['volume_std'] = df['volume'].rolling(window=20, min_periods=1).std()
-            
-            # Technical indicators
-            try:
-                # RSI
-                rsi_indicator = ta.momentum.RSIIndicator(close=df['close'], window=14)
-                df['rsi'] = rsi_indicator.rsi()
-                df['rsi_divergence'] = df['rsi'].diff()
-                
-                # Momentum
-                df['mom_14'] = ta.momentum.ROCIndicator(close=df['close'], window=14).roc()
-                df['mom_30'] = ta.momentum.ROCIndicator(close=df['close'], window=30).roc()
-                
-                # MACD
-                macd_indicator = ta.trend.MACD(close=df['close'])
-                df['macd'] = macd_indicator.macd()
-                df['macd_signal'] = macd_indicator.macd_signal()
-                df['macd_diff'] = macd_indicator.macd_diff()
-                
-                # Bollinger Bands
-                bb_indicator = ta.volatility.BollingerBands(close=df['close'])
-                df['bb_width'] = (bb_indicator.bollinger_hband() - bb_indicator.bollinger_lband()) / bb_indicator.bollinger_mavg()
-                df['bb_position'] = (df['close'] - bb_indicator.bollinger_lband()) / (bb_indicator.bollinger_hband() - bb_indicator.bollinger_lband())
-                
-                # ATR and ADX
-                df['atr'] = ta.volatility.AverageTrueRange(
-                    high=df['high'],
-                    low=df['low'],
-                    close=df['close']
-                ).average_true_range()
-                
-                adx_indicator = ta.trend.ADXIndicator(
-                    high=df['high'],
-                    low=df['low'],
-                    close=df['close']
-                )
-                df['adx'] = adx_indicator.adx()
-                df['adx_pos'] = adx_indicator.adx_pos()
-                df['adx_neg'] = adx_indicator.adx_neg()
-                
-            except Exception as e:
-                self.logger.error(f"Error calculating technical indicators: {str(e)}")
-                raise
+            model_manager, ai_enhancer = await self.training_worker.run(self._fit_models, data, train_ml)
             
-            # Clean up any NaN or infinite values
-            df = df.replace([np.inf, -np.inf], np.nan)
-            df = df.fillna(method='ffill').fillna(method='bfill').fillna(0)
+            # Whole instances are replaced, so predictions never see a half-fitted model
+            if model_manager is not None:
+                self.model_manager = model_manager
+                self.is_initially_trained = True
+            if ai_enhancer is not None:
+                self.ai_enhancer = ai_enhancer
+                self.ai_trained = True
+            
+            if train_ml and model_manager is not None and ai_enhancer is None:
+                self.logger.warning("ML models updated; AI models were not retrained")
             
-            return df
+            # Success means the requested models were swapped in
+            return model_manager is not None if train_ml else ai_enhancer is not None
             
         except Exception as e:
-            self.logger.error(f"Error calculating advanced indicators: {str(e)}")
-            raise
+            self.logger.error(f"Error in model training: {str(e)}")
+            return False
     
     async def update_dashboard(self):
         """Update dashboard without IPython clear_output"""
@@ -2362,29 +1925,19 @@ class DemoKrakenBot:
             # Market Analysis
             print("\nMarket Analysis:")
             try:
-                conn = sqlite3.connect(self.db_name)
-                cursor = conn.cursor()
-    
                 for symbol in self.symbols:
                     print(f"\n{symbol}:")
                     try:
                         # Get data point count for this symbol
-                        cursor.execute("SELECT COUNT(*) FROM market_data WHERE symbol=?", (symbol,))
-                        data_count = cursor.fetchone()[0]
+                        data_count = self.market_store.count(symbol)
                         print(f"  Data Points Collected: {data_count}")
                         print(f"  Minimum Required: {max(self.sma_long, self.min_training_data)}")
     
                         # Get latest data for this symbol
-                        cursor.execute("""
-                            SELECT close, volume, rsi, macd, volatility
-                            FROM market_data
-                            WHERE symbol=?
-                            ORDER BY timestamp DESC
-                            LIMIT 1""", (symbol,))
-                        latest = cursor.fetchone()
-    
+                        latest = self.market_store.latest(symbol)
+
                         if latest:
-                            close, volume, rsi, macd, volatility = latest
+                            close, rsi, volatility = latest['close'], latest['rsi'], latest['volatility']
                             print(f"  Latest Price: ${float(close):.4f}")
                             if rsi is not None:
                                 print(f"  RSI: {float(rsi):.2f}")
@@ -2402,7 +1955,6 @@ class DemoKrakenBot:
                     except Exception as e:
                         print(f"  Error getting data: {str(e)}")
     
-                conn.close()
             except Exception as e:
                 print(f"Database access error: {str(e)}")
     
@@ -2449,9 +2001,9 @@ class DemoKrakenBot:
     async def collect_data_for_symbol(self, symbol: str):
         """Collect data for a single symbol with proper error handling"""
         try:
-            df = self.get_historical_data(symbol)
+            df = await self.get_historical_data(symbol)
             if df is not None:
-                df = self.calculate_advanced_indicators(df)
+                df = self.feature_pipeline.transform_history(df)
                 self.store_market_data(symbol, df)
                 return True
             return False
@@ -2470,27 +2022,17 @@ class DemoKrakenBot:
     def check_market_conditions(self, symbol: str, df: pd.DataFrame) -> bool:
         """Enhanced market condition checks"""
         try:
-            latest = df.iloc[-1]
+            row = market_condition_frame(df.tail(SIGNAL_LOOKBACK), self.market_conditions).iloc[-1]
+            if row['tradable']:
+                return True
             
-            # Check volatility
-            volatility = df['close'].pct_change().rolling(20).std().iloc[-1]
-            if volatility > self.market_conditions['high_volatility']:
-                self.logger.warning(f"High volatility detected for {symbol}: {volatility:.2%}")
-                return False
-                
-            # Check volume/liquidity
-            if latest['volume'] < self.market_conditions['low_liquidity']:
+            if row['volatility'] > self.market_conditions['high_volatility']:
+                self.logger.warning(f"High volatility detected for {symbol}: {row['volatility']:.2%}")
+            elif df['volume'].iloc[-1] < self.market_conditions['low_liquidity']:
                 self.logger.warning(f"Low liquidity for {symbol}")
-                return False
-                
-            # Calculate and check spread if available
-            if 'high' in df.columns and 'low' in df.columns:
-                spread = (latest['high'] - latest['low']) / latest['low']
-                if spread > self.market_conditions['excessive_spread']:
-                    self.logger.warning(f"Excessive spread for {symbol}: {spread:.2%}")
-                    return False
-                    
-            return True
+            else:
+                self.logger.warning(f"Excessive spread for {symbol}: {row['spread']:.2%}")
+            return False
         except Exception as e:
             self.logger.error(f"Error checking market conditions: {str(e)}")
             return False
@@ -2522,61 +2064,29 @@ class DemoKrakenBot:
             if price is None or price <= 0:
                 self.logger.error("Invalid price")
                 return 0
-                
+            prices = self.position_prices()
+        
+        except Exception as e:
+            self.logger.error(f"Demo position size calculation error: {e}")
+            return 0
+        with self.ledger_lock:
+            return self._position_size(symbol, signal, prices)
+    
+    def _position_size(self, symbol: str, signal: dict, prices: Dict[str, Optional[float]]) -> float:
+        """Demo position size at the given prices; call with the ledger lock held"""
+        try:
             # For demo bot, use demo balance instead of Kraken API
-            total_usd_balance = self.demo_balance['ZUSD']
-            
-            if total_usd_balance < self.min_zusd_balance:
-                self.logger.warning(f"Balance ${total_usd_balance} below minimum ${self.min_zusd_balance}")
-                return 0
-            
-            # IMPROVED RISK MANAGEMENT - Fixed percentage risk per trade
-            # Never risk more than 1% of account on any single trade
-            max_risk_amount = total_usd_balance * 0.01
-            
-            # PORTFOLIO PROTECTION - Reduce position size when equity drops
-            equity_ratio = self.calculate_total_equity() / 100000.0  # Initial capital ratio
-            
-            # Implement smart position sizing based on account drawdown
-            if equity_ratio < 0.85:  # Lost 15% or more
-                size_multiplier = 0.3  # Drastic reduction - trade at 30% of normal size
-                self.logger.warning(f"SIGNIFICANT DRAWDOWN: Scaling position to 30% of normal size")
-            elif equity_ratio < 0.95:  # Lost 5-15%
-                size_multiplier = 0.6  # Moderate reduction - trade at 60% of normal size
-                self.logger.warning(f"MODERATE DRAWDOWN: Scaling position to 60% of normal size")
-            else:
-                size_multiplier = 1.0  # No adjustment needed
-            
-            # Calculate size conservatively - reduce default allocation by 50%
-            allocation = self.symbols[symbol] * 0.5  # Cut standard allocation in half
-            base_position_size = min(
-                total_usd_balance * allocation,
-                total_usd_balance * (self.max_position_size * 0.5)  # Cut max position size in half too
-            ) * size_multiplier
-            
-            # ONLY increase size for extremely high confidence signals
-            confidence_factor = 1.0
-            if 'confidence' in signal and signal['action'] == 'buy':
-                # Only increase size for very high confidence signals (above 0.65)
-                normalized_confidence = (signal['confidence'] - 0.65) * 10  # Scale 0.65-0.75 to 0-1
-                if normalized_confidence > 0:
-                    confidence_factor = 1.0 + (normalized_confidence * 0.3)  # Maximum increase of 30%
-                    self.logger.info(f"High conviction signal: Increasing size by {((confidence_factor-1)*100):.1f}%")
-            
-            position_size = base_position_size * confidence_factor
-            
-            # Verify against max risk amount (hard cap at 1% account risk)
-            if position_size > max_risk_amount:
-                position_size = max_risk_amount
-                self.logger.info(f"Position size capped at max risk amount: ${position_size:.2f}")
-            
-            # Ensure minimum position size
-            if position_size < self.min_position_value:
-                self.logger.warning(f"Position size ${position_size:.2f} below minimum ${self.min_position_value}")
-                return 0
-                
-            return position_size
-            
+            return position_size(
+                balance=self.demo_balance['ZUSD'],
+                equity=self._equity(prices),
+                allocation=self.symbols[symbol],
+                signal=signal,
+                max_position_size=self.max_position_size,
+                min_balance=self.min_zusd_balance,
+                min_position_value=self.min_position_value,
+                logger=self.logger
+            )
+        
         except Exception as e:
             self.logger.error(f"Demo position size calculation error: {e}")
             return 0
@@ -2634,19 +2144,12 @@ class DemoKrakenBot:
     async def retrain_models(self):
         try:
             # Collect new data
-            new_data = await self.collect_all_data()
-            
-            # Prepare features and labels
-            features_df = self.model_manager.prepare_features(new_data)
-            labels = self.model_manager.create_labels(new_data)
-            
-            # Retrain ML model
-            self.model_manager.train_model(features_df, labels)
-            
-            # Retrain AI models
-            await self.train_ai_models(new_data)
+            new_data = await self.collect_training_data()
+            if new_data is None:
+                return False
             
-            return True
+            # Retrain ML and AI models on the training worker
+            return await self.train_models(new_data)
         except Exception as e:
             self.logger.error(f"Error in retraining: {str(e)}")
             return False
@@ -2685,19 +2188,7 @@ class DemoKrakenBot:
             return True
     
     def get_latest_price(self, symbol: str) -> Optional[float]:
-        """Get latest price with real-time data and proper error handling"""
-        # Add timestamp logging
-        current_time = datetime.now()
-        self.logger.info(f"Fetching real-time price for {symbol} at {current_time.strftime('%H:%M:%S.%f')[:-3]}")
-        
-        # Check if we should use cached price
-        if hasattr(self, 'demo_rate_limiter') and not self.demo_rate_limiter.should_fetch_price(symbol):
-            cached_price = self.demo_rate_limiter.get_cached_price(symbol)
-            if cached_price:
-                self.logger.info(f"Using cached price for {symbol}: ${cached_price}")
-                return cached_price
-        
-        # Proceed with normal price fetching
+        """Get latest price from the shared ticker cache, falling back to candles and trades"""
         max_retries = 3
         precision = {
             'SHIBUSD': 8,
@@ -2708,33 +2199,20 @@ class DemoKrakenBot:
             'AVAXUSD': 2
         }.get(symbol, 8)
         
+        price = self.price_cache.get(symbol)
+        if price:
+            return round(price, precision)
+        
+        self.logger.info(f"No cached ticker price for {symbol}, fetching from market data")
         for attempt in range(max_retries):
             try:
-                # Try using Ticker API (correct method for your version of pykrakenapi)
-                try:
-                    # Use the proper ticker method based on your API version
-                    ticker = self.kraken.query_public('Ticker', {'pair': symbol})
-                    if ticker and 'result' in ticker and symbol in ticker['result']:
-                        # The 'c' field contains the last trade closed info: [price, volume]
-                        price = float(ticker['result'][symbol]['c'][0])
-                        if price > 0:
-                            self.logger.info(f"Got real-time ticker price for {symbol}: ${price}")
-                            # Cache the price
-                            if hasattr(self, 'demo_rate_limiter'):
-                                self.demo_rate_limiter.update_price(symbol, round(price, precision))
-                            return round(price, precision)
-                except Exception as ticker_error:
-                    self.logger.warning(f"Ticker fetch error for {symbol}: {str(ticker_error)}")
-                
-                # Fallback to OHLC if ticker fails
+                # Fallback to OHLC if the ticker batch had no price
                 ohlc = self.k.get_ohlc_data(symbol, interval=1)[0]
                 if ohlc is not None and not ohlc.empty:
                     price = float(ohlc.iloc[-1]['close'])
                     if price > 0:
                         self.logger.info(f"Got OHLC price for {symbol}: ${price}")
-                        # Cache the price
-                        if hasattr(self, 'demo_rate_limiter'):
-                            self.demo_rate_limiter.update_price(symbol, round(price, precision))
+                        self.price_cache.update(symbol, price)
                         return round(price, precision)
                         
                 # Fallback to recent trades
@@ -2744,9 +2222,7 @@ class DemoKrakenBot:
                         price = float(trades.iloc[0]['price'])
                         if price > 0:
                             self.logger.info(f"Got recent trades price for {symbol}: ${price}")
-                            # Cache the price
-                            if hasattr(self, 'demo_rate_limiter'):
-                                self.demo_rate_limiter.update_price(symbol, round(price, precision))
+                            self.price_cache.update(symbol, price)
                             return round(price, precision)
                 except Exception as trades_error:
                     self.logger.warning(f"Recent trades fetch error for {symbol}: {str(trades_error)}")
@@ -2763,163 +2239,95 @@ class DemoKrakenBot:
         self.logger.error(f"Failed to get price for {symbol}")
         return None
     
-    def handle_demo_position_monitoring(self):
+    def spread_acceptable(self, symbol: str) -> bool:
+        """Check the cached bid/ask spread before opening a position; the quote is refreshed by the caller"""
+        spread = self.price_cache.peek_spread(symbol)
+        if spread is not None and spread > self.max_spread_pct:
+            self.logger.warning(f"Spread for {symbol} is {spread*100:.2f}%, above the {self.max_spread_pct*100:.2f}% limit")
+            return False
+        return True
+
+    def on_stream_ticker(self, symbol: str, snapshot):
+        """Check exits for an open demo position as soon as its price moves"""
+        if symbol in self.demo_positions:
+            self._schedule_stream_task(('exit', symbol), self.exchange.run_blocking,
+                                       self.handle_demo_position_monitoring, [symbol])
+
+    def handle_demo_position_monitoring(self, symbols: Optional[List[str]] = None):
         """Enhanced position monitoring with dynamic exit strategies"""
+        # Fetch prices first so no exchange request runs under the lock
+        prices = self.position_prices(symbols)
+        # Ticker events and the trading cycle may check positions concurrently
+        with self.ledger_lock:
+            return self._monitor_demo_positions(prices, symbols)
+
+    def _monitor_demo_positions(self, prices: Dict[str, Optional[float]], symbols: Optional[List[str]] = None):
         try:
             current_time = datetime.now()
             positions_to_close = []  # Track positions that need to be closed
+            # Per-tick checks from the stream only log at debug level
+            log = self.logger.info if symbols is None else self.logger.debug
             
-            for symbol, position in self.demo_positions.items():
-                current_price = self.get_latest_price(symbol)
+            # Make the trigger index match the open positions once per cycle
+            if symbols is None:
+                self.position_triggers.sync(self.demo_positions, current_time)
+            
+            for symbol, position in list(self.demo_positions.items()):
+                if symbols is not None and symbol not in symbols:
+                    continue
+                current_price = prices.get(symbol)
                 if not current_price:
                     self.logger.warning(f"Could not get current price for {symbol}")
                     continue
                     
                 entry_price = position['entry_price']
                 quantity = position['volume']
-                entry_time = position['entry_time']
-                position_age = (current_time - entry_time).total_seconds() / 3600  # Hours
                 
                 # Calculate position metrics
-                position_value = quantity * current_price
                 unrealized_pnl = (current_price - entry_price) * quantity
                 pnl_percentage = ((current_price - entry_price) / entry_price) * 100
                 
-                # Update high price if we have a new high
-                if current_price > position['high_price']:
-                    position['high_price'] = current_price
-                
                 # Log position status
-                self.logger.info(f"\nPosition Update - {symbol}:")
-                self.logger.info(f"Quantity: {quantity:.8f}")
-                self.logger.info(f"Entry: ${entry_price:.8f}")
-                self.logger.info(f"Current: ${current_price:.8f}")
-                self.logger.info(f"P&L: ${unrealized_pnl:.2f} ({pnl_percentage:.2f}%)")
-                
-                # TIGHTER STOP LOSS - Reduced from 0.8% to 0.6%
-                base_stop_loss_pct = 0.006  # 0.6% initial stop loss
-                
-                # ADVANCED AGE-BASED STOP LOSS ADJUSTMENT
-                # Tighten stop loss as position ages
-                stop_loss_pct = base_stop_loss_pct
-                
-                if position_age > 12:  # Reduced from 24 to 12 hours
-                    # Tighten stop loss significantly for older positions
-                    if pnl_percentage > 0.5:  # In profit > 0.5%
-                        stop_loss_pct = 0  # Move to breakeven
-                        self.logger.info(f"Position age: {position_age:.1f} hours, moved stop to breakeven")
-                    else:
-                        # If losing and old, exit quicker
-                        stop_loss_pct = base_stop_loss_pct * 0.7  # 30% tighter
-                        self.logger.info(f"Position age: {position_age:.1f} hours, tightened stop by 30%")
-                
-                # IMPROVED TRAILING STOP - More aggressive trailing
-                # Use tiered trailing stops based on profit level
-                trailing_stop_pct = self.trailing_stop_pct  # Base trailing stop
-                
-                if pnl_percentage > 5.0:  # Large profit (>5%)
-                    trailing_stop_pct = 0.02  # Wider 2% trailing stop to let profits run
-                    self.logger.info(f"Using wider trailing stop (2%) for large profit position")
-                elif pnl_percentage > 2.0:  # Medium profit (2-5%)
-                    trailing_stop_pct = 0.015  # Medium 1.5% trailing stop
-                    self.logger.info(f"Using medium trailing stop (1.5%) for profitable position")
-                elif pnl_percentage > 0.8:  # Small profit (0.8-2%)
-                    trailing_stop_pct = 0.01  # Tighter 1% trailing stop
-                    self.logger.info(f"Using tight trailing stop (1%) to protect small profit")
-                
-                # FASTER EXIT ON REVERSAL SIGNALS
-                try:
-                    df = self.k.get_ohlc_data(symbol, interval=5, since=time.time()-86400)[0]
-                    if df is not None and len(df) > 20:
-                        # Add more sophisticated trend reversal detection
-                        short_ma = df['close'].rolling(5).mean().iloc[-1]
-                        med_ma = df['close'].rolling(10).mean().iloc[-1]
-                        
-                        # If shorter MA crosses below medium MA and we're in profit, exit
-                        if short_ma < med_ma and pnl_percentage > 0.3:  # Lowered threshold from 0.5% to 0.3%
-                            self.logger.info(f"Trend reversal detected, taking profits at {pnl_percentage:.2f}%")
-                            positions_to_close.append({
-                                'symbol': symbol,
-                                'reason': 'trend_reversal',
-                                'price': current_price
-                            })
-                            continue
-                except:
-                    pass
-                
-                # Check take profit with dynamic target
-                # Lower the take profit target from 2.5% to 1.8%
-                take_profit_pct = 0.018  # 1.8% take profit
-                
-                if pnl_percentage >= take_profit_pct * 100:
-                    self.logger.info(f"Take profit triggered for {symbol} at {pnl_percentage:.2f}%")
+                log(f"\nPosition Update - {symbol}:")
+                log(f"Quantity: {quantity:.8f}")
+                log(f"Entry: ${entry_price:.8f}")
+                log(f"Current: ${current_price:.8f}")
+                log(f"P&L: ${unrealized_pnl:.2f} ({pnl_percentage:.2f}%)")
+                
+                self.position_triggers.track(symbol, position, now=current_time)
+                if symbols is None:
+                    # 5/10 MA crossover from the stored candle window
+                    self.position_triggers.set_reversal(
+                        symbol, ma_reversal(self.candle_store.get_window(symbol, 1)), current_time)
+                
+                # Only exits whose trigger price this tick crossed are evaluated
+                for _, reason in self.position_triggers.on_price(symbol, current_price, current_time):
+                    self.logger.info(f"Exit triggered for {symbol}: {reason.replace('_', ' ')} at {pnl_percentage:.2f}%")
                     positions_to_close.append({
                         'symbol': symbol,
-                        'reason': 'take_profit',
+                        'reason': reason,
                         'price': current_price
                     })
-                    continue
-                
-                # Check stop loss with dynamic adjustment
-                if pnl_percentage <= -stop_loss_pct * 100:
-                    self.logger.info(f"Stop loss triggered for {symbol} at {pnl_percentage:.2f}%")
-                    positions_to_close.append({
-                        'symbol': symbol,
-                        'reason': 'stop_loss',
-                        'price': current_price
-                    })
-                    continue
-                
-                # Check trailing stop (only in profit)
-                if pnl_percentage > 0.8:  # Lowered from 1.0% to 0.8%
-                    highest_price = position['high_price']
-                    trailing_stop_price = highest_price * (1 - trailing_stop_pct)
-                    
-                    if current_price < trailing_stop_price:
-                        self.logger.info(f"Trailing stop triggered for {symbol} at ${current_price:.8f}")
-                        positions_to_close.append({
-                            'symbol': symbol,
-                            'reason': 'trailing_stop',
-                            'price': current_price
-                        })
-                        continue
-                
-                # Time-based exit - much faster (12h vs 24h)
-                if position_age > 12 and pnl_percentage < 0:  # Reduced from 24h to 12h
-                    self.logger.info(f"Time-based exit for losing position {symbol} after {position_age:.1f} hours")
-                    positions_to_close.append({
-                        'symbol': symbol,
-                        'reason': 'time_exit',
-                        'price': current_price
-                    })
-                    continue
-                
-                # Maximum drawdown protection (unchanged)
-                if pnl_percentage <= -self.max_drawdown * 100:
-                    self.logger.info(f"Maximum drawdown triggered for {symbol} at {pnl_percentage:.2f}%")
-                    positions_to_close.append({
-                        'symbol': symbol,
-                        'reason': 'max_drawdown',
-                        'price': current_price
-                    })
-                    continue
                     
             # Close positions that triggered exit conditions
             for close_order in positions_to_close:
                 symbol = close_order['symbol']
-                self.execute_trade_demo(
+                self._execute_trade_demo(
                     symbol=symbol,
                     signal={'action': 'sell', 'confidence': 1.0},
-                    price=close_order['price']
+                    price=close_order['price'],
+                    prices=prices
                 )
                 
-            # Update portfolio history
-            total_equity = self.calculate_total_equity()
-            self.portfolio_history.append({
-                'timestamp': current_time,
-                'balance': self.demo_balance['ZUSD'],
-                'equity': total_equity
-            })
+            # Update portfolio history once per cycle, not on every tick
+            if symbols is None or positions_to_close:
+                total_equity = self._equity(prices)
+                self.portfolio_history.append({
+                    'timestamp': current_time,
+                    'balance': self.demo_balance['ZUSD'],
+                    'equity': total_equity
+                })
+                self.journal.append('equity', {'equity': self.portfolio_history[-1]}, durable=False)
             
             return True
         except Exception as e:
@@ -2929,32 +2337,12 @@ class DemoKrakenBot:
     def init_database(self):  # Changed method name to avoid conflict
         """Initialize database tables"""
         try:
-            conn = sqlite3.connect(self.db_name)
-            c = conn.cursor()
-        
-            # Create tables
-            c.execute('''CREATE TABLE IF NOT EXISTS demo_balance
-                        (currency TEXT PRIMARY KEY, amount REAL)''')
-                        
-            c.execute('''CREATE TABLE IF NOT EXISTS demo_positions
-                        (symbol TEXT PRIMARY KEY, volume REAL, entry_price REAL, 
-                        entry_time TEXT, high_price REAL)''')
-                        
-            c.execute('''CREATE TABLE IF NOT EXISTS demo_trade_history
-                        (timestamp TEXT, symbol TEXT, type TEXT, price REAL,
-                        quantity REAL, value REAL, balance_after REAL)''')
-                        
-            c.execute('''CREATE TABLE IF NOT EXISTS demo_portfolio_history
-                        (timestamp TEXT, balance REAL, equity REAL)''')
-        
-            # Initialize demo balance if empty
-            c.execute('SELECT COUNT(*) FROM demo_balance')
-            if c.fetchone()[0] == 0:
-                c.execute('INSERT INTO demo_balance VALUES (?, ?)',
-                         ('ZUSD', self.demo_balance['ZUSD']))
-        
-            conn.commit()
-            conn.close()
+            # One long-lived connection that writes only what changed
+            self.state_store = DemoStateStore(self.db_name, self.storage)
+            self.state_store.init_balance({'ZUSD': self.demo_balance['ZUSD']})
+            
+            # Fills are journaled as they happen; saves snapshot and compact it
+            self.journal = DemoJournal(os.environ.get('DEMO_JOURNAL', 'demo_journal.jsonl'))
             self.logger.info("Database initialized successfully")
             
         except Exception as e:
@@ -2964,72 +2352,22 @@ class DemoKrakenBot:
     def load_demo_state(self) -> None:
         """Load demo bot state from database"""
         try:
-            conn = sqlite3.connect(self.db_name)
-            c = conn.cursor()
+            state = self.state_store.load()
+            
+            # Replay what was journaled after the last snapshot, e.g. before a crash
+            replayed = sum(apply_event(state, event) for event in self.journal.events(state['journal_seq']))
+            if state['balance']:
+                self.demo_balance = state['balance']
+            if state['positions']:
+                self.demo_positions = state['positions']
+            if state['trades']:
+                self.trade_history = TradeHistory(self.trade_history.capacity, state['trades'])
+            if state['portfolio']:
+                self.portfolio_history = EquityHistory(self.portfolio_history.capacity, state['portfolio'])
+            if replayed:
+                self.logger.info(f"Recovered {replayed} journaled demo events")
+                self.save_demo_state()
         
-            # Create tables if they don't exist
-            c.execute('''CREATE TABLE IF NOT EXISTS demo_balance
-                        (currency TEXT PRIMARY KEY, amount REAL)''')
-                        
-            c.execute('''CREATE TABLE IF NOT EXISTS demo_positions
-                        (symbol TEXT PRIMARY KEY, volume REAL, entry_price REAL, 
-                        entry_time TEXT, high_price REAL)''')
-                        
-            c.execute('''CREATE TABLE IF NOT EXISTS demo_trade_history
-                        (timestamp TEXT, symbol TEXT, type TEXT, price REAL,
-                        quantity REAL, value REAL, balance_after REAL)''')
-                        
-            c.execute('''CREATE TABLE IF NOT EXISTS demo_portfolio_history
-                        (timestamp TEXT, balance REAL, equity REAL)''')
-        
-            # Load balance data
-            c.execute('SELECT * FROM demo_balance')
-            balance_data = c.fetchall()
-            if balance_data:
-                self.demo_balance = {row[0]: row[1] for row in balance_data}
-        
-            # Load positions
-            c.execute('SELECT * FROM demo_positions')
-            position_data = c.fetchall()
-            if position_data:
-                self.demo_positions = {}
-                for row in position_data:
-                    self.demo_positions[row[0]] = {
-                        'volume': row[1],
-                        'entry_price': row[2],
-                        'entry_time': datetime.fromisoformat(row[3]),
-                        'high_price': row[4]
-                    }
-        
-            # Load trade history
-            c.execute('SELECT * FROM demo_trade_history')
-            trade_data = c.fetchall()
-            if trade_data:
-                self.trade_history = []
-                for row in trade_data:
-                    self.trade_history.append({
-                        'timestamp': datetime.fromisoformat(row[0]),
-                        'symbol': row[1],
-                        'type': row[2],
-                        'price': row[3],
-                        'quantity': row[4],
-                        'value': row[5],
-                        'balance_after': row[6]
-                    })
-        
-            # Load portfolio history
-            c.execute('SELECT * FROM demo_portfolio_history ORDER BY timestamp DESC LIMIT 100')
-            portfolio_data = c.fetchall()
-            if portfolio_data:
-                self.portfolio_history = []
-                for row in portfolio_data:
-                    self.portfolio_history.append({
-                        'timestamp': datetime.fromisoformat(row[0]),
-                        'balance': row[1],
-                        'equity': row[2]
-                    })
-        
-            conn.close()
             self.logger.info("Demo state loaded successfully")
             
             # Log current state
@@ -3045,45 +2383,24 @@ class DemoKrakenBot:
     def save_demo_state(self):
         """Save current demo state to database"""
         try:
-            conn = sqlite3.connect(self.db_name)
-            c = conn.cursor()
-        
-            # Save current balance
-            c.execute('DELETE FROM demo_balance')
-            for currency, amount in self.demo_balance.items():
-                c.execute('INSERT INTO demo_balance VALUES (?, ?)',
-                         (currency, amount))
-        
-            # Save positions
-            c.execute('DELETE FROM demo_positions')
-            for symbol, pos in self.demo_positions.items():
-                c.execute('INSERT INTO demo_positions VALUES (?, ?, ?, ?, ?)',
-                         (symbol, pos['volume'], pos['entry_price'],
-                          pos['entry_time'].isoformat(), pos['high_price']))
-        
-            # Save trade history
-            c.execute('DELETE FROM demo_trade_history')
-            for trade in self.trade_history:
-                c.execute('''INSERT INTO demo_trade_history 
-                            VALUES (?, ?, ?, ?, ?, ?, ?)''',
-                         (trade['timestamp'].isoformat(), trade['symbol'],
-                          trade['type'], trade['price'], trade['quantity'],
-                          trade['value'], trade['balance_after']))
-        
-            # Save portfolio history
-            c.execute('DELETE FROM demo_portfolio_history')
-            for entry in self.portfolio_history:
-                c.execute('INSERT INTO demo_portfolio_history VALUES (?, ?, ?)',
-                         (entry['timestamp'].isoformat(), entry['balance'],
-                          entry['equity']))
-        
-            conn.commit()
-            conn.close()
-            self.logger.info("Demo state saved successfully")
+            # Everything journaled so far is in memory, so the snapshot covers it;
+            # no fill may land between reading the sequence and the snapshot
+            with self.ledger_lock:
+                journal_seq = self.journal.last_seq
+                written = self.state_store.save(self.demo_balance, self.demo_positions,
+                                                self.trade_history, self.portfolio_history, journal_seq)
+            self.journal.compact(journal_seq)
+            self.logger.info(f"Demo state saved successfully ({sum(written.values())} rows written)")
         
         except Exception as e:
             self.logger.error(f"Error saving demo state: {str(e)}")
 
+    def shutdown(self):
+        """Release the bot's worker threads once its run loop has stopped"""
+        self.running = False
+        self.training_worker.shutdown()
+        self.exchange.shutdown()
+
     async def run(self):
         """Main run loop for demo trading bot"""
         cleanup_interval = 3600  # Cleanup every hour
@@ -3099,25 +2416,24 @@ class DemoKrakenBot:
             for symbol, allocation in self.symbols.items():
                 self.logger.info(f"  {symbol}: {allocation*100:.1f}% allocation")
             
-            # Initialize rate limiter
-            rate_limiter = DemoRateLimiter()
-            
             # Initial data collection and model training
             self.logger.info("\nInitial Setup Phase:")
-            if not self.training_completed:
-                self.logger.info("Starting initial model training...")
-                training_success = await self.perform_initial_training()
-                if not training_success:
-                    self.logger.error("Initial training failed!")
-                    return
-                self.logger.info("Initial training completed successfully!")
+            # Reuse the latest compatible models instead of retraining from scratch
+            if not self.training_completed and self.load_models():
                 self.training_completed = True
-                self.is_initially_trained = True
+            
+            # Train in the background so the trading loop starts right away
+            if not self.training_completed:
+                self.logger.info("Starting initial model training in the background...")
+                self.training_task = asyncio.create_task(self.run_initial_training())
             
             # Initialize position tracking
             self.logger.info("Initializing position tracking...")
             await self.initialize_position_tracking()
             
+            # Event-driven prices and candles when streaming is enabled
+            await self.start_market_stream()
+            
             self.logger.info("\nStarting main trading loop...")
             while self.running:
                 try:
@@ -3126,8 +2442,11 @@ class DemoKrakenBot:
                     self.logger.info(f"\n=== Trading Cycle {cycle_count} ===")
                     self.logger.info(f"Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
                     
-                    # Reset balance if needed
-                    self.check_and_reset_balance()
+                    # One batched ticker refresh serves every price lookup this cycle
+                    await self.exchange.run_blocking(self.price_cache.refresh)
+                    
+                    # Reset balance if needed; a reset saves the state, so it runs off the loop
+                    await self.exchange.run_blocking(self.check_and_reset_balance)
                     
                     # Check if cleanup is needed
                     if current_time - last_cleanup > cleanup_interval:
@@ -3135,26 +2454,24 @@ class DemoKrakenBot:
                         self.cleanup_old_data()
                         last_cleanup = current_time
                     
-                    # Update portfolio status
-                    metrics = self.get_portfolio_metrics()
+                    # Update portfolio status (values positions at live prices)
+                    metrics = await self.exchange.run_blocking(self.get_portfolio_metrics)
                     self.logger.info("\nPortfolio Status:")
                     self.logger.info(f"Current Equity: ${metrics['current_equity']:.2f}")
                     self.logger.info(f"P&L: ${metrics['total_pnl']:.2f} ({metrics['pnl_percentage']:.2f}%)")
                     
                     # Save current state
-                    self.save_demo_state()
+                    await self.exchange.run_blocking(self.save_demo_state)
                     
-                    # Process each trading pair
-                    for symbol in self.symbols:
-                        await rate_limiter.wait()
+                    # Process each trading pair as soon as its market data arrives;
+                    # the fetches run concurrently within the public rate budget
+                    async for symbol, df in self.iter_market_data(self.symbols):
                         try:
                             self.logger.info(f"\nAnalyzing {symbol}:")
                             
-                            # Get market data
-                            df = await self.get_historical_data(symbol)
                             if df is not None and not df.empty:
-                                # Calculate indicators and generate signals
-                                df = self.calculate_indicators(df)
+                                # Advance the incremental indicators and generate signals
+                                df = self.feature_pipeline.transform(symbol, df)
                                 signal = self.generate_enhanced_signals(df, symbol)
                                 
                                 # Get current price and position info
@@ -3167,18 +2484,20 @@ class DemoKrakenBot:
                                 
                                 if signal['action'] != 'hold':
                                     if self.check_market_conditions(symbol, df):
-                                        position_size = self.calculate_position_size(symbol, signal)
+                                        position_size = await self.exchange.run_blocking(
+                                            self.calculate_position_size, symbol, signal
+                                        )
                                         if position_size >= self.min_position_value:
                                             self.logger.info(f"Executing {signal['action'].upper()} order:")
                                             self.logger.info(f"Position Size: ${position_size:.2f}")
                                             
-                                            trade_result = self.execute_trade_demo(
-                                                symbol, signal, current_price
+                                            trade_result = await self.exchange.run_blocking(
+                                                self.execute_trade_demo, symbol, signal, current_price
                                             )
                                             
+                                            # The fill was journaled; the next cycle's save snapshots it
                                             if trade_result:
                                                 self.logger.info("Trade executed successfully")
-                                                self.save_demo_state()
                                             else:
                                                 self.logger.warning("Trade execution failed")
                                         else:
@@ -3196,8 +2515,9 @@ class DemoKrakenBot:
                     # Monitor positions
                     self.logger.info("\nMonitoring existing positions...")
                     if len(self.demo_positions) > 0:
-                        # Use special demo handler instead of API-based monitoring
-                        self.handle_demo_position_monitoring()
+                        # Use special demo handler instead of API-based monitoring;
+                        # it fetches prices, so keep it off the event loop
+                        await self.exchange.run_blocking(self.handle_demo_position_monitoring)
                     else:
                         self.logger.info("No positions to monitor")
                     
@@ -3223,6 +2543,8 @@ class DemoKrakenBot:
         except Exception as e:
             self.logger.error(f"Fatal error in bot run loop: {str(e)}")
             traceback.print_exc()
+        finally:
+            self.shutdown()
 
 async def main():
     # Initialize and run the bot
@@ -0,0 +1,186 @@
+# backend/bot/demo_journal.py
+import os
+import json
+import time
+import logging
+import threading
+from datetime import datetime
+from typing import Iterator, Optional
+
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if hasattr(value, 'item'):
+        return value.item()
+    raise TypeError(f"Cannot journal {type(value).__name__}")
+
+
+def _parse_time(value):
+    return datetime.fromisoformat(value) if isinstance(value, str) else value
+
+
+class DemoJournal:
+    """Append-only write-ahead journal of demo ledger events, one JSON object per line.
+
+    Every event gets a sequence number. An append returns once the event is
+    on disk; appends that arrive while an fsync is in flight are covered
+    together by the next one (group commit), so concurrent fills share the
+    cost of a sync. Snapshots record the sequence number they include, and
+    ``compact`` then drops the events the snapshot made redundant. A line
+    torn by a crash mid-write is cut off when the journal is reopened.
+    """
+
+    def __init__(self, path: str = 'demo_journal.jsonl', fsync: bool = True):
+        self.logger = logging.getLogger("DemoJournal")
+        self.path = path
+        self.fsync = fsync
+        self.syncs = 0
+        self._lock = threading.Lock()
+        self._cond = threading.Condition()
+        self._syncing = False
+        self.last_seq = self._recover_tail()
+        self._written_seq = self.last_seq
+        self._synced_seq = self.last_seq
+        self._file = open(self.path, 'a', encoding='utf-8')
+
+    def _recover_tail(self) -> int:
+        """Sequence number of the last complete event; truncates a partial last line"""
+        if not os.path.exists(self.path):
+            return 0
+        last_seq, good_bytes = 0, 0
+        with open(self.path, 'rb') as f:
+            for line in f:
+                try:
+                    last_seq = json.loads(line)['seq'] if line.endswith(b'\n') else None
+                except (ValueError, KeyError):
+                    last_seq = None
+                if last_seq is None:
+                    break
+                good_bytes += len(line)
+        if good_bytes < os.path.getsize(self.path):
+            self.logger.warning(f"Discarding a partially written event at the end of {self.path}")
+            with open(self.path, 'r+b') as f:
+                f.truncate(good_bytes)
+            return self._recover_tail()
+        return last_seq
+
+    def append(self, kind: str, data: dict, durable: bool = True) -> int:
+        """Journal one event; with durable, returns only once it has been fsync'd"""
+        with self._lock:
+            seq = self.last_seq + 1
+            self._file.write(json.dumps({'seq': seq, 'kind': kind, 'logged_at': time.time(), **data},
+                                        default=_encode) + '\n')
+            self._file.flush()
+            self.last_seq = self._written_seq = seq
+        if durable:
+            self.sync(seq)
+        return seq
+
+    def sync(self, seq: Optional[int] = None):
+        """Wait until every event up to seq is on disk, leading an fsync if none is in flight"""
+        seq = self._written_seq if seq is None else seq
+        with self._cond:
+            while self._synced_seq < seq:
+                if self._syncing:
+                    self._cond.wait()
+                    continue
+                self._syncing = True
+                target = self._written_seq
+                self._cond.release()
+                synced = False
+                try:
+                    if self.fsync:
+                        os.fsync(self._file.fileno())
+                    synced = True
+                finally:
+                    self._cond.acquire()
+                    self._syncing = False
+                    if synced:
+                        self._synced_seq = max(self._synced_seq, target)
+                        self.syncs += 1
+                    self._cond.notify_all()
+
+    def events(self, after_seq: int = 0) -> Iterator[dict]:
+        """Journaled events with a sequence number above after_seq, oldest first"""
+        with self._lock:
+            self._file.flush()
+            with open(self.path, encoding='utf-8') as f:
+                lines = f.readlines()
+        for line in lines:
+            event = json.loads(line)
+            if event['seq'] > after_seq:
+                yield event
+
+    def compact(self, upto_seq: int):
+        """Drop the events a snapshot up to upto_seq already contains"""
+        with self._lock:
+            with self._cond:
+                while self._syncing:
+                    self._cond.wait()
+                self._syncing = True
+            try:
+                self._file.close()
+                with open(self.path, encoding='utf-8') as f:
+                    kept = [line for line in f if json.loads(line)['seq'] > upto_seq]
+                tmp_path = self.path + '.tmp'
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    f.writelines(kept)
+                    f.flush()
+                    if self.fsync:
+                        os.fsync(f.fileno())
+                os.replace(tmp_path, self.path)
+                self._sync_directory()
+            finally:
+                self._file = open(self.path, 'a', encoding='utf-8')
+                with self._cond:
+                    self._syncing = False
+                    self._synced_seq = max(self._synced_seq, self._written_seq)
+                    self._cond.notify_all()
+
+    def _sync_directory(self):
+        # The rename is only durable once the directory entry is
+        if not self.fsync or not hasattr(os, 'O_DIRECTORY'):
+            return
+        fd = os.open(os.path.dirname(os.path.abspath(self.path)), os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def close(self):
+        self.sync()
+        with self._lock:
+            self._file.close()
+
+
+def apply_event(state: dict, event: dict) -> bool:
+    """Replay one journaled event onto a loaded demo state; False if the state already had it.
+
+    Balances and positions are journaled as their values after the event, so
+    replaying an event the snapshot already reflects leaves the state as is,
+    and trades and equity points newer than the state's last one are appended.
+    """
+    kind = event['kind']
+    applied = False
+    if 'balance' in event:
+        applied |= any(state['balance'].get(currency) != amount for currency, amount in event['balance'].items())
+        state['balance'].update(event['balance'])
+    if kind == 'fill':
+        symbol, position = event['symbol'], event.get('position')
+        if position is None:
+            applied |= state['positions'].pop(symbol, None) is not None
+        else:
+            position = dict(position, entry_time=_parse_time(position['entry_time']))
+            applied |= state['positions'].get(symbol) != position
+            state['positions'][symbol] = position
+        trade = dict(event['trade'], timestamp=_parse_time(event['trade']['timestamp']))
+        if not state['trades'] or trade['timestamp'] > state['trades'][-1]['timestamp']:
+            state['trades'].append(trade)
+            applied = True
+    if event.get('equity'):
+        point = dict(event['equity'], timestamp=_parse_time(event['equity']['timestamp']))
+        if not state['portfolio'] or point['timestamp'] > state['portfolio'][-1]['timestamp']:
+            state['portfolio'].append(point)
+            applied = True
+    return applied
@@ -0,0 +1,179 @@
+# backend/bot/demo_state_store.py
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from .storage import SQLiteStorage, get_storage
+
+
+class DemoStateStore:
+    """Incremental SQLite persistence of the demo account.
+
+    Trades and equity points are append-only: a save inserts just the entries
+    newer than the newest one already stored (the table's high-water mark).
+    Balances and positions are compared with what was last written, and only
+    changed rows are upserted or deleted. Each save is one transaction of
+    executemany batches on a pooled long-lived connection, so its cost follows
+    the number of changes, not the length of the history.
+    """
+
+    def __init__(self, db_name: str = 'crypto_trading.db', storage: Optional[SQLiteStorage] = None):
+        self.logger = logging.getLogger("DemoStateStore")
+        self.db_name = db_name
+        self.storage = storage or get_storage(db_name)
+        # Saves come from the event loop and from the exchange I/O threads
+        self._lock = threading.Lock()
+        self._balance: Dict[str, float] = {}
+        self._positions: Dict[str, tuple] = {}
+        self._marks: Dict[str, Optional[datetime]] = {'demo_trade_history': None, 'demo_portfolio_history': None}
+        self.create_tables()
+
+    def create_tables(self):
+        with self._lock, self.storage.transaction() as conn:
+            conn.execute('''CREATE TABLE IF NOT EXISTS demo_balance
+                                 (currency TEXT PRIMARY KEY, amount REAL)''')
+            conn.execute('''CREATE TABLE IF NOT EXISTS demo_positions
+                                 (symbol TEXT PRIMARY KEY, volume REAL, entry_price REAL,
+                                 entry_time TEXT, high_price REAL)''')
+            conn.execute('''CREATE TABLE IF NOT EXISTS demo_trade_history
+                                 (timestamp TEXT, symbol TEXT, type TEXT, price REAL,
+                                 quantity REAL, value REAL, balance_after REAL)''')
+            conn.execute('''CREATE TABLE IF NOT EXISTS demo_portfolio_history
+                                 (timestamp TEXT, balance REAL, equity REAL)''')
+            conn.execute('''CREATE TABLE IF NOT EXISTS demo_meta
+                                 (key TEXT PRIMARY KEY, value TEXT)''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_demo_trade_history_ts ON demo_trade_history (timestamp)')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_demo_portfolio_history_ts '
+                              'ON demo_portfolio_history (timestamp)')
+
+    def init_balance(self, balance: Dict[str, float]):
+        """Store the starting balance if none has been saved yet"""
+        with self._lock, self.storage.transaction() as conn:
+            if conn.execute('SELECT COUNT(*) FROM demo_balance').fetchone()[0] == 0:
+                conn.executemany('INSERT INTO demo_balance VALUES (?, ?)', list(balance.items()))
+
+    def load(self, portfolio_limit: int = 100) -> dict:
+        """Stored balance, positions, trades, the latest equity points (oldest first) and journal position"""
+        with self._lock:
+            c = self.storage.connection().cursor()
+            balance = {row[0]: row[1] for row in c.execute('SELECT currency, amount FROM demo_balance')}
+            positions = {
+                row[0]: {
+                    'volume': row[1],
+                    'entry_price': row[2],
+                    'entry_time': datetime.fromisoformat(row[3]),
+                    'high_price': row[4]
+                }
+                for row in c.execute('SELECT symbol, volume, entry_price, entry_time, high_price FROM demo_positions')
+            }
+            trades = [
+                {
+                    'timestamp': datetime.fromisoformat(row[0]),
+                    'symbol': row[1],
+                    'type': row[2],
+                    'price': row[3],
+                    'quantity': row[4],
+                    'value': row[5],
+                    'balance_after': row[6]
+                }
+                for row in c.execute('SELECT * FROM demo_trade_history ORDER BY timestamp')
+            ]
+            rows = c.execute('SELECT * FROM demo_portfolio_history ORDER BY timestamp DESC LIMIT ?',
+                             (portfolio_limit,)).fetchall()
+            portfolio = [
+                {'timestamp': datetime.fromisoformat(row[0]), 'balance': row[1], 'equity': row[2]}
+                for row in reversed(rows)
+            ]
+
+            self._balance = dict(balance)
+            self._positions = {symbol: self._position_row(pos) for symbol, pos in positions.items()}
+            for table in self._marks:
+                latest = c.execute(f'SELECT MAX(timestamp) FROM {table}').fetchone()[0]
+                self._marks[table] = datetime.fromisoformat(latest) if latest else None
+            row = c.execute("SELECT value FROM demo_meta WHERE key = 'journal_seq'").fetchone()
+        return {'balance': balance, 'positions': positions, 'trades': trades, 'portfolio': portfolio,
+                'journal_seq': int(row[0]) if row else 0}
+
+    @classmethod
+    def _position_row(cls, position: dict) -> tuple:
+        return (position['volume'], position['entry_price'], position['entry_time'].isoformat(),
+                position['high_price'])
+
+    @staticmethod
+    def _unsaved(entries: List[dict], mark: Optional[datetime]) -> List[dict]:
+        """Entries newer than mark, found by scanning back from the end of the list"""
+        if mark is None:
+            return list(entries)
+        start = len(entries)
+        while start > 0 and entries[start - 1]['timestamp'] > mark:
+            start -= 1
+        return entries[start:]
+
+    def save(self, balance: Dict[str, float], positions: Dict[str, dict], trades: List[dict],
+             portfolio: List[dict], journal_seq: Optional[int] = None) -> dict:
+        """Write what changed since the last save in one transaction; returns the rows written per table.
+
+        journal_seq records the last DemoJournal event the saved state includes.
+        """
+        with self._lock:
+            balance_rows = [(currency, amount) for currency, amount in balance.items()
+                            if self._balance.get(currency) != amount]
+            removed_currencies = [(currency,) for currency in self._balance if currency not in balance]
+
+            position_rows = {symbol: self._position_row(pos) for symbol, pos in positions.items()}
+            changed_positions = [(symbol, *row) for symbol, row in position_rows.items()
+                                 if self._positions.get(symbol) != row]
+            removed_positions = [(symbol,) for symbol in self._positions if symbol not in positions]
+
+            new_trades = self._unsaved(trades, self._marks['demo_trade_history'])
+            new_points = self._unsaved(portfolio, self._marks['demo_portfolio_history'])
+
+            with self.storage.transaction() as conn:
+                conn.executemany('''INSERT INTO demo_balance VALUES (?, ?)
+                                         ON CONFLICT(currency) DO UPDATE SET amount = excluded.amount''',
+                                      balance_rows)
+                conn.executemany('DELETE FROM demo_balance WHERE currency = ?', removed_currencies)
+                conn.executemany('''INSERT INTO demo_positions VALUES (?, ?, ?, ?, ?)
+                                         ON CONFLICT(symbol) DO UPDATE SET volume = excluded.volume,
+                                         entry_price = excluded.entry_price, entry_time = excluded.entry_time,
+                                         high_price = excluded.high_price''',
+                                      changed_positions)
+                conn.executemany('DELETE FROM demo_positions WHERE symbol = ?', removed_positions)
+                conn.executemany('INSERT INTO demo_trade_history VALUES (?, ?, ?, ?, ?, ?, ?)', [
+                    (trade['timestamp'].isoformat(), trade['symbol'], trade['type'], trade['price'],
+                     trade['quantity'], trade['value'], trade['balance_after'])
+                    for trade in new_trades
+                ])
+                conn.executemany('INSERT INTO demo_portfolio_history VALUES (?, ?, ?)', [
+                    (entry['timestamp'].isoformat(), entry['balance'], entry['equity'])
+                    for entry in new_points
+                ])
+                if journal_seq is not None:
+                    conn.execute('''INSERT INTO demo_meta VALUES ('journal_seq', ?)
+                                         ON CONFLICT(key) DO UPDATE SET value = excluded.value''',
+                                      (str(journal_seq),))
+
+            # Only advance the snapshots once the transaction has committed
+            self._balance = dict(balance)
+            self._positions = position_rows
+            if new_trades:
+                self._marks['demo_trade_history'] = new_trades[-1]['timestamp']
+            if new_points:
+                self._marks['demo_portfolio_history'] = new_points[-1]['timestamp']
+
+        return {
+            'demo_balance': len(balance_rows) + len(removed_currencies),
+            'demo_positions': len(changed_positions) + len(removed_positions),
+            'demo_trade_history': len(new_trades),
+            'demo_portfolio_history': len(new_points)
+        }
+
+    def trim(self, trades_since: Optional[datetime] = None, portfolio_since: Optional[datetime] = None):
+        """Delete stored trades and equity points older than the given times"""
+        with self._lock, self.storage.transaction() as conn:
+            if trades_since is not None:
+                conn.execute('DELETE FROM demo_trade_history WHERE timestamp < ?', (trades_since.isoformat(),))
+            if portfolio_since is not None:
+                conn.execute('DELETE FROM demo_portfolio_history WHERE timestamp < ?',
+                                  (portfolio_since.isoformat(),))
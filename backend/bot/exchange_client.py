@@ -0,0 +1,92 @@
+# backend/bot/exchange_client.py
+import asyncio
+import functools
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from .rate_limiter import KrakenRateLimiter, get_rate_limiter
+
+
+class AsyncKrakenClient:
+    """Awaitable adapter around the blocking krakenex/pykrakenapi clients.
+
+    Requests run on a small bounded thread pool so the event loop (shared with
+    the FastAPI app) never waits on an exchange round-trip. Each exchange call
+    gets a timeout; private calls are serialised because krakenex derives the
+    nonce from the clock and concurrent private requests could reuse one.
+    Requests are paced by the process-wide KrakenRateLimiter, private ones
+    against the budget of this client's API key, and the limiter is also hooked
+    into the underlying API so direct synchronous calls count too.
+    """
+
+    def __init__(self, kraken_api, max_workers: int = 4, timeout: float = 15.0,
+                 rate_limiter: Optional[KrakenRateLimiter] = None):
+        self.logger = logging.getLogger("AsyncKrakenClient")
+        self.k = kraken_api
+        self.api = kraken_api.api
+        self.timeout = timeout
+        self.rate_limiter = rate_limiter or get_rate_limiter()
+        self.rate_limiter.attach(self.api)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='kraken-io')
+        self._private_lock = threading.Lock()
+
+    async def run_blocking(self, fn, *args, **kwargs):
+        """Run arbitrary blocking code on the I/O pool without a timeout"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(fn, *args, **kwargs))
+
+    async def call(self, fn, *args, timeout: Optional[float] = None, **kwargs):
+        """Run a single blocking exchange request on the I/O pool with a timeout"""
+        try:
+            return await asyncio.wait_for(self.run_blocking(fn, *args, **kwargs),
+                                          timeout=timeout or self.timeout)
+        except asyncio.TimeoutError:
+            name = getattr(fn, '__name__', str(fn))
+            self.logger.warning(f"Kraken call {name} timed out after {timeout or self.timeout:.1f}s")
+            raise
+
+    async def call_public(self, endpoint: str, fn, *args, timeout: Optional[float] = None, **kwargs):
+        """Like call, but first waits on the event loop for the public budget of `endpoint`"""
+        await self.rate_limiter.acquire('public', endpoint)
+        return await self.call(self.rate_limiter.run_with_credit, 'public', endpoint, fn, *args,
+                               timeout=timeout, **kwargs)
+
+    def _private(self, endpoint, fn, *args, **kwargs):
+        with self._private_lock:
+            return self.rate_limiter.run_with_credit('private', endpoint, fn, *args, **kwargs)
+
+    async def call_private(self, endpoint: str, fn, *args, timeout: Optional[float] = None, **kwargs):
+        """Like call, but paced by the private counter and serialised with other signed requests"""
+        await self.rate_limiter.acquire('private', endpoint, key=self.api.key)
+        return await self.call(self._private, endpoint, fn, *args, timeout=timeout, **kwargs)
+
+    # Public endpoints
+
+    async def get_ohlc_data(self, pair: str, **kwargs):
+        return await self.call_public('OHLC', self.k.get_ohlc_data, pair, **kwargs)
+
+    async def get_recent_trades(self, pair: str, **kwargs):
+        return await self.call_public('Trades', self.k.get_recent_trades, pair, **kwargs)
+
+    async def get_ticker(self, pair: str) -> dict:
+        """Raw Ticker response for one or more comma separated pairs"""
+        return await self.call_public('Ticker', self.api.query_public, 'Ticker', {'pair': pair})
+
+    # Private endpoints
+
+    async def get_account_balance(self):
+        return await self.call_private('Balance', self.k.get_account_balance)
+
+    async def get_open_positions(self):
+        return await self.call_private('OpenPositions', self.k.get_open_positions)
+
+    async def get_open_orders(self):
+        return await self.call_private('OpenOrders', self.k.get_open_orders)
+
+    async def add_standard_order(self, **order_params):
+        return await self.call_private('AddOrder', self.k.add_standard_order, **order_params)
+
+    def shutdown(self, wait: bool = False):
+        self.executor.shutdown(wait=wait, cancel_futures=True)
@@ -0,0 +1,96 @@
+# backend/bot/feature_pipeline.py
+import logging
+from typing import List, Optional
+
+import pandas as pd
+
+from .indicator_engine import IndicatorEngine
+
+
+class FeaturePipeline:
+    """Single place where indicator features are computed for rules and models.
+
+    Indicators are computed once per candle set by the indicator engine and
+    the same frame is handed to the technical rules, the ML model and the AI
+    sequence models, which only select their declared columns from it.
+    """
+
+    # Columns used by MLModelManager, in model order
+    FEATURE_COLUMNS = [
+        'close',
+        'returns',
+        'log_returns',
+        'rolling_std_20',
+        'rolling_std_50',
+        'volume',
+        'volume_ma_ratio',
+        'volume_std',
+        'rsi',
+        'rsi_divergence',
+        'mom_14',
+        'mom_30',
+        'macd',
+        'macd_signal',
+        'macd_diff',
+        'bb_width',
+        'bb_position',
+        'sma_20',
+        'sma_50',
+        'sma_20_50_ratio',
+        'atr',
+        'adx',
+        'adx_pos',
+        'adx_neg'
+    ]
+
+    # Columns used by the AITradingEnhancer sequence models, in model order
+    SEQUENCE_FEATURES = [
+        'returns', 'log_returns', 'rolling_std_20', 'volume_ma_ratio',
+        'rsi', 'macd', 'bb_width', 'adx', 'sma_20'
+    ]
+
+    REQUIRED_COLUMNS = ['open', 'high', 'low', 'close', 'volume']
+
+    def __init__(self, engine: Optional[IndicatorEngine] = None):
+        self.logger = logging.getLogger("FeaturePipeline")
+        self.engine = engine if engine is not None else IndicatorEngine()
+
+    def has_features(self, df: pd.DataFrame, columns: Optional[List[str]] = None) -> bool:
+        """Check whether a frame already carries the given (or all) feature columns"""
+        columns = columns if columns is not None else self.FEATURE_COLUMNS
+        return all(col in df.columns for col in columns)
+
+    def _prepare_candles(self, candles: pd.DataFrame) -> pd.DataFrame:
+        missing_columns = [col for col in self.REQUIRED_COLUMNS if col not in candles.columns]
+        if missing_columns:
+            raise ValueError(f"Missing required columns: {missing_columns}")
+        if all(pd.api.types.is_float_dtype(candles[col]) for col in self.REQUIRED_COLUMNS):
+            return candles
+
+        candles = candles.copy()
+        for col in self.REQUIRED_COLUMNS:
+            candles[col] = pd.to_numeric(candles[col], errors='coerce')
+        return candles.dropna(subset=self.REQUIRED_COLUMNS)
+
+    def transform(self, symbol: str, candles: pd.DataFrame) -> pd.DataFrame:
+        """Add features to a live candle window, advancing the symbol's running state"""
+        if candles is None or candles.empty:
+            return candles
+        return self.engine.update(symbol, self._prepare_candles(candles))
+
+    def transform_history(self, candles: pd.DataFrame) -> pd.DataFrame:
+        """Add features to a historical frame without touching live state"""
+        if candles is None or candles.empty:
+            return candles
+        return self.engine.compute(self._prepare_candles(candles))
+
+    def ensure(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Return df unchanged if it already has features, otherwise compute them"""
+        if self.has_features(df):
+            return df
+        return self.transform_history(df)
+
+    def select(self, df: pd.DataFrame, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """Return the feature columns of df in declared order"""
+        columns = columns if columns is not None else self.FEATURE_COLUMNS
+        return self.ensure(df)[columns].copy()
@@ -0,0 +1,602 @@
+# backend/bot/indicator_engine.py
+import copy
+import math
+import logging
+import threading
+from collections import deque
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+# Columns produced by the engine, matching the names used by the signal rules
+# and by the ML/AI feature lists.
+INDICATOR_COLUMNS = [
+    'returns',
+    'log_returns',
+    'rolling_std_20',
+    'rolling_std_50',
+    'sma_short',
+    'sma_long',
+    'sma_20',
+    'sma_50',
+    'sma_20_50_ratio',
+    'volume_sma',
+    'volume_ma_ratio',
+    'volume_std',
+    'rsi',
+    'rsi_divergence',
+    'mom_14',
+    'mom_30',
+    'macd',
+    'macd_signal',
+    'macd_diff',
+    'bb_width',
+    'bb_position',
+    'atr',
+    'adx',
+    'adx_pos',
+    'adx_neg'
+]
+
+NAN = float('nan')
+
+
+def _div(numerator: float, denominator: float) -> float:
+    """Division that yields NaN instead of inf or ZeroDivisionError"""
+    if denominator == 0 or math.isnan(denominator) or math.isnan(numerator):
+        return NAN
+    return numerator / denominator
+
+
+def _wilder(values: np.ndarray, window: int, start: int = 0) -> np.ndarray:
+    """Vectorized WilderAverage over values[start:], seeded with the mean of the first window"""
+    result = np.full(len(values), NAN)
+    seed = start + window - 1
+    if seed >= len(values):
+        return result
+    tail = values[seed:].copy()
+    tail[0] = values[start:seed + 1].mean()
+    result[seed:] = pd.Series(tail).ewm(alpha=1 / window, adjust=False).mean().to_numpy()
+    return result
+
+
+def _safe_div(numerator, denominator):
+    """Element-wise _div"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(denominator == 0, NAN, numerator / denominator)
+
+
+def compute_indicators(high: np.ndarray, low: np.ndarray, close: np.ndarray, volume: np.ndarray,
+                       sma_short: int = 20, sma_long: int = 50, rsi_window: int = 14,
+                       macd_fast: int = 12, macd_slow: int = 26, macd_signal: int = 9,
+                       bb_window: int = 20, bb_dev: float = 2.0, atr_window: int = 14,
+                       adx_window: int = 14) -> np.ndarray:
+    """Indicator values for a whole history at once, ordered as INDICATOR_COLUMNS.
+
+    Produces the same numbers as feeding the candles through IndicatorState one
+    at a time, using pandas rolling/ewm kernels instead of a Python loop.
+    """
+    close_s = pd.Series(close)
+    volume_s = pd.Series(volume)
+
+    prev_close = close_s.shift(1)
+    diff = (close_s - prev_close).to_numpy()
+    returns = _safe_div(diff, prev_close.to_numpy())
+    with np.errstate(invalid='ignore'):
+        log_returns = np.where(returns > -1, np.log1p(np.where(returns > -1, returns, 0)), NAN)
+    returns_s = pd.Series(returns)
+
+    def sma(window):
+        return close_s.rolling(window, min_periods=1).mean().to_numpy()
+
+    sma_20 = sma(20)
+    sma_50 = sma(50)
+    volume_sma = volume_s.rolling(20, min_periods=1).mean().to_numpy()
+
+    # RSI
+    gain = np.where(diff > 0, diff, 0.0)
+    loss = np.where(diff < 0, -diff, 0.0)
+    avg_up = pd.Series(gain).ewm(alpha=1 / rsi_window, adjust=False, min_periods=rsi_window).mean().to_numpy()
+    avg_down = pd.Series(loss).ewm(alpha=1 / rsi_window, adjust=False, min_periods=rsi_window).mean().to_numpy()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rsi = np.where(avg_down == 0, 100.0, 100 - (100 / (1 + avg_up / avg_down)))
+    rsi = np.where(np.isnan(avg_down), NAN, rsi)
+    rsi_divergence = pd.Series(rsi).diff().to_numpy()
+
+    # Momentum (rate of change, in percent)
+    mom_14 = 100 * _safe_div(close - close_s.shift(14).to_numpy(), close_s.shift(14).to_numpy())
+    mom_30 = 100 * _safe_div(close - close_s.shift(30).to_numpy(), close_s.shift(30).to_numpy())
+
+    # MACD
+    ema_fast = close_s.ewm(span=macd_fast, adjust=False, min_periods=macd_fast).mean()
+    ema_slow = close_s.ewm(span=macd_slow, adjust=False, min_periods=macd_slow).mean()
+    macd = ema_fast - ema_slow
+    macd_signal_line = macd.ewm(span=macd_signal, adjust=False, min_periods=macd_signal).mean()
+
+    # Bollinger Bands
+    bb_mid = close_s.rolling(bb_window).mean().to_numpy()
+    bb_std = close_s.rolling(bb_window).std(ddof=0).to_numpy()
+    bb_band = 2 * bb_dev * bb_std
+    bb_width = _safe_div(bb_band, bb_mid)
+    bb_position = _safe_div(close - (bb_mid - bb_dev * bb_std), bb_band)
+
+    # ATR; the first candle has no previous close
+    pc = prev_close.to_numpy()
+    true_range = np.fmax(high, pc) - np.fmin(low, pc)
+    atr = _wilder(np.where(np.isnan(pc), high - low, true_range), atr_window)
+
+    # ADX from Wilder-smoothed directional movement, starting at the second candle
+    up_move = high - pd.Series(high).shift(1).to_numpy()
+    down_move = pd.Series(low).shift(1).to_numpy() - low
+    with np.errstate(invalid='ignore'):
+        pos_dm = np.where((up_move > down_move) & (up_move > 0), up_move, 0.0)
+        neg_dm = np.where((down_move > up_move) & (down_move > 0), down_move, 0.0)
+    tr_avg = _wilder(true_range, adx_window, 1)
+    adx_pos = 100 * _safe_div(_wilder(pos_dm, adx_window, 1), tr_avg)
+    adx_neg = 100 * _safe_div(_wilder(neg_dm, adx_window, 1), tr_avg)
+    dx = 100 * _safe_div(np.abs(adx_pos - adx_neg), adx_pos + adx_neg)
+    adx = _wilder(np.nan_to_num(dx, nan=0.0), adx_window, adx_window)
+
+    return np.column_stack([
+        returns,
+        log_returns,
+        returns_s.rolling(20, min_periods=1).std().to_numpy(),
+        returns_s.rolling(50, min_periods=1).std().to_numpy(),
+        sma(sma_short),
+        sma(sma_long),
+        sma_20,
+        sma_50,
+        _safe_div(sma_20, sma_50),
+        volume_sma,
+        _safe_div(volume, volume_sma),
+        volume_s.rolling(20, min_periods=1).std().to_numpy(),
+        rsi,
+        rsi_divergence,
+        mom_14,
+        mom_30,
+        macd.to_numpy(),
+        macd_signal_line.to_numpy(),
+        (macd - macd_signal_line).to_numpy(),
+        bb_width,
+        bb_position,
+        atr,
+        adx,
+        adx_pos,
+        adx_neg
+    ])
+
+
+class RollingWindow:
+    """Fixed-size window keeping a running sum and sum of squares"""
+
+    # Re-derive the sums from the stored values periodically so that
+    # floating point error from add/subtract does not accumulate forever.
+    RESYNC_INTERVAL = 1000
+
+    def __init__(self, size: int):
+        self.size = size
+        self.values = deque()
+        self.total = 0.0
+        self.total_sq = 0.0
+        self._pushes = 0
+
+    def __len__(self):
+        return len(self.values)
+
+    def push(self, value: float):
+        self.values.append(value)
+        self.total += value
+        self.total_sq += value * value
+        if len(self.values) > self.size:
+            old = self.values.popleft()
+            self.total -= old
+            self.total_sq -= old * old
+
+        self._pushes += 1
+        if self._pushes >= self.RESYNC_INTERVAL:
+            self.total = math.fsum(self.values)
+            self.total_sq = math.fsum(v * v for v in self.values)
+            self._pushes = 0
+
+    def mean(self, min_periods: int = 1) -> float:
+        n = len(self.values)
+        if n < max(min_periods, 1):
+            return NAN
+        return self.total / n
+
+    def std(self, ddof: int = 1, min_periods: int = 1) -> float:
+        n = len(self.values)
+        if n < max(min_periods, 1) or n - ddof <= 0:
+            return NAN
+        variance = (self.total_sq - self.total * self.total / n) / (n - ddof)
+        # Cancellation on a (near) constant window can leave tiny residues
+        if variance <= 1e-12 * (self.total_sq / n):
+            return 0.0
+        return math.sqrt(variance)
+
+
+class EWM:
+    """Exponentially weighted mean equivalent to pandas ewm(adjust=False)"""
+
+    def __init__(self, alpha: float, min_periods: int = 0):
+        self.alpha = alpha
+        self.min_periods = min_periods
+        self.value = None
+        self.count = 0
+
+    def update(self, x: float):
+        if math.isnan(x):
+            return
+        if self.value is None:
+            self.value = x
+        else:
+            self.value = (1 - self.alpha) * self.value + self.alpha * x
+        self.count += 1
+
+    @property
+    def current(self) -> float:
+        if self.value is None or self.count < self.min_periods:
+            return NAN
+        return self.value
+
+
+class WilderAverage:
+    """Wilder smoothing seeded with the simple mean of the first `window` values"""
+
+    def __init__(self, window: int):
+        self.window = window
+        self.seed = []
+        self.value = None
+
+    def update(self, x: float):
+        if self.value is None:
+            self.seed.append(x)
+            if len(self.seed) == self.window:
+                self.value = sum(self.seed) / self.window
+                self.seed = []
+        else:
+            self.value = (self.value * (self.window - 1) + x) / self.window
+
+    @property
+    def current(self) -> float:
+        return NAN if self.value is None else self.value
+
+
+class IndicatorState:
+    """Running indicator state for one symbol, advanced one candle at a time"""
+
+    def __init__(self, sma_short: int = 20, sma_long: int = 50, rsi_window: int = 14,
+                 macd_fast: int = 12, macd_slow: int = 26, macd_signal: int = 9,
+                 bb_window: int = 20, bb_dev: float = 2.0, atr_window: int = 14,
+                 adx_window: int = 14):
+        self.bb_dev = bb_dev
+        self.adx_window = adx_window
+        self.sma_short = sma_short
+        self.sma_long = sma_long
+
+        # Close windows shared by every SMA/Bollinger length we need
+        self.close_windows = {size: RollingWindow(size) for size in {20, 50, sma_short, sma_long, bb_window}}
+        self.bb_window = bb_window
+        self.closes = deque(maxlen=31)  # enough history for the 30-period momentum
+        self.returns_20 = RollingWindow(20)
+        self.returns_50 = RollingWindow(50)
+        self.volume_20 = RollingWindow(20)
+
+        # RSI (Wilder style EWM of gains/losses, as in ta.momentum.RSIIndicator)
+        self.rsi_up = EWM(1 / rsi_window, rsi_window)
+        self.rsi_down = EWM(1 / rsi_window, rsi_window)
+        self.prev_rsi = NAN
+
+        # MACD
+        self.ema_fast = EWM(2 / (macd_fast + 1), macd_fast)
+        self.ema_slow = EWM(2 / (macd_slow + 1), macd_slow)
+        self.ema_signal = EWM(2 / (macd_signal + 1), macd_signal)
+
+        # ATR / ADX
+        self.atr = WilderAverage(atr_window)
+        self.tr_sum = None
+        self.pdm_sum = None
+        self.ndm_sum = None
+        self.dm_seed = []
+        self.adx = WilderAverage(adx_window)
+
+        self.prev_high = None
+        self.prev_low = None
+        self.prev_close = None
+
+    def _update_directional(self, high: float, low: float, close: float):
+        """Advance the Wilder-smoothed +DM/-DM/TR sums; returns (+DI, -DI)"""
+        if self.prev_close is None:
+            return NAN, NAN
+
+        true_range = max(high, self.prev_close) - min(low, self.prev_close)
+        up_move = high - self.prev_high
+        down_move = self.prev_low - low
+        pos_dm = up_move if up_move > down_move and up_move > 0 else 0.0
+        neg_dm = down_move if down_move > up_move and down_move > 0 else 0.0
+
+        window = self.adx_window
+        if self.tr_sum is None:
+            self.dm_seed.append((true_range, pos_dm, neg_dm))
+            if len(self.dm_seed) < window:
+                return NAN, NAN
+            self.tr_sum = sum(s[0] for s in self.dm_seed)
+            self.pdm_sum = sum(s[1] for s in self.dm_seed)
+            self.ndm_sum = sum(s[2] for s in self.dm_seed)
+            self.dm_seed = []
+        else:
+            self.tr_sum = self.tr_sum - self.tr_sum / window + true_range
+            self.pdm_sum = self.pdm_sum - self.pdm_sum / window + pos_dm
+            self.ndm_sum = self.ndm_sum - self.ndm_sum / window + neg_dm
+
+        return 100 * _div(self.pdm_sum, self.tr_sum), 100 * _div(self.ndm_sum, self.tr_sum)
+
+    def update(self, high: float, low: float, close: float, volume: float) -> tuple:
+        """Consume one candle and return indicator values ordered as INDICATOR_COLUMNS"""
+        prev_close = self.prev_close
+
+        # Returns
+        if prev_close is None:
+            returns = NAN
+            diff = NAN
+        else:
+            returns = _div(close - prev_close, prev_close)
+            diff = close - prev_close
+        log_returns = math.log1p(returns) if not math.isnan(returns) and returns > -1 else NAN
+        if not math.isnan(returns):
+            self.returns_20.push(returns)
+            self.returns_50.push(returns)
+
+        # Moving averages
+        for window in self.close_windows.values():
+            window.push(close)
+        sma_20 = self.close_windows[20].mean()
+        sma_50 = self.close_windows[50].mean()
+        sma_short = self.close_windows[self.sma_short].mean()
+        sma_long = self.close_windows[self.sma_long].mean()
+
+        # Volume
+        self.volume_20.push(volume)
+        volume_sma = self.volume_20.mean()
+
+        # RSI
+        gain = diff if not math.isnan(diff) and diff > 0 else 0.0
+        loss = -diff if not math.isnan(diff) and diff < 0 else 0.0
+        self.rsi_up.update(gain)
+        self.rsi_down.update(loss)
+        avg_up = self.rsi_up.current
+        avg_down = self.rsi_down.current
+        if math.isnan(avg_down):
+            rsi = NAN
+        elif avg_down == 0:
+            rsi = 100.0
+        else:
+            rsi = 100 - (100 / (1 + avg_up / avg_down))
+        rsi_divergence = rsi - self.prev_rsi
+        self.prev_rsi = rsi
+
+        # Momentum (rate of change, in percent)
+        self.closes.append(close)
+        mom_14 = 100 * _div(close - self.closes[-15], self.closes[-15]) if len(self.closes) > 14 else NAN
+        mom_30 = 100 * _div(close - self.closes[-31], self.closes[-31]) if len(self.closes) > 30 else NAN
+
+        # MACD
+        self.ema_fast.update(close)
+        self.ema_slow.update(close)
+        macd = self.ema_fast.current - self.ema_slow.current
+        self.ema_signal.update(macd)
+        macd_signal = self.ema_signal.current
+        macd_diff = macd - macd_signal
+
+        # Bollinger Bands
+        bb = self.close_windows[self.bb_window]
+        bb_mid = bb.mean(min_periods=self.bb_window)
+        bb_std = bb.std(ddof=0, min_periods=self.bb_window)
+        bb_band = 2 * self.bb_dev * bb_std
+        bb_width = _div(bb_band, bb_mid)
+        bb_position = _div(close - (bb_mid - self.bb_dev * bb_std), bb_band)
+
+        # ATR
+        if prev_close is None:
+            true_range = high - low
+        else:
+            true_range = max(high, prev_close) - min(low, prev_close)
+        self.atr.update(true_range)
+
+        # ADX
+        adx_pos, adx_neg = self._update_directional(high, low, close)
+        if not math.isnan(adx_pos):
+            dx = 100 * _div(abs(adx_pos - adx_neg), adx_pos + adx_neg)
+            self.adx.update(0.0 if math.isnan(dx) else dx)
+
+        self.prev_high = high
+        self.prev_low = low
+        self.prev_close = close
+
+        return (
+            returns,
+            log_returns,
+            self.returns_20.std(),
+            self.returns_50.std(),
+            sma_short,
+            sma_long,
+            sma_20,
+            sma_50,
+            _div(sma_20, sma_50),
+            volume_sma,
+            _div(volume, volume_sma),
+            self.volume_20.std(),
+            rsi,
+            rsi_divergence,
+            mom_14,
+            mom_30,
+            macd,
+            macd_signal,
+            macd_diff,
+            bb_width,
+            bb_position,
+            self.atr.current,
+            self.adx.current,
+            adx_pos,
+            adx_neg
+        )
+
+
+class _SymbolBuffer:
+    """Indicator rows already computed for one symbol, keyed by candle time"""
+
+    def __init__(self, state: IndicatorState):
+        self.state = state
+        self.base = None  # state before the most recent (possibly still forming) candle
+        self.times = np.empty(0, dtype=np.int64)
+        self.values = np.empty((0, len(INDICATOR_COLUMNS)))
+        self.size = 0
+
+    def _reserve(self, extra: int):
+        needed = self.size + extra
+        if needed <= len(self.times):
+            return
+        capacity = max(needed, 2 * len(self.times), 256)
+        times = np.empty(capacity, dtype=np.int64)
+        values = np.empty((capacity, len(INDICATOR_COLUMNS)))
+        times[:self.size] = self.times[:self.size]
+        values[:self.size] = self.values[:self.size]
+        self.times, self.values = times, values
+
+    def append(self, candle_time: int, row: tuple):
+        self._reserve(1)
+        self.times[self.size] = candle_time
+        self.values[self.size] = row
+        self.size += 1
+
+    def trim_before(self, candle_time: int):
+        """Drop rows older than candle_time once they make up half the buffer"""
+        start = int(np.searchsorted(self.times[:self.size], candle_time))
+        if start and start * 2 >= self.size:
+            remaining = self.size - start
+            self.times[:remaining] = self.times[start:self.size]
+            self.values[:remaining] = self.values[start:self.size]
+            self.size = remaining
+
+
+class IndicatorEngine:
+    """Incremental indicator engine keeping running state per symbol.
+
+    Each call to ``update`` only advances the state by candles that were not
+    seen before (plus a re-evaluation of the still-forming last candle), so the
+    per-cycle cost is O(new candles) instead of O(window) pandas work. Updates
+    of one symbol are serialised by a per-symbol lock, since the event loop and
+    the worker threads may advance the same symbol's state.
+    """
+
+    def __init__(self, sma_short: int = 20, sma_long: int = 50, rsi_window: int = 14,
+                 macd_fast: int = 12, macd_slow: int = 26, macd_signal: int = 9):
+        self.logger = logging.getLogger("IndicatorEngine")
+        self.params = {
+            'sma_short': sma_short,
+            'sma_long': sma_long,
+            'rsi_window': rsi_window,
+            'macd_fast': macd_fast,
+            'macd_slow': macd_slow,
+            'macd_signal': macd_signal
+        }
+        self.buffers: Dict[str, _SymbolBuffer] = {}
+        self._locks: Dict[str, threading.RLock] = {}
+        self._locks_lock = threading.Lock()
+
+    @staticmethod
+    def has_indicators(df: pd.DataFrame) -> bool:
+        """Check whether a frame already carries the engine's indicator columns"""
+        return all(col in df.columns for col in INDICATOR_COLUMNS)
+
+    def _lock(self, symbol: str) -> threading.RLock:
+        with self._locks_lock:
+            if symbol not in self._locks:
+                self._locks[symbol] = threading.RLock()
+            return self._locks[symbol]
+
+    def reset(self, symbol: Optional[str] = None):
+        """Forget running state for one symbol, or for all of them"""
+        if symbol is None:
+            self.buffers.clear()
+        else:
+            with self._lock(symbol):
+                self.buffers.pop(symbol, None)
+
+    def _new_buffer(self) -> _SymbolBuffer:
+        return _SymbolBuffer(IndicatorState(**self.params))
+
+    @staticmethod
+    def _advance(buffer: _SymbolBuffer, times: np.ndarray, high: np.ndarray, low: np.ndarray,
+                 close: np.ndarray, volume: np.ndarray, start: int):
+        last = len(times) - 1
+        for i in range(start, len(times)):
+            if i == last:
+                # Only the state before the still-forming candle is ever restored
+                buffer.base = copy.deepcopy(buffer.state)
+            buffer.append(int(times[i]), buffer.state.update(high[i], low[i], close[i], volume[i]))
+
+    def _join(self, candles: pd.DataFrame, values: np.ndarray) -> pd.DataFrame:
+        indicators = pd.DataFrame(values, index=candles.index, columns=INDICATOR_COLUMNS)
+        # Same cleanup the bots apply after calculating indicators; warmup rows
+        # are filled on the output only, the running state is left untouched.
+        indicators = indicators.replace([np.inf, -np.inf], np.nan).ffill().bfill().fillna(0)
+        overlapping = [col for col in INDICATOR_COLUMNS if col in candles.columns]
+        if overlapping:
+            candles = candles.drop(columns=overlapping)
+        return pd.concat([candles, indicators], axis=1)
+
+    def compute(self, candles: pd.DataFrame) -> pd.DataFrame:
+        """Compute indicators for a whole frame without touching per-symbol state.
+
+        Vectorized, so backtests and training can precompute long histories.
+        """
+        high, low, close, volume = (candles[col].to_numpy(dtype=float) for col in ['high', 'low', 'close', 'volume'])
+        return self._join(candles, compute_indicators(high, low, close, volume, **self.params))
+
+    def update(self, symbol: str, candles: pd.DataFrame) -> pd.DataFrame:
+        """Return candles with indicator columns, computing only rows not seen before"""
+        if candles is None or candles.empty:
+            return candles
+        if 'time' not in candles.columns:
+            return self.compute(candles)
+
+        with self._lock(symbol):
+            return self._update(symbol, candles)
+
+    def _update(self, symbol: str, candles: pd.DataFrame) -> pd.DataFrame:
+        times = candles['time'].to_numpy(dtype=np.int64)
+        high, low, close, volume = (candles[col].to_numpy(dtype=float) for col in ['high', 'low', 'close', 'volume'])
+
+        buffer = self.buffers.get(symbol)
+        start = 0
+        if buffer is not None and buffer.size:
+            last_time = buffer.times[buffer.size - 1]
+            pos = int(np.searchsorted(times, last_time))
+            if pos < len(times) and times[pos] == last_time:
+                # Re-evaluate the last known candle from the state before it,
+                # since the exchange may have revised it while it was forming.
+                buffer.state = copy.deepcopy(buffer.base)
+                buffer.size -= 1
+                start = pos
+            else:
+                buffer = None
+
+        if buffer is None or buffer.size == 0:
+            buffer = self._new_buffer()
+            start = 0
+        self.buffers[symbol] = buffer
+
+        buffer._reserve(len(times) - start)
+        self._advance(buffer, times, high, low, close, volume, start)
+        buffer.trim_before(int(times[0]))
+
+        first = int(np.searchsorted(buffer.times[:buffer.size], times[0]))
+        if buffer.size - first != len(times):
+            # The candle window is not contiguous with our history; rebuild it.
+            self.logger.info(f"Rebuilding indicator state for {symbol}")
+            self.buffers.pop(symbol, None)
+            return self._update(symbol, candles)
+
+        return self._join(candles, buffer.values[first:buffer.size].copy())
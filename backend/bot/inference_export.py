@@ -0,0 +1,89 @@
+# backend/bot/inference_export.py
+import os
+import shutil
+import logging
+from typing import Optional, Tuple
+
+import joblib
+import numpy as np
+import tensorflow as tf
+
+logger = logging.getLogger("InferenceExport")
+
+SCALER_FILE = 'feature_scaler.joblib'
+
+
+class ServingModule(tf.Module):
+    """Both sequence models behind one traced function with a fixed input signature"""
+
+    def __init__(self, lstm_model, transformer_model, sequence_length: int, n_features: int):
+        super().__init__()
+        self.lstm_model = lstm_model
+        self.transformer_model = transformer_model
+        self.serve = tf.function(
+            self._serve,
+            input_signature=[tf.TensorSpec([None, sequence_length, n_features], tf.float32, name='windows')]
+        )
+
+    def _serve(self, windows):
+        return {
+            'lstm': self.lstm_model(windows, training=False),
+            'transformer': self.transformer_model(windows, training=False)
+        }
+
+
+class ServingModel:
+    """Calls an exported serving function directly, bypassing Keras predict"""
+
+    def __init__(self, serve_fn, feature_scaler=None, module=None):
+        self.serve_fn = serve_fn
+        self.feature_scaler = feature_scaler
+        # Keep the owning module alive; the function captures its variables
+        self.module = module
+
+    def predict(self, X: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (lstm, transformer) probabilities for a batch of windows"""
+        outputs = self.serve_fn(tf.convert_to_tensor(X, dtype=tf.float32))
+        return outputs['lstm'].numpy()[:, 0], outputs['transformer'].numpy()[:, 0]
+
+
+def export_serving_model(lstm_model, transformer_model, feature_scaler, export_dir: str,
+                         sequence_length: int, n_features: int) -> Optional[ServingModel]:
+    """Trace the models into a SavedModel next to the fitted scaler and return the serving wrapper"""
+    try:
+        module = ServingModule(lstm_model, transformer_model, sequence_length, n_features)
+
+        # Trace once so the first live prediction does not pay for it
+        module.serve(tf.zeros([1, sequence_length, n_features], tf.float32))
+
+        tmp_dir = export_dir.rstrip(os.sep) + '.tmp'
+        if os.path.exists(tmp_dir):
+            shutil.rmtree(tmp_dir)
+        tf.saved_model.save(module, tmp_dir, signatures={'serving_default': module.serve})
+        joblib.dump(feature_scaler, os.path.join(tmp_dir, SCALER_FILE))
+
+        if os.path.exists(export_dir):
+            shutil.rmtree(export_dir)
+        os.replace(tmp_dir, export_dir)
+
+        logger.info(f"Exported serving function to {export_dir}")
+        return ServingModel(module.serve, feature_scaler, module)
+
+    except Exception as e:
+        logger.error(f"Error exporting serving function: {str(e)}")
+        return None
+
+
+def load_serving_model(export_dir: str) -> Optional[ServingModel]:
+    """Load a previously exported serving function and its scaler"""
+    if not os.path.exists(os.path.join(export_dir, 'saved_model.pb')):
+        return None
+    try:
+        loaded = tf.saved_model.load(export_dir)
+        feature_scaler = joblib.load(os.path.join(export_dir, SCALER_FILE))
+        logger.info(f"Loaded serving function from {export_dir}")
+        return ServingModel(loaded.serve, feature_scaler, loaded)
+
+    except Exception as e:
+        logger.error(f"Error loading serving function from {export_dir}: {str(e)}")
+        return None
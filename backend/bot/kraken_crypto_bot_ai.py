@@ -8,12 +8,11 @@ import threading
 import pickle
 import joblib
 from sklearn.ensemble import RandomForestClassifier
-import sqlite3
 import pandas as pd
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 from sklearn.preprocessing import StandardScaler
 from scipy import stats
-import ta
 import logging
 from typing import Optional, Dict, List
 import asyncio
@@ -38,6 +37,21 @@ from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
 from sklearn.calibration import CalibratedClassifierCV
 
+from .candle_store import CandleStore
+from .storage import get_storage
+from .market_data_store import MarketDataStore, market_data_rows
+from .candle_archive import get_candle_archive
+from .backfill import HistoryBackfill
+from .exchange_client import AsyncKrakenClient
+from .price_cache import get_price_cache
+from .market_stream import get_market_stream
+from .position_triggers import ExitRules, PositionTriggerEngine, ma_reversal
+from .indicator_engine import IndicatorEngine
+from .feature_pipeline import FeaturePipeline
+from .inference_export import export_serving_model, load_serving_model
+from .model_registry import ModelRegistry
+from .training_worker import TrainingWorker
+
 # Apply nest_asyncio at the start
 nest_asyncio.apply()
 warnings.filterwarnings('ignore')
@@ -73,12 +87,18 @@ class TransformerBlock(tf.keras.layers.Layer):
         return self.layernorm2(out1 + ffn_output)
 
 class AITradingEnhancer:
-    def __init__(self):
+    def __init__(self, pipeline: Optional[FeaturePipeline] = None):
+        self.pipeline = pipeline if pipeline is not None else FeaturePipeline()
         self.lstm_model = None
         self.transformer_model = None
         self.feature_scaler = StandardScaler()
         self.sequence_length = 100
         self.n_features = 9 
+        # Per-symbol scaled windows used for inference: {'time': last candle time, 'window': array}
+        self.inference_buffers = {}
+        # Exported serving function used instead of Keras predict when available
+        self.serving_model = None
+        self.export_dir = os.path.join('models', 'ai_serving')
         
     def build_lstm_model(self):
         """Build LSTM model with updated input dimensions"""
@@ -121,38 +141,68 @@ class AITradingEnhancer:
         )
         return model
 
-    def prepare_sequence_data(self, df: pd.DataFrame, sequence_length: int = 100):
+    def export_inference(self, export_dir: Optional[str] = None) -> bool:
+        """Export the trained models as a serving function and switch inference to it"""
+        if self.lstm_model is None or self.transformer_model is None:
+            return False
+        serving_model = export_serving_model(
+            self.lstm_model, self.transformer_model, self.feature_scaler,
+            export_dir or self.export_dir, self.sequence_length, self.n_features
+        )
+        if serving_model is None:
+            return False
+        self.serving_model = serving_model
+        return True
+
+    def load_inference(self, export_dir: Optional[str] = None) -> bool:
+        """Load a previously exported serving function together with its scaler"""
+        serving_model = load_serving_model(export_dir or self.export_dir)
+        if serving_model is None:
+            return False
+        self.serving_model = serving_model
+        self.feature_scaler = serving_model.feature_scaler
+        self.inference_buffers = {}
+        return True
+
+    def prepare_sequence_data(self, df: pd.DataFrame, sequence_length: int = 100, fit_scaler: bool = True):
         """Prepare sequential data with minimal output"""
         try:
-            features = [
-                'returns', 'log_returns', 'rolling_std_20', 'volume_ma_ratio',
-                'rsi', 'macd', 'bb_width', 'adx', 'sma_20'
-            ]
-            
-            missing_features = [f for f in features if f not in df.columns]
-            if missing_features:
-                raise ValueError(f"Missing required features: {missing_features}")
-            
-            X = []
-            y = []
-            
-            for i in range(len(df) - sequence_length):
-                sequence = df[features].iloc[i:i+sequence_length].values
-                if np.isnan(sequence).any():
-                    continue
-                X.append(sequence)
-                next_return = df['returns'].iloc[i+sequence_length]
-                y.append(1 if next_return > 0 else 0)
-            
-            if not X:
+            features = FeaturePipeline.SEQUENCE_FEATURES
+            if not self.pipeline.has_features(df, features):
+                df = self.pipeline.transform_history(df)
+            
+            values = df[features].to_numpy(dtype=np.float64)
+            n_windows = len(values) - sequence_length
+            if n_windows <= 0:
+                raise ValueError("No valid sequences could be created")
+            
+            # Window i covers rows i..i+L-1; it is valid when none of them has a NaN
+            nan_rows = np.concatenate(([0], np.cumsum(np.isnan(values).any(axis=1))))
+            valid = (nan_rows[sequence_length:sequence_length + n_windows] - nan_rows[:n_windows]) == 0
+            if not valid.any():
                 raise ValueError("No valid sequences could be created")
             
-            X = np.array(X)
-            y = np.array(y)
+            # Number of valid windows containing each row, so the scaler sees
+            # every row with the same weight as when fitting on stacked windows
+            valid_count = np.concatenate(([0], np.cumsum(valid)))
+            rows = np.arange(len(values))
+            coverage = (valid_count[np.minimum(rows + 1, n_windows)] -
+                        valid_count[np.clip(rows - sequence_length + 1, 0, n_windows)])
+            covered = coverage > 0
+            
+            scaled = values.copy()
+            if fit_scaler:
+                self.feature_scaler.fit(values[covered], sample_weight=coverage[covered])
+                # Buffered inference windows were scaled with the old statistics
+                self.inference_buffers = {}
+            scaled[covered] = self.feature_scaler.transform(values[covered])
+            
+            # (windows, sequence_length, features) view over the scaled rows
+            windows = sliding_window_view(scaled, sequence_length, axis=0)[:n_windows].transpose(0, 2, 1)
+            X = windows if valid.all() else windows[valid]
             
-            X_reshaped = X.reshape(-1, X.shape[-1])
-            X_scaled = self.feature_scaler.fit_transform(X_reshaped)
-            X = X_scaled.reshape(X.shape)
+            next_returns = df['returns'].to_numpy(dtype=np.float64)[sequence_length:]
+            y = (next_returns > 0).astype(int)[valid]
             
             return X, y
             
@@ -160,41 +210,134 @@ class AITradingEnhancer:
             print(f"Error preparing sequence data: {str(e)}")
             return np.array([]), np.array([])
 
-    def predict_next_movement(self, current_data: pd.DataFrame) -> dict:
-        """Combine predictions from multiple models"""
+    def fit(self, df: pd.DataFrame, epochs: int = 10, batch_size: int = 32) -> bool:
+        """Build and train both sequence models on df"""
         try:
             # Prepare sequence data
-            X, _ = self.prepare_sequence_data(current_data, self.sequence_length)
-            if len(X) == 0:
-                return {'confidence': 0.5, 'direction': 'hold'}
-            
-            # Get predictions from both models
-            if self.lstm_model is not None and self.transformer_model is not None:
-                lstm_pred = self.lstm_model.predict(X[-1:], verbose=0)[0][0]
-                transformer_pred = self.transformer_model.predict(X[-1:], verbose=0)[0][0]
-                
-                # Combine predictions with weights
-                combined_pred = (lstm_pred * 0.4 + transformer_pred * 0.6)
-                
-                # Convert to confidence score centered around 0.5
-                confidence = 0.5 + (combined_pred - 0.5) * 0.1
-                
-                # Ensure confidence stays in reasonable bounds
-                confidence = max(0.45, min(0.55, confidence))
-                
-                return {
-                    'confidence': confidence,
-                    'direction': 'buy' if combined_pred > 0.5 else 'sell'
-                }
+            X, y = self.prepare_sequence_data(df, self.sequence_length)
             
-            return {'confidence': 0.5, 'direction': 'hold'}
+            if len(X) < 1000:  # Minimum required samples
+                print("Insufficient data for AI training")
+                return False
+            
+            # Split data
+            train_size = int(len(X) * 0.8)
+            X_train, X_test = X[:train_size], X[train_size:]
+            y_train, y_test = y[:train_size], y[train_size:]
+            
+            # Build and train LSTM
+            self.lstm_model = self.build_lstm_model()
+            self.lstm_model.fit(
+                X_train, y_train,
+                epochs=epochs,
+                batch_size=batch_size,
+                validation_data=(X_test, y_test),
+                verbose=1
+            )
+            
+            # Build and train Transformer
+            self.transformer_model = self.build_transformer_model()
+            self.transformer_model.fit(
+                X_train, y_train,
+                epochs=epochs,
+                batch_size=batch_size,
+                validation_data=(X_test, y_test),
+                verbose=1
+            )
+            
+            return True
+            
+        except Exception as e:
+            print(f"Error training AI models: {str(e)}")
+            traceback.print_exc()
+            return False
+
+    def prepare_inference_window(self, df: pd.DataFrame, symbol: Optional[str] = None) -> Optional[np.ndarray]:
+        """Build only the latest scaled window, using the scaler frozen at training time"""
+        if not hasattr(self.feature_scaler, 'mean_') or len(df) < self.sequence_length:
+            return None
+        
+        features = FeaturePipeline.SEQUENCE_FEATURES
+        if not self.pipeline.has_features(df, features):
+            df = self.pipeline.transform_history(df.iloc[-(self.sequence_length + 100):])
+        
+        buffer = self.inference_buffers.get(symbol) if symbol is not None else None
+        if buffer is not None and 'time' in df.columns:
+            times = df['time'].to_numpy()
+            pos = int(np.searchsorted(times, buffer['time']))
+            if pos < len(times) and times[pos] == buffer['time']:
+                # Re-scale the last buffered candle (it may have been revised) plus any new ones
+                new_rows = self.feature_scaler.transform(df[features].iloc[pos:].to_numpy(dtype=np.float64))
+                window = np.concatenate([buffer['window'][:-1], new_rows])[-self.sequence_length:]
+            else:
+                buffer = None
+        
+        if buffer is None or 'time' not in df.columns:
+            window = self.feature_scaler.transform(
+                df[features].iloc[-self.sequence_length:].to_numpy(dtype=np.float64))
+        
+        if symbol is not None and 'time' in df.columns:
+            self.inference_buffers[symbol] = {'time': df['time'].iloc[-1], 'window': window}
+        
+        if np.isnan(window).any():
+            return None
+        return window
+    
+    def predict_next_movement(self, current_data: pd.DataFrame, symbol: Optional[str] = None) -> dict:
+        """Combine predictions from multiple models"""
+        return self.predict_batch({symbol: current_data})[symbol]
+    
+    def _combine_predictions(self, lstm_pred: float, transformer_pred: float) -> dict:
+        """Turn the two model outputs into a bounded confidence"""
+        # Combine predictions with weights
+        combined_pred = (lstm_pred * 0.4 + transformer_pred * 0.6)
+        
+        # Convert to confidence score centered around 0.5
+        confidence = 0.5 + (combined_pred - 0.5) * 0.1
+        
+        # Ensure confidence stays in reasonable bounds
+        confidence = max(0.45, min(0.55, confidence))
+        
+        return {
+            'confidence': confidence,
+            'direction': 'buy' if combined_pred > 0.5 else 'sell'
+        }
+    
+    def predict_batch(self, frames: Dict[Optional[str], pd.DataFrame]) -> Dict[Optional[str], dict]:
+        """Predict every symbol with one forward pass per model"""
+        results = {symbol: {'confidence': 0.5, 'direction': 'hold'} for symbol in frames}
+        try:
+            if self.serving_model is None and (self.lstm_model is None or self.transformer_model is None):
+                return results
+            
+            symbols = []
+            windows = []
+            for symbol, df in frames.items():
+                window = self.prepare_inference_window(df, symbol)
+                if window is not None:
+                    symbols.append(symbol)
+                    windows.append(window)
+            if not windows:
+                return results
+            
+            X = np.stack(windows)
+            if self.serving_model is not None:
+                lstm_preds, transformer_preds = self.serving_model.predict(X)
+            else:
+                lstm_preds = self.lstm_model.predict(X, batch_size=len(X), verbose=0)[:, 0]
+                transformer_preds = self.transformer_model.predict(X, batch_size=len(X), verbose=0)[:, 0]
+            
+            for symbol, lstm_pred, transformer_pred in zip(symbols, lstm_preds, transformer_preds):
+                results[symbol] = self._combine_predictions(lstm_pred, transformer_pred)
+            
+            return results
             
         except Exception as e:
             print(f"Error in AI prediction: {str(e)}")
-            return {'confidence': 0.5, 'direction': 'hold'}
+            return results
         
 class MLModelManager:
-    def __init__(self):
+    def __init__(self, pipeline: Optional[FeaturePipeline] = None):
         self.logger = logging.getLogger("MLModelManager")
         if not self.logger.handlers:
             handler = logging.StreamHandler()
@@ -209,116 +352,17 @@ class MLModelManager:
         self.feature_importance = {}
         self.is_trained = False
         self.min_samples = 100
-        self._feature_names = [
-            'close',
-            'returns',
-            'log_returns',
-            'rolling_std_20',
-            'rolling_std_50',
-            'volume',
-            'volume_ma_ratio',
-            'volume_std',
-            'rsi',
-            'rsi_divergence',
-            'mom_14',
-            'mom_30',
-            'macd',
-            'macd_signal',
-            'macd_diff',
-            'bb_width',
-            'bb_position',
-            'sma_20',
-            'sma_50',
-            'sma_20_50_ratio',
-            'atr',
-            'adx',
-            'adx_pos',
-            'adx_neg'
-        ]
+        self.pipeline = pipeline if pipeline is not None else FeaturePipeline()
+        self._feature_names = FeaturePipeline.FEATURE_COLUMNS.copy()
 
     def get_model_features(self) -> List[str]:
         """Get list of required features in the correct order"""
         return self._feature_names.copy()
 
     def prepare_features(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Create comprehensive features ensuring all required columns exist"""
+        """Select model features, computing them through the shared pipeline if needed"""
         try:
-            # Verify required columns exist
-            required_columns = ['open', 'high', 'low', 'close', 'volume']
-            missing_columns = [col for col in required_columns if col not in df.columns]
-            if missing_columns:
-                raise ValueError(f"Missing required columns: {missing_columns}")
-                
-            # Create copy to avoid modifying original
-            df_copy = df.copy()
-            
-            # Ensure numeric
-            for col in required_columns:
-                df_copy[col] = pd.to_numeric(df_copy[col], errors='coerce')
-                
-            # Remove any rows with NaN values in required columns
-            df_copy = df_copy.dropna(subset=required_columns)
-            
-            # Now create features
-            features = pd.DataFrame(index=df_copy.index)
-            
-            # Price-based features
-            features['close'] = df_copy['close']
-            features['returns'] = df_copy['close'].pct_change()
-            features['log_returns'] = np.log1p(features['returns'])
-            features['rolling_std_20'] = features['returns'].rolling(window=20, min_periods=1).std()
-            features['rolling_std_50'] = features['returns'].rolling(window=50, min_periods=1).std()
-            
-            # Volume features
-            features['volume'] = df_copy['volume']
-            vol_ma = df_copy['volume'].rolling(window=20, min_periods=1).mean()
-            features['volume_ma_ratio'] = df_copy['volume'] / vol_ma
-            features['volume_std'] = df_copy['volume'].rolling(window=20, min_periods=1).std()
-            
-            # Technical indicators
-            # RSI
-            rsi = ta.momentum.RSIIndicator(close=df_copy['close'], window=14)
-            features['rsi'] = rsi.rsi()
-            features['rsi_divergence'] = features['rsi'].diff()
-            
-            # Momentum
-            features['mom_14'] = ta.momentum.ROCIndicator(close=df_copy['close'], window=14).roc()
-            features['mom_30'] = ta.momentum.ROCIndicator(close=df_copy['close'], window=30).roc()
-            
-            # MACD
-            macd = ta.trend.MACD(close=df_copy['close'])
-            features['macd'] = macd.macd()
-            features['macd_signal'] = macd.macd_signal()
-            features['macd_diff'] = macd.macd_diff()
-            
-            # Bollinger Bands
-            bb = ta.volatility.BollingerBands(close=df_copy['close'])
-            features['bb_width'] = (bb.bollinger_hband() - bb.bollinger_lband()) / bb.bollinger_mavg()
-            features['bb_position'] = (df_copy['close'] - bb.bollinger_lband()) / (bb.bollinger_hband() - bb.bollinger_lband())
-            
-            # Moving averages
-            features['sma_20'] = df_copy['close'].rolling(window=20).mean()
-            features['sma_50'] = df_copy['close'].rolling(window=50).mean()
-            features['sma_20_50_ratio'] = features['sma_20'] / features['sma_50']
-            
-            # ATR
-            features['atr'] = ta.volatility.AverageTrueRange(
-                high=df_copy['high'],
-                low=df_copy['low'],
-                close=df_copy['close']
-            ).average_true_range()
-            
-            # ADX
-            adx = ta.trend.ADXIndicator(high=df_copy['high'], low=df_copy['low'], close=df_copy['close'])
-            features['adx'] = adx.adx()
-            features['adx_pos'] = adx.adx_pos()
-            features['adx_neg'] = adx.adx_neg()
-            
-            # Clean up
-            features = features.replace([np.inf, -np.inf], np.nan)
-            features = features.fillna(method='ffill').fillna(method='bfill').fillna(0)
-            
-            return features
+            return self.pipeline.select(df, self._feature_names)
             
         except Exception as e:
             raise ValueError(f"Error preparing features: {str(e)}")
@@ -462,73 +506,87 @@ class MLModelManager:
 
     def predict(self, features: pd.DataFrame) -> dict:
         """Make predictions with scaled confidence matching other indicators"""
+        return self.predict_batch({None: features})[None]
+
+    def _confidence_from_probability(self, buy_prob: float, latest: pd.Series) -> dict:
+        """Map the model's buy probability to a bounded confidence with technical confirmation"""
+        # Center the buy probability around 0.5
+        # Transform from [0, 1] to [0.45, 0.55]
+        final_confidence = 0.5 + (buy_prob - 0.5) * 0.1
+
+        # Add technical confirmation adjustments
+        adjustment = 0
+
+        # RSI confirmation (small adjustment)
+        if 'rsi' in latest:
+            rsi = latest['rsi']
+            if rsi < 30 and buy_prob > 0.5:  # Oversold + bullish signal
+                adjustment += 0.01
+            elif rsi > 70 and buy_prob < 0.5:  # Overbought + bearish signal
+                adjustment -= 0.01
+
+        # MACD confirmation (small adjustment)
+        if 'macd' in latest and 'macd_signal' in latest:
+            macd_diff = latest['macd'] - latest['macd_signal']
+            if macd_diff > 0 and buy_prob > 0.5:  # Positive MACD + bullish
+                adjustment += 0.01
+            elif macd_diff < 0 and buy_prob < 0.5:  # Negative MACD + bearish
+                adjustment -= 0.01
+
+        # Volume confirmation (tiny adjustment)
+        if 'volume_ma_ratio' in latest:
+            vol_ratio = latest['volume_ma_ratio']
+            if vol_ratio > 1.2:  # High volume
+                if buy_prob > 0.5:
+                    adjustment += 0.005
+                else:
+                    adjustment -= 0.005
+
+        # Apply adjustment while maintaining bounds
+        final_confidence = max(0.47, min(0.53, final_confidence + adjustment))
+
+        # Determine action based on confidence
+        if final_confidence > 0.52:
+            action = 'buy'
+        elif final_confidence < 0.47:
+            action = 'sell'
+        else:
+            action = 'hold'
+
+        self.logger.info(f"ML Prediction: raw_prob={buy_prob:.3f}, "
+                        f"adj={adjustment:.3f}, "
+                        f"final={final_confidence:.3f}")
+
+        return {
+            'action': action,
+            'confidence': final_confidence
+        }
+
+    def predict_batch(self, features: Dict[Optional[str], pd.DataFrame]) -> Dict[Optional[str], dict]:
+        """Score the latest row of every symbol with a single predict_proba call"""
+        results = {symbol: {'action': 'hold', 'confidence': 0.5} for symbol in features}
         if not self.is_trained or self.model is None:
-            return {'action': 'hold', 'confidence': 0.5}
+            return results
                 
         try:
-            features_ordered = features[self._feature_names].copy()
-            features_scaled = self.scaler.transform(features_ordered)
+            symbols = [symbol for symbol, frame in features.items() if frame is not None and not frame.empty]
+            if not symbols:
+                return results
             
-            # Get raw probabilities
-            raw_probs = self.model.predict_proba(features_scaled)[-1]
-            buy_prob = raw_probs[1]
-            
-            # Center the buy probability around 0.5
-            # Transform from [0, 1] to [0.45, 0.55]
-            final_confidence = 0.5 + (buy_prob - 0.5) * 0.1
-            
-            # Add technical confirmation adjustments
-            latest = features.iloc[-1]
-            adjustment = 0
-            
-            # RSI confirmation (small adjustment)
-            if 'rsi' in latest:
-                rsi = latest['rsi']
-                if rsi < 30 and buy_prob > 0.5:  # Oversold + bullish signal
-                    adjustment += 0.01
-                elif rsi > 70 and buy_prob < 0.5:  # Overbought + bearish signal
-                    adjustment -= 0.01
-            
-            # MACD confirmation (small adjustment)
-            if 'macd' in latest and 'macd_signal' in latest:
-                macd_diff = latest['macd'] - latest['macd_signal']
-                if macd_diff > 0 and buy_prob > 0.5:  # Positive MACD + bullish
-                    adjustment += 0.01
-                elif macd_diff < 0 and buy_prob < 0.5:  # Negative MACD + bearish
-                    adjustment -= 0.01
-            
-            # Volume confirmation (tiny adjustment)
-            if 'volume_ma_ratio' in latest:
-                vol_ratio = latest['volume_ma_ratio']
-                if vol_ratio > 1.2:  # High volume
-                    if buy_prob > 0.5:
-                        adjustment += 0.005
-                    else:
-                        adjustment -= 0.005
-            
-            # Apply adjustment while maintaining bounds
-            final_confidence = max(0.47, min(0.53, final_confidence + adjustment))
+            # Only the latest row of each symbol is scored
+            latest_rows = pd.concat([features[symbol][self._feature_names].iloc[-1:] for symbol in symbols])
+            features_scaled = self.scaler.transform(latest_rows)
             
-            # Determine action based on confidence
-            if final_confidence > 0.52:
-                action = 'buy'
-            elif final_confidence < 0.47:
-                action = 'sell'
-            else:
-                action = 'hold'
+            # Get raw probabilities
+            raw_probs = self.model.predict_proba(features_scaled)
+            for symbol, probs in zip(symbols, raw_probs):
+                results[symbol] = self._confidence_from_probability(probs[1], features[symbol].iloc[-1])
             
-            self.logger.info(f"ML Prediction: raw_prob={buy_prob:.3f}, "
-                            f"adj={adjustment:.3f}, "
-                            f"final={final_confidence:.3f}")
-                
-            return {
-                'action': action,
-                'confidence': final_confidence
-            }
+            return results
 
         except Exception as e:
             self.logger.error(f"Error in prediction: {str(e)}")
-            return {'action': 'hold', 'confidence': 0.5}
+            return results
 
 class PositionTracker:
     def __init__(self):
@@ -580,6 +638,7 @@ class EnhancedKrakenCryptoBot:
             self.is_initially_trained = False
             self.training_completed = False
             self.min_training_data = 100
+            self.training_lookback_days = 90  # Archived history used for training
             self.initial_training_hours = 1
             self.start_time = datetime.now()
             
@@ -587,11 +646,17 @@ class EnhancedKrakenCryptoBot:
             self.model_manager = MLModelManager()
             self.model_name = 'trading_model.joblib'
             self.db_name = 'crypto_trading.db'
+            # Pooled WAL-mode connections shared with every bot using this file
+            self.storage = get_storage(self.db_name)
+            # Market data keyed by (symbol, ts) in day partitions
+            self.market_store = MarketDataStore(self.storage)
             self.is_initially_trained = False
             self.training_completed = False
 
             self.ai_enhancer = AITradingEnhancer()
             self.ai_trained = False
+            self.training_worker = TrainingWorker()
+            self.training_task = None
 
             # Adjust market conditions for smaller account
             self.market_conditions = {
@@ -614,6 +679,9 @@ class EnhancedKrakenCryptoBot:
             "SHIBUSD": 0.10,   # SHIB/USD
             "PEPEUSD": 0.15    # PEPE/USD
             }
+            # One registry per bot kind and symbol universe
+            self.model_registry = ModelRegistry(name=f"live_{os.path.splitext(self.model_name)[0]}",
+                                                symbols=self.symbols)
 
 
             # Adjust parameters for smaller account
@@ -639,6 +707,46 @@ class EnhancedKrakenCryptoBot:
             self.prediction_threshold = 0.2
 
             self.timeframe = 5  # 1 minute intervals
+            
+            # Blocking Kraken calls are made from a bounded thread pool
+            self.exchange = AsyncKrakenClient(self.k)
+            
+            # Last prices shared with every other bot in the process
+            self.price_cache = get_price_cache(self.kraken)
+            self.price_cache.register(self.symbols)
+            
+            # Incrementally refreshed OHLC windows per symbol; closed candles
+            # are kept in the columnar archive beyond the window
+            self.candle_store = CandleStore(self.k, interval=self.timeframe,
+                                            archive=get_candle_archive(self.timeframe))
+            
+            # Older history comes from the resumable trades backfill; each start
+            # spends at most BACKFILL_REQUESTS public calls continuing it
+            self.backfill = HistoryBackfill(self.kraken, self.candle_store.archive)
+            self.backfill_requests = int(os.environ.get('BACKFILL_REQUESTS', '60'))
+            
+            # MARKET_DATA_MODE=stream pushes prices and candles over Kraken's
+            # WebSocket feed instead of polling REST every cycle
+            self.market_data_mode = os.environ.get('MARKET_DATA_MODE', 'rest')
+            self.market_stream = get_market_stream(self.timeframe) if self.market_data_mode == 'stream' else None
+            self.stream_synced = {}
+            self.stream_tasks = {}
+
+            # Streaming indicator state per symbol
+            self.indicator_engine = IndicatorEngine(
+                sma_short=self.sma_short,
+                sma_long=self.sma_long,
+                rsi_window=self.rsi_period,
+                macd_fast=self.macd_fast,
+                macd_slow=self.macd_slow,
+                macd_signal=self.macd_signal
+            )
+
+            # Indicators are computed once per candle set and shared by the
+            # technical rules and both model families
+            self.feature_pipeline = FeaturePipeline(self.indicator_engine)
+            self.model_manager.pipeline = self.feature_pipeline
+            self.ai_enhancer.pipeline = self.feature_pipeline
 
             # Adjust risk parameters for smaller account
             self.max_position_size = 0.3    # Increased to allow meaningful positions
@@ -646,15 +754,23 @@ class EnhancedKrakenCryptoBot:
             self.max_total_risk = 0.15       # Reduced risk
             self.stop_loss_pct = 0.03        # Tighter stop loss
             self.take_profit_pct = 0.05      # Lower but realistic profit target
+            self.max_spread_pct = 0.01       # Skip entries when bid/ask is wider than 1%
+            
+            # Absolute stop/target prices of tracked positions, checked per tick
+            self.position_triggers = PositionTriggerEngine(ExitRules(
+                take_profit_pct=self.take_profit_pct,
+                stop_loss_pct=self.max_drawdown,
+                trailing_stop_pct=self.trailing_stop_pct,
+                trailing_tiers=(),
+                trailing_min_pnl=0.0,
+                max_drawdown=None,
+                aged_after_hours=None,
+                time_exit_hours=None,
+                reversal_min_pnl=None
+            ))
 
             self.min_zusd_balance = 5.0
 
-            # Rate limiting
-            self.last_api_call = time.time()
-            self.api_call_delay = 1.0
-            self.api_retry_delay = 1  # Initial retry delay for exceeded rate limits
-            self.max_retry_delay = 60
-
             self.market_state = {symbol: {'trend': None, 'volatility': None} for symbol in self.symbols}
             self.logger.info("Kraken trading bot initialization completed successfully")
 
@@ -662,33 +778,6 @@ class EnhancedKrakenCryptoBot:
             self.logger.error(f"Initialization error: {str(e)}")
             raise
 
-    async def wait_for_api(self, exceeded_by=0):
-        """Improved rate limiting with adaptive delays"""
-        try:
-            current_time = time.time()
-            time_since_last_call = current_time - self.last_api_call
-            
-            # Base delay
-            base_delay = 1.0
-            
-            # Add additional delay if rate limit was exceeded
-            if exceeded_by > 0:
-                self.api_retry_delay = min(self.api_retry_delay * 1.5, self.max_retry_delay)
-                await asyncio.sleep(self.api_retry_delay)
-            else:
-                # Gradually reduce delay if not exceeded
-                self.api_retry_delay = max(1.0, self.api_retry_delay * 0.9)
-            
-            # Ensure minimum spacing between calls
-            if time_since_last_call < base_delay:
-                await asyncio.sleep(base_delay - time_since_last_call + 0.1)  # Add small buffer
-            
-            self.last_api_call = time.time()
-            
-        except Exception as e:
-            self.logger.error(f"Error in API rate limiting: {str(e)}")
-            await asyncio.sleep(1.0)  # Safe default delay
-
     def _setup_logging(self) -> logging.Logger:
             """Set up logging configuration for console output"""
             logger = logging.getLogger("KrakenCryptoBot")
@@ -728,29 +817,78 @@ class EnhancedKrakenCryptoBot:
             self.logger.error(f"Error formatting price for {symbol}: {str(e)}")
             return str(price)
 
+    async def start_market_stream(self) -> bool:
+        """Subscribe to the shared WebSocket feed and react to its updates"""
+        if self.market_stream is None:
+            return False
+        self.market_stream.add_listener('ticker', self.on_stream_ticker)
+        self.market_stream.add_listener('candle', self.on_stream_candle)
+        await self.market_stream.subscribe(self.symbols)
+        started = self.market_stream.start() is not None
+        if started:
+            self.logger.info("Streaming market data over WebSocket")
+        return started
+
+    def stream_is_synced(self, symbol: str) -> bool:
+        """Whether the stored window for symbol is complete up to the live feed"""
+        return (self.market_stream is not None and self.market_stream.is_live()
+                and self.stream_synced.get(symbol) == self.market_stream.connection_id)
+
+    def _schedule_stream_task(self, key, coro_fn, *args):
+        """Run at most one background job per key, dropping events while it is busy"""
+        task = self.stream_tasks.get(key)
+        if task is not None and not task.done():
+            return
+        self.stream_tasks[key] = asyncio.ensure_future(coro_fn(*args))
+
+    async def sync_stream_candles(self, symbol: str):
+        """Catch the stored window up over REST once per stream connection"""
+        connection_id = self.market_stream.connection_id
+        try:
+            await self.exchange.call_public('OHLC', self.candle_store.update, symbol)
+            self.stream_synced[symbol] = connection_id
+        except Exception as e:
+            self.logger.error(f"Error syncing candles for {symbol}: {str(e)}")
+
+    def on_stream_candle(self, symbol: str, candle: dict, closed: bool):
+        """Apply a streamed candle and advance the indicators when a candle closes"""
+        if symbol not in self.symbols:
+            return
+        try:
+            self.candle_store.apply_candle(symbol, candle)
+            if self.stream_synced.get(symbol) != self.market_stream.connection_id:
+                self._schedule_stream_task(('sync', symbol), self.sync_stream_candles, symbol)
+            elif closed:
+                window = self.candle_store.get_window(symbol)
+                self.feature_pipeline.transform(symbol, window)
+                self.position_triggers.set_reversal(symbol, ma_reversal(window))
+        except Exception as e:
+            self.logger.error(f"Error applying streamed candle for {symbol}: {str(e)}")
+
+    async def iter_market_data(self, symbols):
+        """Fetch candle windows for all symbols concurrently, yielding each as soon as it arrives"""
+        async def fetch(symbol):
+            return symbol, await self.get_historical_data(symbol)
+        
+        tasks = [asyncio.create_task(fetch(symbol)) for symbol in symbols]
+        try:
+            for next_result in asyncio.as_completed(tasks):
+                yield await next_result
+        finally:
+            for task in tasks:
+                task.cancel()
+
     async def get_historical_data(self, symbol: str, lookback_days: int = 7) -> pd.DataFrame:
         """Fetch and preprocess historical data"""
         try:
-            await self.wait_for_api()
-            
-            since = time.time() - (lookback_days * 24 * 60 * 60)
-            ohlc, last = self.k.get_ohlc_data(symbol, interval=self.timeframe, since=since)
-            
-            if ohlc is not None and not ohlc.empty:
-                # Convert all numeric columns to float
-                numeric_columns = ['open', 'high', 'low', 'close', 'volume']
-                for col in numeric_columns:
-                    if col in ohlc.columns:
-                        ohlc[col] = pd.to_numeric(ohlc[col], errors='coerce')
-                
-                # Remove any rows with NaN values in critical columns
-                ohlc = ohlc.dropna(subset=['close', 'volume'])
-                
-                # Ensure positive values
-                ohlc = ohlc[ohlc['close'] > 0]
-                ohlc = ohlc[ohlc['volume'] > 0]
-                
-                self.logger.info(f"Successfully fetched {len(ohlc)} rows of data for {symbol}")
+            # Only candles newer than the stored cursor are downloaded; the
+            # exchange client paces the request against the public budget.
+            # While the WebSocket feed is live the window is already current.
+            if not self.stream_is_synced(symbol):
+                await self.exchange.call_public('OHLC', self.candle_store.update, symbol)
+            
+            ohlc = self.candle_store.get_window(symbol, lookback_days)
+            if not ohlc.empty:
                 return ohlc
                 
             self.logger.warning(f"No historical data returned for {symbol}")
@@ -766,8 +904,9 @@ class EnhancedKrakenCryptoBot:
             if len(df) < self.sma_long:
                 return None
 
-            # Calculate indicators first
-            df = self.calculate_indicators(df)
+            # Calculate indicators first, unless the engine already did
+            if not self.feature_pipeline.has_features(df):
+                df = self.calculate_indicators(df)
             
             latest = df.iloc[-1]
 
@@ -799,159 +938,11 @@ class EnhancedKrakenCryptoBot:
     def calculate_indicators(self, df: pd.DataFrame) -> pd.DataFrame:
         """Calculate technical indicators ensuring all required indicators exist"""
         try:
-            df = df.copy()
-            
-            # Basic price features
-            df['returns'] = df['close'].pct_change()
-            df['log_returns'] = np.log1p(df['returns'])
-            df['rolling_std_20'] = df['returns'].rolling(window=20, min_periods=1).std()
-            
-            # Moving averages (ensure these are calculated first)
-            df['sma_short'] = df['close'].rolling(window=self.sma_short, min_periods=1).mean()
-            df['sma_long'] = df['close'].rolling(window=self.sma_long, min_periods=1).mean()
-            df['sma_20'] = df['close'].rolling(window=20, min_periods=1).mean()
-            df['sma_50'] = df['close'].rolling(window=50, min_periods=1).mean()
-            
-            # Volume features
-            vol_ma = df['volume'].rolling(window=20, min_periods=1).mean()
-            df['volume_ma_ratio'] = df['volume'] / vol_ma
-            
-            # RSI
-            rsi_indicator = ta.momentum.RSIIndicator(close=df['close'], window=14)
-            df['rsi'] = rsi_indicator.rsi()
-            
-            # MACD
-            macd_indicator = ta.trend.MACD(close=df['close'])
-            df['macd'] = macd_indicator.macd()
-            df['macd_signal'] = macd_indicator.macd_signal()
-            df['macd_diff'] = macd_indicator.macd_diff()
-            
-            # Bollinger Bands
-            bb_indicator = ta.volatility.BollingerBands(close=df['close'])
-            df['bb_width'] = (bb_indicator.bollinger_hband() - bb_indicator.bollinger_lband()) / bb_indicator.bollinger_mavg()
-            
-            # ADX
-            adx_indicator = ta.trend.ADXIndicator(high=df['high'], low=df['low'], close=df['close'])
-            df['adx'] = adx_indicator.adx()
-            
-            # Additional features for ML model
-            df['rolling_std_50'] = df['returns'].rolling(window=50, min_periods=1).std()
-            df['volume_std'] = df['volume'].rolling(window=20, min_periods=1).std()
-            df['rsi_divergence'] = df['rsi'].diff()
-            df['mom_14'] = ta.momentum.ROCIndicator(close=df['close'], window=14).roc()
-            df['mom_30'] = ta.momentum.ROCIndicator(close=df['close'], window=30).roc()
-            df['adx_pos'] = adx_indicator.adx_pos()
-            df['adx_neg'] = adx_indicator.adx_neg()
-            
-            # Clean up
-            df = df.replace([np.inf, -np.inf], np.nan)
-            df = df.fillna(method='ffill').fillna(method='bfill').fillna(0)
-            
-            return df
+            return self.feature_pipeline.transform_history(df)
             
         except Exception as e:
             raise ValueError(f"Error calculating indicators: {str(e)}")
 
-    def calculate_advanced_indicators(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Calculate advanced technical indicators with proper error handling"""
-        try:
-            # Create a copy to avoid modifying the original
-            df = df.copy()
-            
-            # Ensure we have required columns and they're numeric
-            required_columns = ['high', 'low', 'close', 'volume']
-            for col in required_columns:
-                if col not in df.columns:
-                    raise ValueError(f"Missing required column: {col}")
-                df[col] = pd.to_numeric(df[col], errors='coerce')
-            
-            # Remove any rows with NaN values in required columns
-            df = df.dropna(subset=required_columns)
-            
-            # Calculate SMAs first
-            df['sma_20'] = df['close'].rolling(window=20, min_periods=1).mean()
-            df['sma_50'] = df['close'].rolling(window=50, min_periods=1).mean()
-            df['sma_20_50_ratio'] = df['sma_20'] / df['sma_50']
-            
-            # Price-based features with error handling
-            df['returns'] = df['close'].pct_change().fillna(0)
-            df['log_returns'] = np.log1p(df['returns'])
-            df['rolling_std_20'] = df['returns'].rolling(window=20, min_periods=1).std()
-            df['rolling_std_50'] = df['returns'].rolling(window=50, min_periods=1).std()
-            
-            # Volume features
-            df['volume_sma'] = df['volume'].rolling(window=20, min_periods=1).mean()
-            df['volume_ma_ratio'] = df['volume'] / df['volume_sma'].replace(0, np.nan)
-            df['volume_std'] = df['volume'].rolling(window=20, min_periods=1).std()
-            
-            try:
-                # RSI with error handling
-                rsi_indicator = ta.momentum.RSIIndicator(close=df['close'].replace(0, np.nan), window=14)
-                df['rsi'] = rsi_indicator.rsi()
-                df['rsi_divergence'] = df['rsi'].diff()
-                
-                # Momentum
-                df['mom_14'] = ta.momentum.ROCIndicator(close=df['close'], window=14).roc()
-                df['mom_30'] = ta.momentum.ROCIndicator(close=df['close'], window=30).roc()
-                
-                # MACD
-                macd_indicator = ta.trend.MACD(
-                    close=df['close'],
-                    window_fast=self.macd_fast,
-                    window_slow=self.macd_slow,
-                    window_sign=self.macd_signal
-                )
-                df['macd'] = macd_indicator.macd()
-                df['macd_signal'] = macd_indicator.macd_signal()
-                df['macd_diff'] = macd_indicator.macd_diff()
-                
-                # Bollinger Bands with error handling
-                bb_indicator = ta.volatility.BollingerBands(close=df['close'])
-                bb_high = bb_indicator.bollinger_hband()
-                bb_low = bb_indicator.bollinger_lband()
-                bb_mid = bb_indicator.bollinger_mavg()
-                
-                # Safely calculate BB metrics
-                df['bb_width'] = (bb_high - bb_low) / bb_mid.replace(0, np.nan)
-                df['bb_position'] = (df['close'] - bb_low) / (bb_high - bb_low).replace(0, np.nan)
-                
-                # ATR and ADX with error handling
-                df['atr'] = ta.volatility.AverageTrueRange(
-                    high=df['high'],
-                    low=df['low'],
-                    close=df['close'],
-                    window=14
-                ).average_true_range()
-                
-                adx_indicator = ta.trend.ADXIndicator(
-                    high=df['high'],
-                    low=df['low'],
-                    close=df['close'],
-                    window=14
-                )
-                df['adx'] = adx_indicator.adx()
-                df['adx_pos'] = adx_indicator.adx_pos()
-                df['adx_neg'] = adx_indicator.adx_neg()
-                
-            except Exception as e:
-                self.logger.error(f"Error calculating technical indicators: {str(e)}")
-                raise
-            
-            # Final cleanup
-            df = df.replace([np.inf, -np.inf], np.nan)
-            df = df.fillna(method='ffill').fillna(method='bfill').fillna(0)
-            
-            # Verify all required features are present and non-null
-            for col in df.columns:
-                if df[col].isnull().any():
-                    self.logger.warning(f"Column {col} contains null values after processing")
-            
-            return df
-            
-        except Exception as e:
-            self.logger.error(f"Error calculating advanced indicators: {str(e)}")
-            raise
-
     def analyze_market_state(self, df: pd.DataFrame) -> dict:
         """Analyze current market state with proper error handling"""
         try:
@@ -1054,25 +1045,53 @@ class EnhancedKrakenCryptoBot:
         except:
             return 0
 
-    def generate_enhanced_signals(self, df: pd.DataFrame, symbol: str) -> dict:
+    def predict_all(self, frames: Dict[str, pd.DataFrame]) -> Dict[str, dict]:
+        """Run batched ML and AI inference for all symbols with enough data"""
+        predictions = {symbol: {} for symbol in frames}
+        try:
+            frames = {symbol: df for symbol, df in frames.items() if len(df) >= self.sma_long}
+            
+            if self.is_initially_trained:
+                features = {symbol: self.model_manager.prepare_features(df) for symbol, df in frames.items()}
+                for symbol, ml_signal in self.model_manager.predict_batch(features).items():
+                    predictions[symbol]['ml'] = ml_signal
+            
+            if self.ai_trained:
+                for symbol, ai_signal in self.ai_enhancer.predict_batch(frames).items():
+                    predictions[symbol]['ai'] = ai_signal
+            
+        except Exception as e:
+            self.logger.error(f"Error in batched prediction: {str(e)}")
+        
+        return predictions
+
+    def generate_enhanced_signals(self, df: pd.DataFrame, symbol: str, predictions: Optional[dict] = None) -> dict:
         """Generate trading signals with core confidence values only"""
         try:
             if len(df) < self.sma_long:
                 return {'action': 'hold', 'confidence': 0.5}
 
-            df = self.calculate_advanced_indicators(df)
+            # Indicators normally come precomputed from the incremental engine
+            df = self.feature_pipeline.ensure(df)
+            
+            # Model outputs come from the batched stage when available
+            predictions = predictions or {}
             
             # Get ML prediction (35% weight)
             ml_confidence = 0.5
-            if self.is_initially_trained:
+            if 'ml' in predictions:
+                ml_confidence = predictions['ml']['confidence']
+            elif self.is_initially_trained:
                 features = self.model_manager.prepare_features(df)
                 ml_signal = self.model_manager.predict(features)
                 ml_confidence = ml_signal['confidence']
 
             # Get AI prediction (25% weight)
             ai_confidence = 0.5
-            if self.ai_trained:
-                ai_signal = self.ai_enhancer.predict_next_movement(df)
+            if 'ai' in predictions:
+                ai_confidence = predictions['ai']['confidence']
+            elif self.ai_trained:
+                ai_signal = self.ai_enhancer.predict_next_movement(df, symbol)
                 ai_confidence = ai_signal['confidence']
 
             # Technical analysis (40% weight)
@@ -1264,48 +1283,8 @@ class EnhancedKrakenCryptoBot:
     
     async def train_ai_models(self, historical_data: pd.DataFrame):
         """Train the AI models with historical data"""
-        try:
-            self.logger.info("Training AI models...")
-            
-            # Prepare sequence data
-            X, y = self.ai_enhancer.prepare_sequence_data(historical_data)
-            
-            if len(X) < 1000:  # Minimum required samples
-                self.logger.warning("Insufficient data for AI training")
-                return False
-            
-            # Split data
-            train_size = int(len(X) * 0.8)
-            X_train, X_test = X[:train_size], X[train_size:]
-            y_train, y_test = y[:train_size], y[train_size:]
-            
-            # Build and train LSTM
-            self.ai_enhancer.lstm_model = self.ai_enhancer.build_lstm_model()
-            self.ai_enhancer.lstm_model.fit(
-                X_train, y_train,
-                epochs=10,
-                batch_size=32,
-                validation_data=(X_test, y_test),
-                verbose=1
-            )
-            
-            # Build and train Transformer
-            self.ai_enhancer.transformer_model = self.ai_enhancer.build_transformer_model()
-            self.ai_enhancer.transformer_model.fit(
-                X_train, y_train,
-                epochs=10,
-                batch_size=32,
-                validation_data=(X_test, y_test),
-                verbose=1
-            )
-            
-            self.ai_trained = True
-            self.logger.info("AI models trained successfully")
-            return True
-            
-        except Exception as e:
-            self.logger.error(f"Error training AI models: {str(e)}")
-            return False
+        self.logger.info("Training AI models...")
+        return await self.train_models(historical_data, train_ml=False)
 
     def format_order_quantity(self, symbol: str, quantity: float) -> str:
         """Format the order quantity according to symbol requirements"""
@@ -1352,16 +1331,14 @@ class EnhancedKrakenCryptoBot:
     async def execute_trade_with_risk_management(self, symbol: str, signal: dict, price: float):
         """Enhanced trade execution with better validation and error handling"""
         try:
-            await self.wait_for_api()
-            
             # Validate price
             if not price or price <= 0:
                 self.logger.error(f"Invalid price for {symbol}: {price}")
                 return None
             
             # Get current balance and positions
-            balance = self.k.get_account_balance()
-            positions = self.k.get_open_positions()
+            balance = await self.exchange.get_account_balance()
+            positions = await self.exchange.get_open_positions()
             
             if isinstance(balance, pd.DataFrame):
                 balance_dict = balance.to_dict()['vol']
@@ -1398,7 +1375,7 @@ class EnhancedKrakenCryptoBot:
                         }
                         
                         self.logger.info(f"Executing sell order: {order_params}")
-                        response = self.k.add_standard_order(**order_params)
+                        response = await self.exchange.add_standard_order(**order_params)
                         
                         if response and 'error' not in response:
                             self.position_tracker.positions.pop(symbol, None)
@@ -1416,6 +1393,11 @@ class EnhancedKrakenCryptoBot:
             # BUY LOGIC
             elif signal['action'] == 'buy':
                 try:
+                    # Refresh a stale quote off the event loop; the check only reads the cache
+                    await self.exchange.run_blocking(self.price_cache.snapshot, symbol)
+                    if not self.spread_acceptable(symbol):
+                        return None
+                        
                     min_requirements = self.get_minimum_order_requirements(symbol)
                     min_volume = min_requirements['min_vol']
                     min_cost = min_volume * price
@@ -1446,7 +1428,7 @@ class EnhancedKrakenCryptoBot:
                     }
                     
                     self.logger.info(f"Executing buy order: {order_params}")
-                    response = self.k.add_standard_order(**order_params)
+                    response = await self.exchange.add_standard_order(**order_params)
                     
                     if response and 'error' not in response:
                         self.position_tracker.update_position(symbol, qty, price)
@@ -1489,64 +1471,56 @@ class EnhancedKrakenCryptoBot:
     async def monitor_positions(self):
         """Monitor and manage open positions"""
         try:
-            for symbol in self.position_tracker.positions:
+            for symbol in list(self.position_tracker.positions):
                 # Get current price
-                current_price = self.get_latest_price(symbol)
-                position_info = self.position_tracker.update_price(symbol, current_price)
-                
-                if position_info:
-                    self.logger.info(f"\nPosition Update - {symbol}:")
-                    self.logger.info(f"Quantity: {position_info['quantity']}")
-                    self.logger.info(f"Entry: ${position_info['entry_price']:.4f}")
-                    self.logger.info(f"Current: ${position_info['current_price']:.4f}")
-                    self.logger.info(f"P&L: {position_info['pnl_pct']:.2f}%")
-                    
-                    # Check for take profit
-                    if position_info['pnl_pct'] >= self.take_profit_pct * 100:
-                        self.logger.info(f"Take profit triggered for {symbol}")
-                        await self.execute_trade_with_risk_management(
-                            symbol, 
-                            {'action': 'sell', 'confidence': 1.0}, 
-                            current_price
-                        )
-                    
-                    # Check for stop loss
-                    elif position_info['pnl_pct'] <= -self.max_drawdown * 100:
-                        self.logger.info(f"Stop loss triggered for {symbol}")
-                        await self.execute_trade_with_risk_management(
-                            symbol, 
-                            {'action': 'sell', 'confidence': 1.0}, 
-                            current_price
-                        )
-                    
-                    # Check trailing stop
-                    elif position_info['pnl_pct'] > 0:
-                        trailing_stop_price = position_info['high_price'] * (1 - self.trailing_stop_pct)
-                        if current_price < trailing_stop_price:
-                            self.logger.info(f"Trailing stop triggered for {symbol}")
-                            await self.execute_trade_with_risk_management(
-                                symbol, 
-                                {'action': 'sell', 'confidence': 1.0}, 
-                                current_price
-                            )
+                current_price = await self.exchange.run_blocking(self.get_latest_price, symbol)
+                await self.check_position_exit(symbol, current_price)
                             
         except Exception as e:
             self.logger.error(f"Error monitoring positions: {str(e)}")
 
-    def setup_database(self):
-        """Set up SQLite database for storing trading data"""
+    async def check_position_exit(self, symbol: str, current_price: float, verbose: bool = True):
+        """Apply take profit, stop loss and trailing stop to one tracked position"""
         try:
-            conn = sqlite3.connect(self.db_name)
-            c = conn.cursor()
+            position = self.position_tracker.positions.get(symbol)
+            if position is None or not current_price:
+                self.position_triggers.untrack(symbol)
+                return
+            
+            self.position_triggers.track(symbol, position)
+            # Only exits whose trigger price this tick crossed are evaluated
+            exits = self.position_triggers.on_price(symbol, current_price)
+            position_info = self.position_tracker.update_price(symbol, current_price)
+            
+            if position_info and verbose:
+                self.logger.info(f"\nPosition Update - {symbol}:")
+                self.logger.info(f"Quantity: {position_info['quantity']}")
+                self.logger.info(f"Entry: ${position_info['entry_price']:.4f}")
+                self.logger.info(f"Current: ${position_info['current_price']:.4f}")
+                self.logger.info(f"P&L: {position_info['pnl_pct']:.2f}%")
+            
+            for _, reason in exits:
+                self.logger.info(f"Exit triggered for {symbol}: {reason.replace('_', ' ')}")
+                await self.execute_trade_with_risk_management(
+                    symbol, 
+                    {'action': 'sell', 'confidence': 1.0}, 
+                    current_price
+                )
+                        
+        except Exception as e:
+            self.logger.error(f"Error checking exit for {symbol}: {str(e)}")
 
-            # Create market data table
-            c.execute('''CREATE TABLE IF NOT EXISTS market_data
-                        (timestamp TEXT, symbol TEXT, price REAL,
-                        volume REAL, rsi REAL, macd REAL, trend INTEGER,
-                        volatility REAL, close REAL)''')
+    def on_stream_ticker(self, symbol: str, snapshot):
+        """Check exits for a tracked position as soon as its price moves"""
+        if symbol in self.position_tracker.positions:
+            self._schedule_stream_task(('exit', symbol), self.check_position_exit,
+                                       symbol, snapshot.last, False)
 
-            conn.commit()
-            conn.close()
+    def setup_database(self):
+        """Set up SQLite database for storing trading data"""
+        try:
+            # Create the market data catalog; migrates the old market_data table
+            self.market_store.create_tables()
 
         except Exception as e:
             self.logger.error(f"Database setup error: {str(e)}")
@@ -1554,11 +1528,8 @@ class EnhancedKrakenCryptoBot:
     def store_trade_data(self, trade_data: dict):
         """Store trade information in database"""
         try:
-            conn = sqlite3.connect(self.db_name)
-            c = conn.cursor()
-
             # Store trade data
-            c.execute('''INSERT INTO trades VALUES
+            self.storage.execute('''INSERT INTO trades VALUES
                         (?,?,?,?,?,?,?)''', (
                 datetime.now().isoformat(),
                 trade_data['symbol'],
@@ -1569,219 +1540,149 @@ class EnhancedKrakenCryptoBot:
                 str(trade_data.get('market_conditions', {}))
             ))
 
-            conn.commit()
-            conn.close()
-
         except Exception as e:
             self.logger.error(f"Error storing trade data: {str(e)}")
 
     def store_market_data(self, symbol: str, df: pd.DataFrame):
-        """Store market data with support for both single symbol and batch operations"""
+        """Store market data rows keyed by symbol and candle time; re-stored candles replace their row"""
         try:
-            conn = sqlite3.connect(self.db_name)
-
-            if isinstance(df.index, pd.DatetimeIndex):
-                df = df.reset_index()
-
-            # Handle both single symbol and batch data
-            if 'symbol' not in df.columns:
-                df['symbol'] = symbol
-
-            # Convert timestamp to string if needed
-            if 'timestamp' not in df.columns and 'timestamp' in df.index.names:
-                df['timestamp'] = df.index.get_level_values('timestamp').astype(str)
-            elif 'timestamp' not in df.columns:
-                df['timestamp'] = pd.Timestamp.now().isoformat()
-
-            # Prepare the required columns
-            market_data = pd.DataFrame({
-                'timestamp': df['timestamp'],
-                'symbol': df['symbol'] if 'symbol' in df.columns else symbol,
-                'close': df['close'],
-                'volume': df['volume'],
-                'rsi': df['rsi'],
-                'macd': df['macd'],
-                'trend': (df['sma_short'] > df['sma_long']).astype(int) if 'sma_short' in df.columns else 0,
-                'volatility': df['volatility'] if 'volatility' in df.columns else df['close'].pct_change().rolling(20).std()
-            })
-
-            # Store data in chunks to prevent memory issues
-            chunk_size = 1000
-            for i in range(0, len(market_data), chunk_size):
-                chunk = market_data.iloc[i:i + chunk_size]
-                chunk.to_sql('market_data', conn, if_exists='append', index=False)
-
-            self.logger.info(f"Stored {len(market_data)} rows of market data")
-            conn.close()
+            rows = market_data_rows(symbol, df)
+            self.market_store.store(symbol, rows)
+
+            self.logger.info(f"Stored {len(rows)} rows of market data")
 
         except Exception as e:
             self.logger.error(f"Error storing market data: {str(e)}")
 
+    async def run_initial_training(self):
+        """Initial training as a background task; signals fall back to technicals until it finishes"""
+        training_success = await self.perform_initial_training()
+        if training_success:
+            self.training_completed = True
+            self.logger.info("Initial training completed successfully!")
+        else:
+            self.logger.error("Initial training failed!")
+
+    def load_models(self) -> bool:
+        """Load the latest compatible trained models from the registry"""
+        try:
+            metadata = self.model_registry.load_latest(self.model_manager, self.ai_enhancer)
+            if metadata is None:
+                return False
+            self.is_initially_trained = True
+            self.ai_trained = bool(metadata.get('has_ai'))
+            self.logger.info(f"Using stored models (version {metadata['version']}, "
+                             f"data window {metadata.get('data_window')})")
+            return True
+        except Exception as e:
+            self.logger.error(f"Error loading stored models: {str(e)}")
+            return False
+
+    def save_models(self, data: Optional[pd.DataFrame] = None):
+        """Store the current models as a new registry version"""
+        try:
+            self.model_registry.save(self.model_manager, self.ai_enhancer, data)
+        except Exception as e:
+            self.logger.error(f"Error saving models: {str(e)}")
+
+    async def collect_training_data(self) -> Optional[pd.DataFrame]:
+        """Refresh every symbol and combine its archived history into one training frame"""
+        all_data = []
+        for symbol in self.symbols:
+            try:
+                # Refresh the window, then train on the archived history as well
+                await self.get_historical_data(symbol)
+                df = self.candle_store.history(symbol, self.training_lookback_days)
+                if df is not None and not df.empty:
+                    df = self.feature_pipeline.transform_history(df)
+                    all_data.append(df)
+                    self.logger.info(f"Collected {len(df)} samples for {symbol}")
+            except Exception as e:
+                self.logger.error(f"Error collecting data for {symbol}: {str(e)}")
+
+        if not all_data:
+            self.logger.warning("No historical data available for training")
+            return None
+        return pd.concat(all_data, ignore_index=True)
+
     async def perform_initial_training(self):
         """Perform initial model training including AI models"""
         try:
             self.logger.info("Starting initial model training...")
             
-            # Get historical data for all symbols
-            all_data = []
-            for symbol in self.symbols:
-                try:
-                    df = await self.get_historical_data(symbol)
-                    if df is not None and not df.empty:
-                        df = self.calculate_indicators(df)
-                        all_data.append(df)
-                        self.logger.info(f"Collected {len(df)} samples for {symbol}")
-                except Exception as e:
-                    self.logger.error(f"Error collecting data for {symbol}: {str(e)}")
-
-            if not all_data:
-                self.logger.warning("No historical data available for training")
+            if self.backfill_requests > 0:
+                await self.exchange.run_blocking(self.backfill.run, list(self.symbols), self.training_lookback_days,
+                                                 max_requests=self.backfill.requests + self.backfill_requests)
+            
+            combined_df = await self.collect_training_data()
+            if combined_df is None:
                 return False
-
-            # Combine all data
-            combined_df = pd.concat(all_data, ignore_index=True)
             
-            # Train ML Model
+            # Fit on the training worker; the current models keep serving meanwhile
+            return await self.train_models(combined_df)
+            
+        except Exception as e:
+            self.logger.error(f"Error in initial training: {str(e)}")
+            return False
+
+    def _fit_models(self, data: pd.DataFrame, train_ml: bool = True) -> tuple:
+        """Fit fresh model instances on data; runs on the training worker thread"""
+        model_manager = None
+        if train_ml:
             try:
-                features_df = self.model_manager.prepare_features(combined_df)
-                labels = self.model_manager.create_labels(combined_df)
+                model_manager = MLModelManager(self.feature_pipeline)
+                features_df = model_manager.prepare_features(data)
+                labels = model_manager.create_labels(data)
                 
-                training_success = self.model_manager.train_model(features_df, labels)
-                if training_success:
-                    self.is_initially_trained = True
+                if model_manager.train_model(features_df, labels):
                     self.logger.info("ML model trained successfully")
                 else:
                     self.logger.error("ML model training failed")
-                    return False
+                    return None, None
             except Exception as e:
                 self.logger.error(f"Error in ML training: {str(e)}")
-                return False
+                return None, None
 
-            # Train AI Models
-            try:
-                self.logger.info("Starting AI model training...")
-                # Prepare sequence data
-                X, y = self.ai_enhancer.prepare_sequence_data(combined_df)
-                
-                if len(X) < 1000:  # Minimum required samples
-                    self.logger.warning("Insufficient data for AI training")
-                    return False
-                
-                # Split data
-                train_size = int(len(X) * 0.8)
-                X_train, X_test = X[:train_size], X[train_size:]
-                y_train, y_test = y[:train_size], y[train_size:]
-                
-                # Build and train LSTM
-                self.logger.info("Training LSTM model...")
-                self.ai_enhancer.lstm_model = self.ai_enhancer.build_lstm_model()
-                self.ai_enhancer.lstm_model.fit(
-                    X_train, y_train,
-                    epochs=10,
-                    batch_size=32,
-                    validation_data=(X_test, y_test),
-                    verbose=1
-                )
-                
-                # Build and train Transformer
-                self.logger.info("Training Transformer model...")
-                self.ai_enhancer.transformer_model = self.ai_enhancer.build_transformer_model()
-                self.ai_enhancer.transformer_model.fit(
-                    X_train, y_train,
-                    epochs=10,
-                    batch_size=32,
-                    validation_data=(X_test, y_test),
-                    verbose=1
-                )
-                
-                self.ai_trained = True
-                self.logger.info("AI models trained successfully")
-                
-            except Exception as e:
-                self.logger.error(f"Error in AI training: {str(e)}")
-                self.logger.error(traceback.format_exc())
-                return False
+        self.logger.info("Starting AI model training...")
+        ai_enhancer = AITradingEnhancer(self.feature_pipeline)
+        if ai_enhancer.fit(data):
+            self.logger.info("AI models trained successfully")
+        else:
+            self.logger.warning("AI model training failed")
+            ai_enhancer = None
 
-            return self.is_initially_trained and self.ai_trained
-            
-        except Exception as e:
-            self.logger.error(f"Error in initial training: {str(e)}")
-            return False
+        # Persist before swapping in; this also exports the AI serving function.
+        # Only freshly fitted models are saved, never the serving ones: a failed
+        # AI fit is stored as an unfitted enhancer, so the version has no AI models
+        if model_manager is not None or ai_enhancer is not None:
+            stored_manager = model_manager or self.model_manager
+            if stored_manager.is_trained:
+                self.model_registry.save(stored_manager, ai_enhancer or AITradingEnhancer(self.feature_pipeline), data)
+
+        return model_manager, ai_enhancer
 
-    def calculate_advanced_indicators(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Calculate advanced technical indicators"""
+    async def train_models(self, data: pd.DataFrame, train_ml: bool = True) -> bool:
+        """Fit new models off the event loop and swap them in when fitting finishes"""
         try:
-            # Create a copy to avoid modifying the original
-            df = df.copy()
-            
-            # Ensure we have required columns
-            required_columns = ['high', 'low', 'close', 'volume']
-            for col in required_columns:
-                if col not in df.columns:
-                    raise ValueError(f"Missing required column: {col}")
-            
-            # Basic price and volume features
-            df['returns'] = df['close'].pct_change()
-            df['log_returns'] = np.log1p(df['returns'].fillna(0))
-            df['rolling_std_20'] = df['returns'].rolling(window=20, min_periods=1).std()
-            df['rolling_std_50'] = df['returns'].rolling(window=50, min_periods=1).std()
-            
-            # Volume features
-            df['volume_sma'] = df['volume'].rolling(window=20, min_periods=1).mean()
-            df['volume_ma_ratio'] = df['volume'] / df['volume_sma']
-            df['volume_std'] = df['volume'].rolling(window=20, min_periods=1).std()
-            
-            # Technical indicators
-            try:
-                # RSI
-                rsi_indicator = ta.momentum.RSIIndicator(close=df['close'], window=14)
-                df['rsi'] = rsi_indicator.rsi()
-                df['rsi_divergence'] = df['rsi'].diff()
-                
-                # Momentum
-                df['mom_14'] = ta.momentum.ROCIndicator(close=df['close'], window=14).roc()
-                df['mom_30'] = ta.momentum.ROCIndicator(close=df['close'], window=30).roc()
-                
-                # MACD
-                macd_indicator = ta.trend.MACD(close=df['close'])
-                df['macd'] = macd_indicator.macd()
-                df['macd_signal'] = macd_indicator.macd_signal()
-                df['macd_diff'] = macd_indicator.macd_diff()
-                
-                # Bollinger Bands
-                bb_indicator = ta.volatility.BollingerBands(close=df['close'])
-                df['bb_width'] = (bb_indicator.bollinger_hband() - bb_indicator.bollinger_lband()) / bb_indicator.bollinger_mavg()
-                df['bb_position'] = (df['close'] - bb_indicator.bollinger_lband()) / (bb_indicator.bollinger_hband() - bb_indicator.bollinger_lband())
-                
-                # ATR and ADX
-                df['atr'] = ta.volatility.AverageTrueRange(
-                    high=df['high'],
-                    low=df['low'],
-                    close=df['close']
-                ).average_true_range()
-                
-                adx_indicator = ta.trend.ADXIndicator(
-                    high=df['high'],
-                    low=df['low'],
-                    close=df['close']
-                )
-                df['adx'] = adx_indicator.adx()
-                df['adx_pos'] = adx_indicator.adx_pos()
-                df['adx_neg'] = adx_indicator.adx_neg()
-                
-            except Exception as e:
-                self.logger.error(f"Error calculating technical indicators: {str(e)}")
-                raise
+            model_manager, ai_enhancer = await self.training_worker.run(self._fit_models, data, train_ml)
+            
+            # Whole instances are replaced, so predictions never see a half-fitted model
+            if model_manager is not None:
+                self.model_manager = model_manager
+                self.is_initially_trained = True
+            if ai_enhancer is not None:
+                self.ai_enhancer = ai_enhancer
+                self.ai_trained = True
             
-            # Clean up any NaN or infinite values
-            df = df.replace([np.inf, -np.inf], np.nan)
-            df = df.fillna(method='ffill').fillna(method='bfill').fillna(0)
+            if train_ml and model_manager is not None and ai_enhancer is None:
+                self.logger.warning("ML models updated; AI models were not retrained")
             
-            return df
+            # Success means the requested models were swapped in
+            return model_manager is not None if train_ml else ai_enhancer is not None
             
         except Exception as e:
-            self.logger.error(f"Error calculating advanced indicators: {str(e)}")
-            raise
+            self.logger.error(f"Error in model training: {str(e)}")
+            return False
 
     async def update_dashboard(self):
             """Update dashboard without IPython clear_output"""
@@ -1820,29 +1721,19 @@ class EnhancedKrakenCryptoBot:
                 # Market Analysis
                 print("\nMarket Analysis:")
                 try:
-                    conn = sqlite3.connect(self.db_name)
-                    cursor = conn.cursor()
-
                     for symbol in self.symbols:
                         print(f"\n{symbol}:")
                         try:
                             # Get data point count for this symbol
-                            cursor.execute("SELECT COUNT(*) FROM market_data WHERE symbol=?", (symbol,))
-                            data_count = cursor.fetchone()[0]
+                            data_count = self.market_store.count(symbol)
                             print(f"  Data Points Collected: {data_count}")
                             print(f"  Minimum Required: {max(self.sma_long, self.min_training_data)}")
 
                             # Get latest data for this symbol
-                            cursor.execute("""
-                                SELECT close, volume, rsi, macd, volatility
-                                FROM market_data
-                                WHERE symbol=?
-                                ORDER BY timestamp DESC
-                                LIMIT 1""", (symbol,))
-                            latest = cursor.fetchone()
+                            latest = self.market_store.latest(symbol)
 
                             if latest:
-                                close, volume, rsi, macd, volatility = latest
+                                close, rsi, volatility = latest['close'], latest['rsi'], latest['volatility']
                                 print(f"  Latest Price: ${float(close):.4f}")
                                 if rsi is not None:
                                     print(f"  RSI: {float(rsi):.2f}")
@@ -1860,7 +1751,6 @@ class EnhancedKrakenCryptoBot:
                         except Exception as e:
                             print(f"  Error getting data: {str(e)}")
 
-                    conn.close()
                 except Exception as e:
                     print(f"Database access error: {str(e)}")
 
@@ -1907,9 +1797,9 @@ class EnhancedKrakenCryptoBot:
     async def collect_data_for_symbol(self, symbol: str):
         """Collect data for a single symbol with proper error handling"""
         try:
-            df = self.get_historical_data(symbol)
+            df = await self.get_historical_data(symbol)
             if df is not None:
-                df = self.calculate_advanced_indicators(df)
+                df = self.feature_pipeline.transform_history(df)
                 self.store_market_data(symbol, df)
                 return True
             return False
@@ -2008,19 +1898,12 @@ class EnhancedKrakenCryptoBot:
     async def retrain_models(self):
         try:
             # Collect new data
-            new_data = await self.collect_all_data()
-            
-            # Prepare features and labels
-            features_df = self.model_manager.prepare_features(new_data)
-            labels = self.model_manager.create_labels(new_data)
-            
-            # Retrain ML model
-            self.model_manager.train_model(features_df, labels)
-            
-            # Retrain AI models
-            await self.train_ai_models(new_data)
+            new_data = await self.collect_training_data()
+            if new_data is None:
+                return False
             
-            return True
+            # Retrain ML and AI models on the training worker
+            return await self.train_models(new_data)
         except Exception as e:
             self.logger.error(f"Error in retraining: {str(e)}")
             return False
@@ -2069,13 +1952,19 @@ class EnhancedKrakenCryptoBot:
             'AVAXUSD': 2
         }.get(symbol, 8)
         
+        # Batched ticker prices shared by all bots in the process
+        price = self.price_cache.get(symbol)
+        if price:
+            return round(price, precision)
+        
         for attempt in range(max_retries):
             try:
-                # Try OHLC first
+                # Fall back to OHLC
                 ohlc = self.k.get_ohlc_data(symbol, interval=1)[0]
                 if ohlc is not None and not ohlc.empty:
                     price = float(ohlc.iloc[-1]['close'])
                     if price > 0:
+                        self.price_cache.update(symbol, price)
                         return round(price, precision)
                         
                 # Fallback to trades
@@ -2083,6 +1972,7 @@ class EnhancedKrakenCryptoBot:
                 if trades is not None and not trades.empty:
                     price = float(trades.iloc[0]['price'])
                     if price > 0:
+                        self.price_cache.update(symbol, price)
                         return round(price, precision)
 
                 if attempt < max_retries - 1:
@@ -2097,10 +1987,18 @@ class EnhancedKrakenCryptoBot:
         self.logger.error(f"Failed to get price for {symbol}")
         return None
 
+    def spread_acceptable(self, symbol: str) -> bool:
+        """Check the cached bid/ask spread before opening a position; never calls the exchange"""
+        spread = self.price_cache.peek_spread(symbol)
+        if spread is not None and spread > self.max_spread_pct:
+            self.logger.warning(f"Spread for {symbol} is {spread*100:.2f}%, above the {self.max_spread_pct*100:.2f}% limit")
+            return False
+        return True
+
     async def initialize_position_tracking(self):
         """Initialize position tracking with proper async handling"""
         try:
-            positions = self.k.get_open_positions()
+            positions = await self.exchange.get_open_positions()
             for pos in positions:
                 symbol = pos['pair']
                 qty = float(pos['vol'])
@@ -2112,106 +2010,90 @@ class EnhancedKrakenCryptoBot:
             self.logger.error(f"Error loading positions: {str(e)}")
             return False
 
-    async def monitor_positions(self):
-        """Monitor positions with proper validation"""
-        try:
-            positions = self.k.get_open_positions()
-            
-            # Reset position tracker if no positions exist
-            if not positions or len(positions) == 0:
-                self.position_tracker.positions = {}
-                return
-                
-            for pos in positions:
-                # Validate position data
-                if not all(k in pos for k in ['pair', 'vol', 'price', 'cost']):
-                    continue
-                    
-                if float(pos['vol']) <= 0:
-                    continue
-                    
-                symbol = pos['pair']
-                qty = float(pos['vol'])
-                price = float(pos['cost']) / qty
-                
-                current_price = self.get_latest_price(symbol)
-                if current_price:
-                    pnl = ((current_price - price) / price) * 100
-                    self.logger.info(f"\nPosition Update - {symbol}:")
-                    self.logger.info(f"Quantity: {qty}")
-                    self.logger.info(f"Entry: ${price:.4f}")
-                    self.logger.info(f"Current: ${current_price:.4f}")
-                    self.logger.info(f"P&L: {pnl:.2f}%")
-                    
-                await asyncio.sleep(1)  # Rate limiting
-                
-        except Exception as e:
-            self.logger.error(f"Error monitoring positions: {str(e)}")
-            self.position_tracker.positions = {}  # Reset on error
+    def shutdown(self):
+        """Release the bot's worker threads once its run loop has stopped"""
+        self.running = False
+        self.training_worker.shutdown()
+        self.exchange.shutdown()
 
     async def run(self):
         self.logger.info("\n=== KRAKEN TRADING BOT STARTED ===")
         
-        # Force initial training
+        # Reuse the latest compatible models instead of retraining from scratch
+        if not self.training_completed and self.load_models():
+            self.training_completed = True
+
+        # Train in the background so the trading loop starts right away
         if not self.training_completed:
-            self.logger.info("Performing initial model training...")
-            training_success = await self.perform_initial_training()
-            if not training_success:
-                self.logger.error("Initial training failed!")
-                return
-            else:
-                self.logger.info("Initial training completed successfully!")
+            self.logger.info("Performing initial model training in the background...")
+            self.training_task = asyncio.create_task(self.run_initial_training())
 
         # Initialize position tracking
         self.position_tracker = PositionTracker()
         await self.initialize_position_tracking()
+        
+        # Event-driven prices and candles when streaming is enabled
+        await self.start_market_stream()
 
-        while self.running:
-            try:
-                # Get and display account balance at start of cycle
-                balance_info = self.get_account_balance()
+        try:
+            while self.running:
+                try:
+                    # One batched ticker refresh serves every price lookup this cycle
+                    await self.exchange.run_blocking(self.price_cache.refresh)
                 
-                # First monitor existing positions
-                await self.monitor_positions()
+                    # Get and display account balance at start of cycle
+                    balance_info = await self.exchange.run_blocking(self.get_account_balance)
                 
-                # Then process new trading opportunities
-                for symbol in self.symbols:
-                    df = await self.get_historical_data(symbol)
-                    
-                    if not df.empty:
-                        df = self.calculate_indicators(df)
-                        signal = self.generate_enhanced_signals(df, symbol)
+                    # First monitor existing positions
+                    await self.monitor_positions()
+                
+                    # Then process new trading opportunities: features for every
+                    # symbol first, so the models can score them in one batch
+                    frames = {}
+                    async for symbol, df in self.iter_market_data(self.symbols):
+                        # Features for one symbol are built while the others are still downloading
+                        if not df.empty:
+                            frames[symbol] = self.feature_pipeline.transform(symbol, df)
+                
+                    predictions = self.predict_all(frames)
+                
+                    for symbol, df in frames.items():
+                        if not df.empty:
+                            signal = self.generate_enhanced_signals(df, symbol, predictions.get(symbol))
                         
-                        self.logger.info(f"\n--- Processing {symbol} ---")
+                            self.logger.info(f"\n--- Processing {symbol} ---")
                         
-                        if signal['action'] != 'hold':
-                            price = df['close'].iloc[-1]
-                            position_size = self.calculate_position_size(symbol, signal)
+                            if signal['action'] != 'hold':
+                                price = df['close'].iloc[-1]
+                                position_size = self.calculate_position_size(symbol, signal)
                             
-                            self.logger.info(f"Signal Generated:")
-                            self.logger.info(f"Action: {signal['action']}")
-                            self.logger.info(f"Confidence: {signal['confidence']:.2f}")
-                            self.logger.info(f"Price: ${price:.4f}")
-                            self.logger.info(f"Position Size: ${position_size:.2f}")
+                                self.logger.info(f"Signal Generated:")
+                                self.logger.info(f"Action: {signal['action']}")
+                                self.logger.info(f"Confidence: {signal['confidence']:.2f}")
+                                self.logger.info(f"Price: ${price:.4f}")
+                                self.logger.info(f"Position Size: ${position_size:.2f}")
                             
-                            if position_size >= self.min_position_value:
-                                self.logger.info(f"Executing trade for {symbol}...")
-                                trade_result = await self.execute_trade_with_risk_management(
-                                    symbol, signal, price
-                                )
-                                if trade_result:
-                                    self.logger.info(f"Trade executed successfully: {trade_result}")
+                                if position_size >= self.min_position_value:
+                                    self.logger.info(f"Executing trade for {symbol}...")
+                                    trade_result = await self.execute_trade_with_risk_management(
+                                        symbol, signal, price
+                                    )
+                                    if trade_result:
+                                        self.logger.info(f"Trade executed successfully: {trade_result}")
+                                    else:
+                                        self.logger.warning(f"Trade execution failed for {symbol}")
                                 else:
-                                    self.logger.warning(f"Trade execution failed for {symbol}")
-                            else:
-                                self.logger.warning(f"Position size ${position_size:.2f} below minimum ${self.min_position_value}")
+                                    self.logger.warning(f"Position size ${position_size:.2f} below minimum ${self.min_position_value}")
 
-                # Sleep for 150 seconds before next cycle
-                await asyncio.sleep(150)
+                    # Sleep for 150 seconds before next cycle
+                    await asyncio.sleep(150)
                     
-            except Exception as e:
-                self.logger.error(f"Error in main loop: {str(e)}")
-                await asyncio.sleep(5)
+                except Exception as e:
+                    self.logger.error(f"Error in main loop: {str(e)}")
+                    await asyncio.sleep(5)
+        finally:
+            self.shutdown()
+
 
 async def main():
     # Initialize and run the bot
@@ -0,0 +1,197 @@
+# backend/bot/kraken_stub.py
+import json
+import time
+import random
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+from urllib.parse import parse_qs
+
+
+class KrakenStubServer:
+    """Local stand-in for the Kraken REST API, for running the bots offline.
+
+    Point krakenex at it with ``api.uri = server.uri``. Public endpoints serve
+    a deterministic random walk per pair; private endpoints return an empty
+    account. ``latency`` adds an artificial delay to every response, which is
+    handy for checking that exchange round-trips no longer block the API.
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0,
+                 prices: Optional[Dict[str, float]] = None, latency: float = 0.0,
+                 interval: int = 5):
+        self.logger = logging.getLogger("KrakenStubServer")
+        self.prices = prices or {
+            'SOLUSD': 150.0,
+            'AVAXUSD': 35.0,
+            'XRPUSD': 0.6,
+            'XDGUSD': 0.15,
+            'SHIBUSD': 0.00002,
+            'PEPEUSD': 0.00001
+        }
+        self.latency = latency
+        self.interval = interval
+        self.balance = {'ZUSD': '100000.0000'}
+        self.orders = []
+        self.requests = 0
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._thread = None
+
+    @property
+    def uri(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> 'KrakenStubServer':
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        self.logger.info(f"Kraken stub listening on {self.uri}")
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # Response builders
+
+    def _candles(self, pair: str, since: Optional[int]) -> list:
+        step = self.interval * 60
+        now = int(time.time()) // step * step
+        start = now - 719 * step
+        if since:
+            start = max(start, int(since) // step * step)
+
+        rows = []
+        base = self.prices.get(pair, 1.0)
+        for ts in range(start, now + step, step):
+            rng = random.Random(f"{pair}-{ts}")
+            close = base * (1 + 0.01 * ((ts // step) % 50 - 25) / 25 + rng.uniform(-0.002, 0.002))
+            open_ = close * (1 + rng.uniform(-0.002, 0.002))
+            high = max(open_, close) * (1 + rng.uniform(0, 0.002))
+            low = min(open_, close) * (1 - rng.uniform(0, 0.002))
+            volume = rng.uniform(100, 1000)
+            rows.append([ts, f"{open_:.8f}", f"{high:.8f}", f"{low:.8f}", f"{close:.8f}",
+                         f"{close:.8f}", f"{volume:.8f}", rng.randint(1, 50)])
+        return rows
+
+    def _trades(self, pair: str, since: Optional[str]) -> list:
+        """Up to 1000 trades after `since` (seconds or nanoseconds), one every 20 seconds"""
+        now = time.time()
+        since = int(since) if since else int(now - 200)
+        since_ns = since if since > 10 ** 12 else since * 10 ** 9
+        step = self.interval * 60
+        base = self.prices.get(pair, 1.0)
+        first = since_ns // (20 * 10 ** 9) * 20 + 20
+        trades = []
+        for ts in range(first, min(int(now), first + 1000 * 20), 20):
+            rng = random.Random(f"{pair}-trade-{ts}")
+            price = base * (1 + 0.01 * ((ts // step) % 50 - 25) / 25 + rng.uniform(-0.002, 0.002))
+            trades.append([f"{price:.8f}", f"{rng.uniform(0.01, 5):.8f}", float(ts),
+                           rng.choice('bs'), 'l', ''])
+        last = str(int(trades[-1][2]) * 10 ** 9) if trades else str(since_ns)
+        return trades, last
+
+    def _last_price(self, pair: str) -> float:
+        return float(self._candles(pair, None)[-1][4])
+
+    def _ticker(self, pair: str) -> dict:
+        price = self._last_price(pair)
+        bid, ask = price * 0.9995, price * 1.0005
+        return {
+            'a': [f"{ask:.8f}", '1', '1.000'],
+            'b': [f"{bid:.8f}", '1', '1.000'],
+            'c': [f"{price:.8f}", '0.5'],
+            'v': ['10000.0', '25000.0'],
+            'p': [f"{price:.8f}", f"{price:.8f}"],
+            't': [100, 250],
+            'l': [f"{price * 0.98:.8f}", f"{price * 0.97:.8f}"],
+            'h': [f"{price * 1.02:.8f}", f"{price * 1.03:.8f}"],
+            'o': f"{price:.8f}"
+        }
+
+    def _public(self, method: str, params: dict):
+        pairs = [p for p in params.get('pair', '').split(',') if p]
+        if method == 'Time':
+            now = int(time.time())
+            return {'unixtime': now, 'rfc1123': time.strftime('%a, %d %b %y %H:%M:%S +0000', time.gmtime(now))}
+        if method == 'OHLC':
+            candles = self._candles(pairs[0], params.get('since'))
+            return {pairs[0]: candles, 'last': candles[-1][0]}
+        if method == 'Ticker':
+            return {pair: self._ticker(pair) for pair in pairs}
+        if method == 'Trades':
+            trades, last = self._trades(pairs[0], params.get('since'))
+            return {pairs[0]: trades, 'last': last}
+        raise KeyError(method)
+
+    def _private(self, method: str, params: dict):
+        if method == 'Balance':
+            return dict(self.balance)
+        if method == 'OpenPositions':
+            return {}
+        if method == 'OpenOrders':
+            return {'open': {}}
+        if method == 'AddOrder':
+            txid = f"OSTUB{len(self.orders) + 1:05d}"
+            self.orders.append(dict(params, txid=txid))
+            return {'descr': {'order': f"{params.get('type')} {params.get('volume')} {params.get('pair')}"},
+                    'txid': [txid]}
+        raise KeyError(method)
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length).decode() if length else ''
+                params = {k: v[0] for k, v in parse_qs(body).items()}
+                self._respond(params)
+
+            def do_GET(self):
+                query = self.path.split('?', 1)[1] if '?' in self.path else ''
+                params = {k: v[0] for k, v in parse_qs(query).items()}
+                self._respond(params)
+
+            def _respond(self, params: dict):
+                stub.requests += 1
+                if stub.latency:
+                    time.sleep(stub.latency)
+
+                parts = self.path.split('?', 1)[0].strip('/').split('/')
+                try:
+                    _, scope, method = parts
+                    result = stub._public(method, params) if scope == 'public' else stub._private(method, params)
+                    payload = {'error': [], 'result': result}
+                except (KeyError, ValueError, IndexError):
+                    payload = {'error': ["EGeneral:Unknown method"]}
+
+                data = json.dumps(payload).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    server = KrakenStubServer(port=8765).start()
+    print(f"Serving Kraken stub on {server.uri} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
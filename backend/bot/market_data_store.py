@@ -0,0 +1,152 @@
+# backend/bot/market_data_store.py
+import re
+import time
+import logging
+import threading
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+from .storage import SQLiteStorage, get_storage
+
+DAY = 24 * 60 * 60
+COLUMNS = ['close', 'volume', 'rsi', 'macd', 'trend', 'volatility']
+_PARTITION = re.compile(r'^market_data_(\d{8})$')
+
+
+class MarketDataStore:
+    """Per-symbol market data rows keyed by (symbol, ts_epoch), partitioned by UTC day.
+
+    Each day is its own WITHOUT ROWID table whose primary key (symbol, ts)
+    is the clustered index, so the latest row of a symbol and a symbol's
+    rows in a time range are index seeks rather than scans, and storing a
+    candle again replaces it. A small catalog keeps the row count of every
+    (symbol, day), which answers per-symbol counts and finds the newest
+    partition holding a symbol. Retention drops whole day tables, which is
+    constant work per day however many rows they hold.
+    """
+
+    def __init__(self, storage: Optional[SQLiteStorage] = None, retention_days: int = 7):
+        self.logger = logging.getLogger("MarketDataStore")
+        self.storage = storage or get_storage()
+        self.retention_days = retention_days
+        self._known: set = set()
+        self._lock = threading.Lock()
+        self.create_tables()
+
+    @staticmethod
+    def partition_name(day: int) -> str:
+        return 'market_data_' + time.strftime('%Y%m%d', time.gmtime(day * DAY))
+
+    def create_tables(self):
+        with self.storage.transaction() as conn:
+            conn.execute('''CREATE TABLE IF NOT EXISTS market_data_counts
+                            (symbol TEXT, day INTEGER, rows INTEGER, PRIMARY KEY (symbol, day)) WITHOUT ROWID''')
+        if self.storage.query("SELECT 1 FROM sqlite_master WHERE type='table' AND name='market_data'"):
+            self._migrate_legacy()
+
+    def _ensure_partition(self, conn, day: int) -> str:
+        name = self.partition_name(day)
+        if name not in self._known:
+            conn.execute(f'''CREATE TABLE IF NOT EXISTS {name}
+                             (symbol TEXT, ts INTEGER, close REAL, volume REAL, rsi REAL, macd REAL,
+                             trend INTEGER, volatility REAL, PRIMARY KEY (symbol, ts)) WITHOUT ROWID''')
+            with self._lock:
+                self._known.add(name)
+        return name
+
+    def partitions(self) -> List[int]:
+        """Days that have a partition, oldest first"""
+        days = []
+        for (name,) in self.storage.query("SELECT name FROM sqlite_master WHERE type='table' "
+                                          "AND name LIKE 'market\\_data\\_%' ESCAPE '\\'"):
+            match = _PARTITION.match(name)
+            if match:
+                days.append(int(pd.Timestamp(match.group(1)).timestamp()) // DAY)
+        return sorted(days)
+
+    def store(self, symbol: str, frame: pd.DataFrame) -> int:
+        """Insert or replace rows of symbol; frame needs an epoch-second 'ts' column and COLUMNS"""
+        if frame is None or frame.empty:
+            return 0
+        ts = pd.to_numeric(frame['ts'], errors='coerce').to_numpy(dtype=float)
+        values = {col: (frame[col] if col in frame.columns else pd.Series(np.nan, index=frame.index))
+                  for col in COLUMNS}
+        rows = pd.DataFrame({'ts': ts, **{col: pd.to_numeric(v, errors='coerce').to_numpy(dtype=float)
+                                          for col, v in values.items()}}).dropna(subset=['ts'])
+        rows['ts'] = rows['ts'].astype(np.int64)
+        rows = rows.drop_duplicates('ts', keep='last')
+        rows['day'] = rows['ts'] // DAY
+
+        with self.storage.transaction() as conn:
+            for day, part in rows.groupby('day'):
+                name = self._ensure_partition(conn, int(day))
+                records = [
+                    (symbol, int(row.ts), *[None if pd.isna(v) else v for v in row[2:]])
+                    for row in part[['ts'] + COLUMNS].itertuples()
+                ]
+                conn.executemany(f'INSERT OR REPLACE INTO {name} VALUES (?, ?, ?, ?, ?, ?, ?, ?)', records)
+                conn.execute(f'''INSERT OR REPLACE INTO market_data_counts
+                                 SELECT ?, ?, COUNT(*) FROM {name} WHERE symbol = ?''', (symbol, int(day), symbol))
+        return len(rows)
+
+    def count(self, symbol: str) -> int:
+        row = self.storage.query('SELECT SUM(rows) FROM market_data_counts WHERE symbol = ?', (symbol,))
+        return int(row[0][0] or 0)
+
+    def latest(self, symbol: str) -> Optional[dict]:
+        """Newest stored row of symbol"""
+        day = self.storage.query('SELECT MAX(day) FROM market_data_counts WHERE symbol = ? AND rows > 0',
+                                 (symbol,))[0][0]
+        if day is None:
+            return None
+        row = self.storage.query(f'''SELECT ts, {', '.join(COLUMNS)} FROM {self.partition_name(day)}
+                                     WHERE symbol = ? ORDER BY ts DESC LIMIT 1''', (symbol,))
+        return dict(zip(['ts'] + COLUMNS, row[0])) if row else None
+
+    def drop_before(self, cutoff: float) -> int:
+        """Drop every day partition that ends before cutoff; returns how many were dropped"""
+        expired = [day for day in self.partitions() if (day + 1) * DAY <= cutoff]
+        with self.storage.transaction() as conn:
+            for day in expired:
+                name = self.partition_name(day)
+                conn.execute(f'DROP TABLE IF EXISTS {name}')
+                conn.execute('DELETE FROM market_data_counts WHERE day = ?', (day,))
+                with self._lock:
+                    self._known.discard(name)
+        return len(expired)
+
+    def drop_expired(self) -> int:
+        """Apply the retention period"""
+        return self.drop_before(time.time() - self.retention_days * DAY)
+
+    def _migrate_legacy(self):
+        """Move rows of the old unindexed market_data table into day partitions"""
+        legacy = pd.read_sql_query('SELECT * FROM market_data', self.storage.connection())
+        if not legacy.empty:
+            stamps = pd.to_datetime(legacy['timestamp'], errors='coerce', format='mixed')
+            legacy['ts'] = (stamps - pd.Timestamp(0)) // pd.Timedelta(seconds=1)
+            for symbol, rows in legacy.groupby('symbol'):
+                self.store(symbol, rows)
+        self.storage.execute('DROP TABLE market_data')
+        self.logger.info(f"Migrated {len(legacy)} rows from the legacy market_data table")
+
+
+def market_data_rows(symbol: str, df: pd.DataFrame) -> pd.DataFrame:
+    """Rows for MarketDataStore from an indicator frame; candles are keyed by their Kraken time"""
+    if 'time' in df.columns:
+        ts = pd.to_numeric(df['time'], errors='coerce')
+    elif isinstance(df.index, pd.DatetimeIndex):
+        ts = pd.Series((df.index - pd.Timestamp(0)) // pd.Timedelta(seconds=1), index=df.index)
+    else:
+        ts = pd.Series(int(time.time()), index=df.index)
+    return pd.DataFrame({
+        'ts': ts,
+        'close': df['close'],
+        'volume': df['volume'],
+        'rsi': df['rsi'] if 'rsi' in df.columns else np.nan,
+        'macd': df['macd'] if 'macd' in df.columns else np.nan,
+        'trend': (df['sma_short'] > df['sma_long']).astype(int) if 'sma_short' in df.columns else 0,
+        'volatility': df['volatility'] if 'volatility' in df.columns else df['close'].pct_change().rolling(20).std()
+    })
@@ -0,0 +1,337 @@
+# backend/bot/market_stream.py
+import os
+import json
+import time
+import asyncio
+import logging
+import threading
+from typing import Callable, Dict, Iterable, List, Optional
+
+try:
+    import websockets
+except ImportError:  # streaming mode is optional; REST polling keeps working without it
+    websockets = None
+
+from .price_cache import TickerSnapshot, get_price_cache
+
+KRAKEN_WS_URL = 'wss://ws.kraken.com'
+
+
+def ws_pair(symbol: str) -> str:
+    """REST pair name (SOLUSD) to WebSocket pair name (SOL/USD)"""
+    if '/' in symbol:
+        return symbol
+    return f"{symbol[:-3]}/{symbol[-3:]}"
+
+
+def rest_pair(pair: str) -> str:
+    """WebSocket pair name (SOL/USD) to REST pair name (SOLUSD)"""
+    return pair.replace('/', '')
+
+
+class KrakenMarketStream:
+    """Streaming ticker and OHLC feed from Kraken's WebSocket API (v1).
+
+    Ticker updates are written straight into the shared PriceCache, so price
+    lookups need no REST requests while the stream is live. Each OHLC update
+    is handed to the registered 'candle' listeners together with a flag
+    telling whether the previous candle just closed. Listeners may be plain
+    functions or coroutine functions and are called on the event loop.
+
+    Heartbeats arrive every second when there is no traffic, so a connection
+    that stays silent for ``stale_after`` seconds is treated as down and
+    callers fall back to REST polling.
+    """
+
+    def __init__(self, url: Optional[str] = None, interval: int = 5, price_cache=None,
+                 record_path: Optional[str] = None, reconnect_delay: float = 5.0,
+                 stale_after: float = 10.0):
+        self.logger = logging.getLogger("KrakenMarketStream")
+        self.url = url or os.environ.get('KRAKEN_WS_URL', KRAKEN_WS_URL)
+        self.interval = interval
+        self.price_cache = price_cache or get_price_cache()
+        self.price_cache.feed = self
+        self.record_path = record_path
+        self.reconnect_delay = reconnect_delay
+        self.stale_after = stale_after
+
+        self.symbols = set()
+        self.listeners: Dict[str, List[Callable]] = {'ticker': [], 'candle': []}
+        self.current_candles: Dict[str, dict] = {}
+        self.connection_id = 0
+        self.connected = False
+        self.last_message = 0.0
+        self.messages = 0
+
+        self._ws = None
+        self._task = None
+        self._record_file = None
+        self._record_start = None
+
+    @property
+    def available(self) -> bool:
+        return websockets is not None
+
+    def is_live(self) -> bool:
+        """Whether the connection is up and has delivered a message recently"""
+        return self.connected and time.monotonic() - self.last_message < self.stale_after
+
+    def add_listener(self, kind: str, callback: Callable):
+        self.listeners[kind].append(callback)
+
+    def remove_listener(self, kind: str, callback: Callable):
+        if callback in self.listeners[kind]:
+            self.listeners[kind].remove(callback)
+
+    async def subscribe(self, symbols: Iterable[str]):
+        """Add pairs to the feed; subscribes immediately if already connected"""
+        new_symbols = set(symbols) - self.symbols
+        self.symbols.update(new_symbols)
+        if new_symbols and self._ws is not None:
+            await self._send_subscriptions(sorted(new_symbols))
+
+    def start(self) -> Optional[asyncio.Task]:
+        """Run the feed in a background task on the current event loop"""
+        if not self.available:
+            self.logger.error("The websockets package is not installed, market stream disabled")
+            return None
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run())
+        return self._task
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+        self.connected = False
+        self._close_recording()
+
+    async def run(self):
+        """Connect and process messages, reconnecting after failures"""
+        while True:
+            try:
+                async with websockets.connect(self.url, ping_interval=20) as ws:
+                    self._ws = ws
+                    self.connection_id += 1
+                    self.current_candles = {}
+                    self.logger.info(f"Connected to market stream {self.url}")
+                    await self._send_subscriptions(sorted(self.symbols))
+                    async for raw in ws:
+                        self.handle_message(raw)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.error(f"Market stream error: {str(e)}")
+            finally:
+                self._ws = None
+                self.connected = False
+
+            self.logger.info(f"Reconnecting market stream in {self.reconnect_delay:.0f}s")
+            await asyncio.sleep(self.reconnect_delay)
+
+    async def _send_subscriptions(self, symbols: List[str]):
+        if not symbols:
+            return
+        pairs = [ws_pair(symbol) for symbol in symbols]
+        for subscription in ({'name': 'ticker'}, {'name': 'ohlc', 'interval': self.interval}):
+            await self._ws.send(json.dumps({'event': 'subscribe', 'pair': pairs,
+                                            'subscription': subscription}))
+
+    # Message handling
+
+    def handle_message(self, raw):
+        """Parse one raw WebSocket message and update state; safe to call from tests and replays"""
+        self.last_message = time.monotonic()
+        self.messages += 1
+        self._record(raw)
+
+        try:
+            message = json.loads(raw)
+        except ValueError:
+            self.logger.warning(f"Ignoring malformed market stream message: {str(raw)[:100]}")
+            return
+
+        if isinstance(message, dict):
+            self._handle_event(message)
+            return
+
+        # Channel messages: [channelID, data, channelName, pair]
+        if not isinstance(message, list) or len(message) < 4:
+            return
+        channel, pair, data = message[-2], message[-1], message[1]
+        symbol = rest_pair(pair)
+        try:
+            if channel == 'ticker':
+                self._on_ticker(symbol, data)
+            elif channel.startswith('ohlc'):
+                self._on_ohlc(symbol, data)
+        except (KeyError, IndexError, TypeError, ValueError) as e:
+            self.logger.warning(f"Bad {channel} update for {symbol}: {str(e)}")
+
+    def _handle_event(self, message: dict):
+        event = message.get('event')
+        if event == 'systemStatus':
+            self.connected = message.get('status') == 'online'
+            self.logger.info(f"Market stream status: {message.get('status')}")
+        elif event == 'subscriptionStatus' and message.get('status') == 'error':
+            self.logger.error(f"Subscription failed for {message.get('pair')}: {message.get('errorMessage')}")
+        elif event == 'heartbeat':
+            self.connected = True
+
+    def _on_ticker(self, symbol: str, data: dict):
+        snapshot = TickerSnapshot.from_ticker(symbol, data)
+        if snapshot.last > 0:
+            self.price_cache.put(snapshot)
+            self._emit('ticker', symbol, snapshot)
+
+    def _on_ohlc(self, symbol: str, data: list):
+        # [time, etime, open, high, low, close, vwap, volume, count]
+        end_time = int(float(data[1]))
+        candle = {
+            'time': end_time - self.interval * 60,
+            'open': float(data[2]),
+            'high': float(data[3]),
+            'low': float(data[4]),
+            'close': float(data[5]),
+            'vwap': float(data[6]),
+            'volume': float(data[7]),
+            'count': int(data[8])
+        }
+        previous = self.current_candles.get(symbol)
+        closed = previous is not None and previous['time'] < candle['time']
+        self.current_candles[symbol] = candle
+        self._emit('candle', symbol, candle, closed)
+
+    def _emit(self, kind: str, *args):
+        for callback in list(self.listeners[kind]):
+            try:
+                result = callback(*args)
+                if asyncio.iscoroutine(result):
+                    asyncio.ensure_future(result)
+            except Exception as e:
+                self.logger.error(f"Error in market stream {kind} listener: {str(e)}")
+
+    # Recording, for the replay server
+
+    def _record(self, raw):
+        if not self.record_path:
+            return
+        try:
+            if self._record_file is None:
+                self._record_file = open(self.record_path, 'a')
+                self._record_start = time.monotonic()
+            offset = time.monotonic() - self._record_start
+            self._record_file.write(json.dumps({'t': round(offset, 4), 'msg': raw}) + '\n')
+        except Exception as e:
+            self.logger.error(f"Error recording market stream: {str(e)}")
+            self.record_path = None
+
+    def _close_recording(self):
+        if self._record_file is not None:
+            self._record_file.close()
+            self._record_file = None
+
+
+class MarketReplayServer:
+    """Serves recorded Kraken WebSocket messages for offline testing.
+
+    Reads the JSONL files written by KrakenMarketStream(record_path=...) and
+    replays them to every client with the original spacing divided by
+    ``speed``. Point the bots at it with ``KRAKEN_WS_URL=server.uri``.
+    """
+
+    def __init__(self, path: str, host: str = '127.0.0.1', port: int = 0,
+                 speed: float = 1.0, repeat: bool = False):
+        self.logger = logging.getLogger("MarketReplayServer")
+        self.path = path
+        self.host = host
+        self.port = port
+        self.speed = speed
+        self.repeat = repeat
+        self.messages = self._load(path)
+        self._server = None
+
+    @staticmethod
+    def _load(path: str) -> List[tuple]:
+        messages = []
+        with open(path) as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                record = json.loads(line)
+                messages.append((float(record['t']), record['msg']))
+        return messages
+
+    @property
+    def uri(self) -> str:
+        return f"ws://{self.host}:{self.port}"
+
+    async def start(self) -> 'MarketReplayServer':
+        if websockets is None:
+            raise RuntimeError("The websockets package is required for the replay server")
+        self._server = await websockets.serve(self._handler, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        self.logger.info(f"Replaying {len(self.messages)} messages on {self.uri}")
+        return self
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc):
+        await self.stop()
+
+    async def _handler(self, ws, *args):
+        await ws.send(json.dumps({'event': 'systemStatus', 'status': 'online', 'version': 'replay'}))
+        consumer = asyncio.ensure_future(self._acknowledge(ws))
+        try:
+            while True:
+                previous = None
+                for offset, raw in self.messages:
+                    if previous is not None and offset > previous:
+                        await asyncio.sleep((offset - previous) / self.speed)
+                    previous = offset
+                    await ws.send(raw)
+                if not self.repeat:
+                    break
+            await ws.wait_closed()
+        except Exception:
+            pass
+        finally:
+            consumer.cancel()
+
+    async def _acknowledge(self, ws):
+        """Answer subscribe requests the way Kraken does"""
+        async for raw in ws:
+            try:
+                request = json.loads(raw)
+            except ValueError:
+                continue
+            if request.get('event') != 'subscribe':
+                continue
+            for pair in request.get('pair', []):
+                await ws.send(json.dumps({'event': 'subscriptionStatus', 'status': 'subscribed',
+                                          'pair': pair, 'subscription': request.get('subscription')}))
+
+
+_shared_stream: Optional[KrakenMarketStream] = None
+_shared_lock = threading.Lock()
+
+
+def get_market_stream(interval: int = 5) -> KrakenMarketStream:
+    """The process-wide market stream; all bots share one WebSocket connection"""
+    global _shared_stream
+    with _shared_lock:
+        if _shared_stream is None:
+            _shared_stream = KrakenMarketStream(interval=interval)
+        return _shared_stream
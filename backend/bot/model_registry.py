@@ -0,0 +1,183 @@
+# backend/bot/model_registry.py
+import os
+import json
+import shutil
+import hashlib
+import logging
+from datetime import datetime
+from typing import Iterable, List, Optional, Tuple
+
+import joblib
+import pandas as pd
+
+
+class ModelRegistry:
+    """Versioned on-disk store for the ML and AI trading models.
+
+    Each version directory holds the RandomForest model and scaler, the
+    Keras weights, the sequence scaler and the exported serving function,
+    plus a metadata file describing the feature set, symbols and training
+    data. The metadata file is written last, so a version without it is
+    incomplete. Registries for different symbol universes get their own
+    directory, so bots trading other symbols never load or prune them.
+    """
+
+    METADATA_FILE = 'metadata.json'
+    ML_MODEL_FILE = 'ml_model.joblib'
+    ML_SCALER_FILE = 'ml_scaler.joblib'
+    AI_SCALER_FILE = 'ai_scaler.joblib'
+    LSTM_WEIGHTS_FILE = 'lstm.weights.h5'
+    TRANSFORMER_WEIGHTS_FILE = 'transformer.weights.h5'
+    SERVING_DIR = 'serving'
+
+    def __init__(self, base_dir: str = os.path.join('models', 'registry'),
+                 name: str = 'trading_model', symbols: Iterable[str] = (), keep_versions: int = 5):
+        self.logger = logging.getLogger("ModelRegistry")
+        self.symbols = sorted(symbols)
+        if self.symbols:
+            name = f"{name}-{hashlib.sha256(','.join(self.symbols).encode()).hexdigest()[:8]}"
+        self.root = os.path.join(base_dir, name)
+        self.keep_versions = keep_versions
+
+        try:
+            os.makedirs(self.root, exist_ok=True)
+        except Exception as e:
+            self.logger.error(f"Could not create model registry {self.root}: {str(e)}")
+
+    def _versions(self) -> List[Tuple[int, str]]:
+        """Existing version numbers and directories, oldest first"""
+        versions = []
+        try:
+            for entry in os.listdir(self.root):
+                if entry.startswith('v') and entry[1:].isdigit():
+                    versions.append((int(entry[1:]), os.path.join(self.root, entry)))
+        except FileNotFoundError:
+            pass
+        return sorted(versions)
+
+    def _claim_version(self) -> Tuple[int, str]:
+        """Create the next version directory, tolerating concurrent writers"""
+        versions = self._versions()
+        version = versions[-1][0] + 1 if versions else 1
+        while True:
+            path = os.path.join(self.root, f"v{version:04d}")
+            try:
+                os.makedirs(path)
+                return version, path
+            except FileExistsError:
+                version += 1
+
+    @staticmethod
+    def _data_window(data: Optional[pd.DataFrame]) -> dict:
+        if data is None or data.empty:
+            return {}
+        window = {'rows': int(len(data))}
+        if 'time' in data.columns:
+            window['start'] = int(data['time'].min())
+            window['end'] = int(data['time'].max())
+        return window
+
+    def _expected_metadata(self, model_manager, ai_enhancer) -> dict:
+        return {
+            'feature_columns': model_manager.get_model_features(),
+            'sequence_features': list(ai_enhancer.pipeline.SEQUENCE_FEATURES),
+            'sequence_length': ai_enhancer.sequence_length,
+            'n_features': ai_enhancer.n_features,
+            'symbols': self.symbols
+        }
+
+    def is_compatible(self, metadata: dict, model_manager, ai_enhancer) -> bool:
+        """Check that a stored version was trained on the features and symbols the bot uses now"""
+        expected = self._expected_metadata(model_manager, ai_enhancer)
+        return all(metadata.get(key) == value for key, value in expected.items())
+
+    def save(self, model_manager, ai_enhancer, data: Optional[pd.DataFrame] = None) -> Optional[int]:
+        """Store the currently trained models as a new version"""
+        if not model_manager.is_trained or model_manager.model is None:
+            self.logger.warning("ML model is not trained, nothing to save")
+            return None
+
+        version, path = self._claim_version()
+        try:
+            joblib.dump(model_manager.model, os.path.join(path, self.ML_MODEL_FILE))
+            joblib.dump(model_manager.scaler, os.path.join(path, self.ML_SCALER_FILE))
+
+            has_ai = ai_enhancer.lstm_model is not None and ai_enhancer.transformer_model is not None
+            if has_ai:
+                joblib.dump(ai_enhancer.feature_scaler, os.path.join(path, self.AI_SCALER_FILE))
+                ai_enhancer.lstm_model.save_weights(os.path.join(path, self.LSTM_WEIGHTS_FILE))
+                ai_enhancer.transformer_model.save_weights(os.path.join(path, self.TRANSFORMER_WEIGHTS_FILE))
+                # Also switches live inference to the exported function
+                ai_enhancer.export_inference(os.path.join(path, self.SERVING_DIR))
+
+            metadata = self._expected_metadata(model_manager, ai_enhancer)
+            metadata.update({
+                'version': version,
+                'created_at': datetime.now().isoformat(),
+                'has_ai': has_ai,
+                'data_window': self._data_window(data)
+            })
+            with open(os.path.join(path, self.METADATA_FILE), 'w') as f:
+                json.dump(metadata, f, indent=2)
+
+            self.logger.info(f"Saved models as version {version} in {path}")
+            self._prune()
+            return version
+
+        except Exception as e:
+            self.logger.error(f"Error saving models to {path}: {str(e)}")
+            shutil.rmtree(path, ignore_errors=True)
+            return None
+
+    def _read_metadata(self, path: str) -> Optional[dict]:
+        metadata_path = os.path.join(path, self.METADATA_FILE)
+        if not os.path.exists(metadata_path):
+            return None
+        try:
+            with open(metadata_path) as f:
+                return json.load(f)
+        except Exception as e:
+            self.logger.error(f"Error reading model metadata {metadata_path}: {str(e)}")
+            return None
+
+    def load_latest(self, model_manager, ai_enhancer) -> Optional[dict]:
+        """Load the newest compatible version into the given managers; returns its metadata"""
+        for version, path in reversed(self._versions()):
+            metadata = self._read_metadata(path)
+            if metadata is None or not self.is_compatible(metadata, model_manager, ai_enhancer):
+                continue
+            try:
+                model = joblib.load(os.path.join(path, self.ML_MODEL_FILE))
+                scaler = joblib.load(os.path.join(path, self.ML_SCALER_FILE))
+
+                if metadata.get('has_ai'):
+                    feature_scaler = joblib.load(os.path.join(path, self.AI_SCALER_FILE))
+                    lstm_model = ai_enhancer.build_lstm_model()
+                    lstm_model.load_weights(os.path.join(path, self.LSTM_WEIGHTS_FILE))
+                    transformer_model = ai_enhancer.build_transformer_model()
+                    transformer_model.load_weights(os.path.join(path, self.TRANSFORMER_WEIGHTS_FILE))
+
+                    ai_enhancer.lstm_model = lstm_model
+                    ai_enhancer.transformer_model = transformer_model
+                    ai_enhancer.feature_scaler = feature_scaler
+                    ai_enhancer.inference_buffers = {}
+                    if not ai_enhancer.load_inference(os.path.join(path, self.SERVING_DIR)):
+                        ai_enhancer.serving_model = None
+
+                model_manager.model = model
+                model_manager.scaler = scaler
+                model_manager.is_trained = True
+
+                self.logger.info(f"Loaded model version {version} (trained {metadata.get('created_at')})")
+                return metadata
+
+            except Exception as e:
+                self.logger.error(f"Error loading model version {version}: {str(e)}")
+
+        return None
+
+    def _prune(self):
+        """Remove all but the newest keep_versions versions"""
+        versions = self._versions()
+        for _, path in versions[:-self.keep_versions]:
+            shutil.rmtree(path, ignore_errors=True)
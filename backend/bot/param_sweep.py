@@ -0,0 +1,221 @@
+# backend/bot/param_sweep.py
+import os
+import json
+import random
+import logging
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .backtest import Backtester
+from .position_triggers import ExitRules
+from .strategy import DEMO_ALLOCATIONS, StrategyParams
+
+# Columns the backtest reads from a precomputed history, shared as one
+# float64 matrix per symbol
+SHARED_COLUMNS = ['time', 'open', 'high', 'low', 'close', 'volume', 'sma_20', 'sma_50', 'rsi',
+                  'macd', 'macd_signal', 'volume_ma_ratio', 'bb_position', 'market_cycle']
+CYCLE_NAMES = ["unknown", "bull_trend", "bear_trend", "high_volatility", "ranging_support",
+               "ranging", "breakout", "mixed"]
+EXIT_FIELDS = set(vars(ExitRules()))
+
+
+def build_params(overrides: dict) -> Tuple[StrategyParams, dict]:
+    """Signal params and ExitRules keyword overrides for one parameter combination.
+
+    Names are StrategyParams fields (``buy_threshold``, ``favorable_markets``...),
+    optionally for one coin only (``buy_threshold:SOLUSD``), or ExitRules
+    attributes (``take_profit_pct``, ``trailing_tiers``, ``time_exit_hours``...).
+    """
+    params = StrategyParams()
+    exit_overrides = {}
+    for name, value in overrides.items():
+        field, _, symbol = name.partition(':')
+        if field in StrategyParams.FIELDS or field == 'sell_threshold':
+            params.set(field, value, symbol or None)
+        elif field in EXIT_FIELDS and not symbol:
+            exit_overrides[field] = value
+        else:
+            raise ValueError(f"Unknown sweep parameter: {name}")
+    return params, exit_overrides
+
+
+def grid(space: Dict[str, list]) -> List[dict]:
+    """Every combination of the listed values"""
+    names = list(space)
+    return [dict(zip(names, values)) for values in itertools.product(*(space[name] for name in names))]
+
+
+def random_search(space: Dict[str, object], samples: int, seed: Optional[int] = None) -> List[dict]:
+    """Random combinations; lists are sampled as choices, (low, high) tuples uniformly"""
+    rng = random.Random(seed)
+    combos = []
+    for _ in range(samples):
+        combo = {}
+        for name, values in space.items():
+            if isinstance(values, tuple):
+                combo[name] = rng.uniform(*values)
+            else:
+                combo[name] = rng.choice(values)
+        combos.append(combo)
+    return combos
+
+
+# Worker side: histories are attached once per process, not per task
+
+_worker_histories: Dict[str, pd.DataFrame] = {}
+_worker_blocks: List[shared_memory.SharedMemory] = []
+_worker_options: dict = {}
+
+
+def _init_worker(layout: Dict[str, Tuple[str, Tuple[int, int]]], options: dict):
+    for symbol, (name, shape) in layout.items():
+        block = shared_memory.SharedMemory(name=name)
+        _worker_blocks.append(block)
+        values = np.ndarray(shape, dtype=np.float64, buffer=block.buf)
+        history = pd.DataFrame(values, columns=SHARED_COLUMNS, copy=False)
+        history['market_cycle'] = pd.Categorical.from_codes(values[:, -1].astype(int), CYCLE_NAMES).astype(object)
+        _worker_histories[symbol] = history
+    _worker_options.update(options)
+
+
+def _run_combo(index: int, overrides: dict) -> dict:
+    try:
+        params, exit_overrides = build_params(overrides)
+        backtester = Backtester(params=params, exit_rules=ExitRules(**exit_overrides), **_worker_options)
+        metrics = backtester.run_precomputed(_worker_histories).metrics
+        return {'index': index, 'params': overrides, 'metrics': metrics}
+    except Exception as e:
+        return {'index': index, 'params': overrides, 'error': str(e)}
+
+
+class ParamSweep:
+    """Runs many backtests of the demo strategy in parallel and ranks them.
+
+    Indicators and market cycles do not depend on the swept thresholds, so
+    they are computed once here and published to the workers as shared
+    memory blocks; each worker maps them without copying through a pipe and
+    only re-evaluates the signal rules and the fill/exit simulation.
+    """
+
+    def __init__(self, candles: Dict[str, pd.DataFrame], workers: Optional[int] = None, **backtest_options):
+        self.logger = logging.getLogger("ParamSweep")
+        self.workers = workers or os.cpu_count() or 1
+        self.backtest_options = backtest_options
+        backtester = Backtester(**backtest_options)
+        self.histories = {symbol: backtester.precompute(frame) for symbol, frame in candles.items()
+                          if symbol in backtester.symbols and not frame.empty}
+        if not self.histories:
+            raise ValueError("No candles to sweep over")
+
+    def _share(self) -> Tuple[List[shared_memory.SharedMemory], dict]:
+        blocks, layout = [], {}
+        try:
+            for symbol, history in self.histories.items():
+                values = history[SHARED_COLUMNS[:-1]].to_numpy(dtype=np.float64)
+                codes = pd.Categorical(history['market_cycle'], categories=CYCLE_NAMES).codes
+                block = shared_memory.SharedMemory(create=True, size=values.nbytes + len(values) * 8)
+                blocks.append(block)
+                shared = np.ndarray((len(values), len(SHARED_COLUMNS)), dtype=np.float64, buffer=block.buf)
+                shared[:, :-1] = values
+                shared[:, -1] = codes
+                layout[symbol] = (block.name, shared.shape)
+        except Exception:
+            self._release(blocks)
+            raise
+        return blocks, layout
+
+    @staticmethod
+    def _release(blocks: List[shared_memory.SharedMemory]):
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+    def run(self, combos: List[dict], rank_by: str = 'sharpe', min_trades: int = 0) -> pd.DataFrame:
+        """Backtest every combination; returns one row per combination, best first"""
+        blocks, layout = self._share()
+        results = []
+        try:
+            with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                     initargs=(layout, self.backtest_options)) as pool:
+                futures = [pool.submit(_run_combo, index, combo) for index, combo in enumerate(combos)]
+                for done, future in enumerate(as_completed(futures), 1):
+                    result = future.result()
+                    if 'error' in result:
+                        self.logger.error(f"Combination {result['params']} failed: {result['error']}")
+                    else:
+                        results.append(result)
+                    if done % max(1, len(combos) // 10) == 0:
+                        self.logger.info(f"Finished {done}/{len(combos)} backtests")
+        finally:
+            self._release(blocks)
+
+        rows = [{'index': r['index'], **r['params'], **r['metrics']} for r in results]
+        table = pd.DataFrame(rows)
+        if table.empty:
+            return table
+        if min_trades:
+            table = table[table['closed_trades'] >= min_trades]
+        return table.sort_values(rank_by, ascending=False).reset_index(drop=True)
+
+    @staticmethod
+    def save_best(table: pd.DataFrame, combos: List[dict], path: str):
+        """Write the top combination in the format DemoKrakenBot loads from STRATEGY_PARAMS"""
+        params, exit_overrides = build_params(combos[int(table.iloc[0]['index'])])
+        with open(path, 'w') as f:
+            json.dump({'strategy': params.to_dict(), 'exit_rules': exit_overrides}, f, indent=2)
+
+
+def _parse_values(text: str) -> list:
+    return [json.loads(value) for value in text.split(',')]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep demo strategy parameters over stored candles")
+    parser.add_argument('--data-dir', default='candle_data')
+    parser.add_argument('--archive-dir', help="Candle archive directory (default: CANDLE_ARCHIVE_DIR or candle_archive)")
+    parser.add_argument('--interval', type=int, default=5)
+    parser.add_argument('--grid', action='append', default=[], metavar='NAME=V1,V2',
+                        help="Values to try, e.g. buy_threshold:SOLUSD=0.6,0.62 or take_profit_pct=0.015,0.02")
+    parser.add_argument('--range', action='append', default=[], metavar='NAME=LOW:HIGH',
+                        help="Uniform range for random search, e.g. stop_loss_pct=0.004:0.01")
+    parser.add_argument('--random', type=int, help="Sample this many random combinations instead of the full grid")
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--rank-by', default='sharpe')
+    parser.add_argument('--min-trades', type=int, default=0)
+    parser.add_argument('--top', type=int, default=10)
+    parser.add_argument('--output', help="Write the best parameters here for STRATEGY_PARAMS")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    space = {}
+    for spec in args.grid:
+        name, _, values = spec.partition('=')
+        space[name] = _parse_values(values)
+    for spec in args.range:
+        name, _, bounds = spec.partition('=')
+        low, high = bounds.split(':')
+        space[name] = (float(low), float(high))
+    if args.random:
+        combos = random_search(space, args.random, args.seed)
+    elif any(isinstance(values, tuple) for values in space.values()):
+        parser.error("--range requires --random")
+    else:
+        combos = grid(space)
+
+    candles = Backtester.load_candles(DEMO_ALLOCATIONS, args.data_dir, args.interval, args.archive_dir)
+    sweep = ParamSweep(candles, workers=args.workers, interval=args.interval)
+    table = sweep.run(combos, rank_by=args.rank_by, min_trades=args.min_trades)
+    print(table.head(args.top).to_string())
+    if args.output and not table.empty:
+        ParamSweep.save_best(table, combos, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+# backend/bot/position_triggers.py
+import heapq
+import logging
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime, timedelta
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple
+
+import pandas as pd
+
+
+class ExitRules:
+    """Exit thresholds for open positions.
+
+    The defaults are the demo bot's rules; the live bot passes its own take
+    profit, stop and trailing settings and disables the age-based exits.
+    Percentages of P&L are in percent, price distances are fractions.
+    """
+
+    def __init__(self, take_profit_pct: float = 0.018, stop_loss_pct: float = 0.006,
+                 trailing_stop_pct: float = 0.012,
+                 trailing_tiers: Sequence[Tuple[float, float]] = ((5.0, 0.02), (2.0, 0.015), (0.8, 0.01)),
+                 trailing_min_pnl: float = 0.8, max_drawdown: Optional[float] = 0.5,
+                 aged_after_hours: Optional[float] = 12, aged_stop_factor: float = 0.7,
+                 breakeven_min_pnl: float = 0.5, time_exit_hours: Optional[float] = 12,
+                 reversal_min_pnl: Optional[float] = 0.3):
+        self.take_profit_pct = take_profit_pct
+        self.stop_loss_pct = stop_loss_pct
+        self.trailing_stop_pct = trailing_stop_pct
+        self.trailing_tiers = sorted(trailing_tiers, reverse=True)
+        self.trailing_min_pnl = trailing_min_pnl
+        self.max_drawdown = max_drawdown
+        self.aged_after_hours = aged_after_hours
+        self.aged_stop_factor = aged_stop_factor
+        self.breakeven_min_pnl = breakeven_min_pnl
+        self.time_exit_hours = time_exit_hours
+        self.reversal_min_pnl = reversal_min_pnl
+
+    def trailing_pct(self, pnl_pct: float) -> float:
+        """Trailing distance for the current profit level; wider as profit grows"""
+        for min_pnl, pct in self.trailing_tiers:
+            if pnl_pct > min_pnl:
+                return pct
+        return self.trailing_stop_pct
+
+    def tightest_trailing_pct(self) -> float:
+        return min([self.trailing_stop_pct] + [pct for _, pct in self.trailing_tiers])
+
+
+def position_age_hours(position: dict, now: datetime) -> float:
+    return (now - position['entry_time']).total_seconds() / 3600
+
+
+def evaluate_exit(rules: ExitRules, position: dict, price: float, now: Optional[datetime] = None,
+                  reversal: bool = False) -> Optional[str]:
+    """Exit reason for a position at this price, or None to keep holding.
+
+    Checks run in the order the demo monitor always used: trend reversal,
+    take profit, stop loss (tightened with age), trailing stop, time exit and
+    maximum drawdown. `reversal` is the 5/10 MA crossover state of the symbol.
+    """
+    now = now or datetime.now()
+    entry_price = position['entry_price']
+    pnl_pct = (price - entry_price) / entry_price * 100
+    age = position_age_hours(position, now)
+    high_price = max(position['high_price'], price)
+
+    if reversal and rules.reversal_min_pnl is not None and pnl_pct > rules.reversal_min_pnl:
+        return 'trend_reversal'
+
+    if pnl_pct >= rules.take_profit_pct * 100:
+        return 'take_profit'
+
+    stop_loss_pct = rules.stop_loss_pct
+    if rules.aged_after_hours is not None and age > rules.aged_after_hours:
+        if pnl_pct > rules.breakeven_min_pnl:
+            stop_loss_pct = 0  # Move to breakeven
+        else:
+            stop_loss_pct = rules.stop_loss_pct * rules.aged_stop_factor
+    if pnl_pct <= -stop_loss_pct * 100:
+        return 'stop_loss'
+
+    if pnl_pct > rules.trailing_min_pnl:
+        if price < high_price * (1 - rules.trailing_pct(pnl_pct)):
+            return 'trailing_stop'
+
+    if rules.time_exit_hours is not None and age > rules.time_exit_hours and pnl_pct < 0:
+        return 'time_exit'
+
+    if rules.max_drawdown is not None and pnl_pct <= -rules.max_drawdown * 100:
+        return 'max_drawdown'
+
+    return None
+
+
+def trigger_levels(rules: ExitRules, position: dict, now: datetime,
+                   reversal: bool = False) -> Tuple[float, float]:
+    """Absolute (lower, upper) prices outside of which evaluate_exit must be consulted.
+
+    The band is conservative: inside it no rule can fire, outside it one may.
+    A new high also lies above the band, so the high price is kept current.
+    """
+    entry_price = position['entry_price']
+    high_price = position['high_price']
+    age = position_age_hours(position, now)
+
+    upper = [entry_price * (1 + rules.take_profit_pct), high_price]
+    if reversal and rules.reversal_min_pnl is not None:
+        upper.append(entry_price * (1 + rules.reversal_min_pnl / 100))
+
+    stop_loss_pct = rules.stop_loss_pct
+    if rules.aged_after_hours is not None and age > rules.aged_after_hours:
+        stop_loss_pct *= rules.aged_stop_factor
+    lower = [entry_price * (1 - stop_loss_pct)]
+    if rules.max_drawdown is not None:
+        lower.append(entry_price * (1 - rules.max_drawdown))
+    if rules.time_exit_hours is not None and age > rules.time_exit_hours:
+        lower.append(entry_price)
+
+    # The trailing stop can only fire between the activation price and the
+    # highest possible trailing level
+    trailing_level = high_price * (1 - rules.tightest_trailing_pct())
+    if trailing_level > entry_price * (1 + rules.trailing_min_pnl / 100):
+        lower.append(trailing_level)
+
+    return max(lower), min(upper)
+
+
+def ma_reversal(candles: pd.DataFrame, short_window: int = 5, medium_window: int = 10) -> bool:
+    """Whether the short close MA is below the medium one on the latest candle"""
+    if candles is None or len(candles) <= 20 or 'close' not in candles.columns:
+        return False
+    close = candles['close']
+    return bool(close.iloc[-short_window:].mean() < close.iloc[-medium_window:].mean())
+
+
+def ma_reversals(candles: pd.DataFrame, short_window: int = 5, medium_window: int = 10) -> pd.Series:
+    """ma_reversal evaluated on every candle of a history at once"""
+    close = candles['close']
+    reversal = close.rolling(short_window).mean() < close.rolling(medium_window).mean()
+    reversal.iloc[:20] = False
+    return reversal
+
+
+class _SymbolTriggers:
+    """Trigger prices of one symbol's positions in two sorted lists"""
+
+    def __init__(self):
+        self.lower: List[Tuple[float, int]] = []  # fire when price <= level
+        self.upper: List[Tuple[float, int]] = []  # fire when price >= level
+        self.levels: Dict[int, Tuple[float, float]] = {}
+
+    def add(self, slot: int, lower: float, upper: float):
+        self.levels[slot] = (lower, upper)
+        insort(self.lower, (lower, slot))
+        insort(self.upper, (upper, slot))
+
+    def remove(self, slot: int):
+        lower, upper = self.levels.pop(slot)
+        del self.lower[bisect_left(self.lower, (lower, slot))]
+        del self.upper[bisect_left(self.upper, (upper, slot))]
+
+    def crossed(self, price: float) -> List[int]:
+        """Positions whose band this price leaves, found by bisection"""
+        slots = [slot for _, slot in self.upper[:bisect_right(self.upper, (price, float('inf')))]]
+        slots += [slot for _, slot in self.lower[bisect_left(self.lower, (price, -1)):]]
+        return slots
+
+
+class PositionTriggerEngine:
+    """Evaluates exits only for positions whose trigger prices a tick crosses.
+
+    Each tracked position gets a conservative (lower, upper) price band from
+    trigger_levels, indexed per symbol in sorted lists. A price update finds
+    the crossed bands by bisection, runs evaluate_exit on just those positions
+    and re-indexes the ones that keep holding (e.g. after a new high). Rules
+    that change with time are re-indexed from a heap when they come due.
+    """
+
+    def __init__(self, rules: Optional[ExitRules] = None):
+        self.logger = logging.getLogger("PositionTriggerEngine")
+        self.rules = rules or ExitRules()
+        self.symbols: Dict[str, _SymbolTriggers] = {}
+        self.positions: Dict[int, Tuple[str, Hashable, dict]] = {}
+        self.slots: Dict[Tuple[str, Hashable], int] = {}
+        self.reversals: Dict[str, bool] = {}
+        self.timers: List[Tuple[datetime, int, int]] = []
+        self._next_slot = 0
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    def track(self, symbol: str, position: dict, key: Hashable = None, now: Optional[datetime] = None):
+        """Start watching a position; re-tracking the same position object is a no-op"""
+        key = symbol if key is None else key
+        slot = self.slots.get((symbol, key))
+        if slot is not None:
+            if self.positions[slot][2] is position:
+                return
+            self.untrack(symbol, key)
+
+        slot = self._next_slot
+        self._next_slot += 1
+        self.slots[(symbol, key)] = slot
+        self.positions[slot] = (symbol, key, position)
+        self._index(slot, now or datetime.now())
+
+        for hours in (self.rules.aged_after_hours, self.rules.time_exit_hours):
+            if hours is not None:
+                due = position['entry_time'] + timedelta(hours=hours, seconds=1)
+                heapq.heappush(self.timers, (due, slot, len(self.timers)))
+
+    def untrack(self, symbol: str, key: Hashable = None):
+        key = symbol if key is None else key
+        slot = self.slots.pop((symbol, key), None)
+        if slot is None:
+            return
+        self.positions.pop(slot, None)
+        self.symbols[symbol].remove(slot)
+
+    def sync(self, positions: Dict[str, dict], now: Optional[datetime] = None):
+        """Track exactly the given {symbol: position} mapping"""
+        for symbol, position in positions.items():
+            self.track(symbol, position, now=now)
+        for symbol, key in [k for k in self.slots if k[1] not in positions]:
+            self.untrack(symbol, key)
+
+    def set_reversal(self, symbol: str, active: bool, now: Optional[datetime] = None):
+        """Update the MA crossover state of a symbol and re-index its positions"""
+        if self.reversals.get(symbol, False) == active:
+            return
+        self.reversals[symbol] = active
+        triggers = self.symbols.get(symbol)
+        if triggers is not None:
+            for slot in list(triggers.levels):
+                self._reindex(slot, now or datetime.now())
+
+    def levels(self, symbol: str, key: Hashable = None) -> Optional[Tuple[float, float]]:
+        slot = self.slots.get((symbol, symbol if key is None else key))
+        return None if slot is None else self.symbols[symbol].levels[slot]
+
+    def _index(self, slot: int, now: datetime):
+        symbol, _, position = self.positions[slot]
+        lower, upper = trigger_levels(self.rules, position, now, self.reversals.get(symbol, False))
+        self.symbols.setdefault(symbol, _SymbolTriggers()).add(slot, lower, upper)
+
+    def _reindex(self, slot: int, now: datetime):
+        symbol = self.positions[slot][0]
+        self.symbols[symbol].remove(slot)
+        self._index(slot, now)
+
+    def _run_timers(self, now: datetime):
+        while self.timers and self.timers[0][0] <= now:
+            _, slot, _ = heapq.heappop(self.timers)
+            if slot in self.positions:
+                self._reindex(slot, now)
+
+    def on_price(self, symbol: str, price: float, now: Optional[datetime] = None) -> List[Tuple[Hashable, str]]:
+        """Feed one price tick; returns (key, reason) for every position that should exit"""
+        now = now or datetime.now()
+        self._run_timers(now)
+
+        triggers = self.symbols.get(symbol)
+        if triggers is None or not price or price <= 0:
+            return []
+
+        exits = []
+        reversal = self.reversals.get(symbol, False)
+        for slot in set(triggers.crossed(price)):
+            _, key, position = self.positions[slot]
+            reason = evaluate_exit(self.rules, position, price, now, reversal)
+            if reason is not None:
+                # The caller closes it; a failed close is picked up again by track/sync
+                exits.append((key, reason))
+                self.untrack(symbol, key)
+                continue
+            if price > position['high_price']:
+                position['high_price'] = price
+            self._reindex(slot, now)
+        return exits
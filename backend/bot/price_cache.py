@@ -0,0 +1,245 @@
+# backend/bot/price_cache.py
+import time
+import logging
+import threading
+from typing import Dict, Iterable, List, Optional
+
+
+def normalize_pair(key: str) -> str:
+    """Map Kraken's legacy result keys (XXRPZUSD, XXBTZUSD) back to the requested pair name"""
+    if len(key) == 8 and key[0] in 'XZ' and key[4] in 'XZ':
+        return key[1:4] + key[5:]
+    return key
+
+
+class TickerSnapshot:
+    """Last trade, best bid/ask and rolling 24h volume for one pair"""
+
+    __slots__ = ('symbol', 'last', 'bid', 'ask', 'volume_24h', 'updated')
+
+    def __init__(self, symbol: str, last: float, bid: Optional[float] = None,
+                 ask: Optional[float] = None, volume_24h: Optional[float] = None,
+                 updated: Optional[float] = None):
+        self.symbol = symbol
+        self.last = last
+        self.bid = bid
+        self.ask = ask
+        self.volume_24h = volume_24h
+        self.updated = time.monotonic() if updated is None else updated
+
+    @classmethod
+    def from_ticker(cls, symbol: str, ticker: dict, updated: Optional[float] = None) -> 'TickerSnapshot':
+        return cls(symbol,
+                   last=float(ticker['c'][0]),
+                   bid=float(ticker['b'][0]),
+                   ask=float(ticker['a'][0]),
+                   volume_24h=float(ticker['v'][1]),
+                   updated=updated)
+
+    @property
+    def mid(self) -> float:
+        if self.bid and self.ask:
+            return (self.bid + self.ask) / 2
+        return self.last
+
+    @property
+    def spread_pct(self) -> Optional[float]:
+        """Bid/ask spread relative to the mid price, if the quote is known"""
+        if not self.bid or not self.ask:
+            return None
+        return (self.ask - self.bid) / self.mid
+
+    def age(self) -> float:
+        return time.monotonic() - self.updated
+
+    def to_dict(self) -> dict:
+        return {
+            'symbol': self.symbol,
+            'last': self.last,
+            'bid': self.bid,
+            'ask': self.ask,
+            'volume_24h': self.volume_24h,
+            'spread_pct': self.spread_pct,
+            'age': round(self.age(), 3)
+        }
+
+
+class PriceCache:
+    """Process-wide ticker cache fed by batched Ticker requests.
+
+    Every bot registers its pairs; a refresh asks Kraken for last price,
+    bid/ask and 24h volume of all registered pairs in one Ticker call and
+    stores them as TickerSnapshots. Snapshots younger than ``max_age`` seconds are
+    served from memory, and concurrent readers that find the cache stale wait
+    for the single refresh already in flight instead of issuing their own, so
+    ticker traffic does not grow with the number of bots or call sites.
+    Kraken rejects a whole batch over one unknown pair, so such pairs are
+    found, dropped and not registered again.
+    """
+
+    def __init__(self, api=None, max_age: float = 5.0):
+        self.logger = logging.getLogger("PriceCache")
+        self.api = api
+        self.max_age = max_age
+        self.pairs = set()
+        self.unknown = set()
+        self.snapshots: Dict[str, TickerSnapshot] = {}
+        self.refreshes = 0
+        self.last_refresh = None
+        # A live streaming feed keeps its pairs current without REST refreshes
+        self.feed = None
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+
+    def register(self, symbols: Iterable[str]):
+        """Include these pairs in every batched refresh"""
+        with self._lock:
+            self.pairs.update(symbol for symbol in symbols if symbol not in self.unknown)
+
+    def _is_fresh(self, symbol: str, max_age: float) -> bool:
+        snapshot = self.snapshots.get(symbol)
+        if snapshot is None:
+            return False
+        if self.feed is not None and symbol in self.feed.symbols and self.feed.is_live():
+            return True
+        return snapshot.age() <= max_age
+
+    def peek(self, symbol: str) -> Optional[float]:
+        """Last known price regardless of age, without touching the exchange"""
+        snapshot = self.snapshots.get(symbol)
+        return snapshot.last if snapshot else None
+
+    def peek_spread(self, symbol: str) -> Optional[float]:
+        """Relative bid/ask spread of the cached quote regardless of age, without touching the exchange"""
+        snapshot = self.snapshots.get(symbol)
+        return snapshot.spread_pct if snapshot else None
+
+    def put(self, snapshot: TickerSnapshot):
+        """Store a snapshot pushed by a streaming feed"""
+        with self._lock:
+            self.snapshots[snapshot.symbol] = snapshot
+
+    def update(self, symbol: str, price: float):
+        """Record a price obtained elsewhere, e.g. from an OHLC fallback; the quote is unknown"""
+        with self._lock:
+            self.snapshots[symbol] = TickerSnapshot(symbol, price)
+
+    def get(self, symbol: str, max_age: Optional[float] = None) -> Optional[float]:
+        """Last price for symbol no older than max_age, refreshing the whole batch if needed"""
+        snapshot = self.snapshot(symbol, max_age)
+        return snapshot.last if snapshot else None
+
+    def spread(self, symbol: str, max_age: Optional[float] = None) -> Optional[float]:
+        """Relative bid/ask spread for symbol, or None if no fresh quote is available"""
+        snapshot = self.snapshot(symbol, max_age)
+        return snapshot.spread_pct if snapshot else None
+
+    def all_snapshots(self) -> Dict[str, TickerSnapshot]:
+        """Current snapshots of every cached pair, without refreshing"""
+        with self._lock:
+            return dict(self.snapshots)
+
+    def snapshot(self, symbol: str, max_age: Optional[float] = None) -> Optional[TickerSnapshot]:
+        """Snapshot for symbol no older than max_age, refreshing the whole batch if needed"""
+        max_age = self.max_age if max_age is None else max_age
+        if self._is_fresh(symbol, max_age):
+            return self.snapshots[symbol]
+
+        if symbol in self.unknown:
+            return None
+        if symbol not in self.pairs:
+            # A pair nobody asked for before was not part of the last batch
+            self.register([symbol])
+            self.refresh(max_age=max_age, force=True)
+        else:
+            self.refresh(max_age=max_age)
+
+        return self.snapshots.get(symbol) if self._is_fresh(symbol, max_age) else None
+
+    def refresh(self, max_age: Optional[float] = None, force: bool = False) -> bool:
+        """Fetch every registered pair in one Ticker request unless the cache is still fresh"""
+        max_age = self.max_age if max_age is None else max_age
+        with self._refresh_lock:
+            # Whoever held the lock before us may already have refreshed everything
+            with self._lock:
+                pairs = sorted(self.pairs)
+            if not pairs or self.api is None:
+                return False
+            # Pairs the batch did not price are not retried before the next interval
+            recently = self.last_refresh is not None and time.monotonic() - self.last_refresh <= max_age
+            if not force and (recently or all(self._is_fresh(pair, max_age) for pair in pairs)):
+                return True
+
+            self.last_refresh = time.monotonic()
+            response = self._query(pairs)
+            if response is not None and self._unknown_pair(response):
+                # One unknown pair fails the whole batch; drop it and ask again
+                pairs = self._drop_unknown(pairs)
+                response = self._query(pairs) if pairs else None
+            if response is None:
+                return False
+
+            if response.get('error'):
+                self.logger.warning(f"Ticker batch returned errors: {response['error']}")
+            result = response.get('result') or {}
+
+            requested = set(pairs)
+            now = time.monotonic()
+            with self._lock:
+                for key, ticker in result.items():
+                    pair = key if key in requested else normalize_pair(key)
+                    if pair not in requested:
+                        continue
+                    try:
+                        snapshot = TickerSnapshot.from_ticker(pair, ticker, now)
+                    except (KeyError, IndexError, TypeError, ValueError):
+                        continue
+                    if snapshot.last > 0:
+                        self.snapshots[pair] = snapshot
+            self.refreshes += 1
+            return bool(result)
+
+    def _query(self, pairs: List[str]) -> Optional[dict]:
+        try:
+            return self.api.query_public('Ticker', {'pair': ','.join(pairs)})
+        except Exception as e:
+            self.logger.error(f"Error fetching ticker batch: {str(e)}")
+            return None
+
+    @staticmethod
+    def _unknown_pair(response: dict) -> bool:
+        return any('Unknown asset pair' in str(error) for error in response.get('error') or [])
+
+    def _drop_unknown(self, pairs: List[str]) -> List[str]:
+        """Probe pairs one by one, those never priced first, and unregister the unknown ones"""
+        new = [pair for pair in pairs if pair not in self.snapshots]
+        known = [pair for pair in pairs if pair in self.snapshots]
+        unknown = set()
+        for candidates in (new, known):
+            for pair in candidates:
+                response = self._query([pair])
+                if response is not None and self._unknown_pair(response):
+                    unknown.add(pair)
+            if unknown:
+                break
+        if unknown:
+            self.logger.warning(f"Dropping unknown pairs from the ticker batch: {sorted(unknown)}")
+            with self._lock:
+                self.pairs -= unknown
+                self.unknown |= unknown
+        return [pair for pair in pairs if pair not in unknown]
+
+
+_shared_cache: Optional[PriceCache] = None
+_shared_lock = threading.Lock()
+
+
+def get_price_cache(api=None, max_age: float = 5.0) -> PriceCache:
+    """The process-wide price cache; the first API object handed in is used for refreshes"""
+    global _shared_cache
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = PriceCache(api, max_age)
+        elif _shared_cache.api is None and api is not None:
+            _shared_cache.api = api
+        return _shared_cache
@@ -0,0 +1,236 @@
+# backend/bot/rate_limiter.py
+import time
+import hashlib
+import asyncio
+import logging
+import functools
+import threading
+from typing import Dict, Optional
+
+
+class TokenBucket:
+    """Token bucket holding up to `capacity` tokens, refilled at `refill_rate` per second.
+
+    Callers reserve tokens up front and then sleep off any deficit, so waiters
+    are served in arrival order and the bucket can be shared between the event
+    loop and the exchange I/O threads.
+    """
+
+    def __init__(self, capacity: float, refill_rate: float):
+        self.logger = logging.getLogger("TokenBucket")
+        self.capacity = capacity
+        self.refill_rate = refill_rate
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.refill_rate)
+        self.updated = now
+
+    def available(self) -> float:
+        with self._lock:
+            self._refill()
+            return self.tokens
+
+    def reserve(self, cost: float = 1.0) -> float:
+        """Take `cost` tokens now, going into debt if needed; returns how long to wait"""
+        with self._lock:
+            self._refill()
+            self.tokens -= cost
+            return max(0.0, -self.tokens / self.refill_rate)
+
+    async def acquire(self, cost: float = 1.0) -> float:
+        """Wait until `cost` tokens are available and take them; returns the time waited"""
+        delay = self.reserve(cost)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return delay
+
+    def acquire_sync(self, cost: float = 1.0) -> float:
+        """Blocking variant of acquire for code running on worker threads"""
+        delay = self.reserve(cost)
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+    def penalize(self, seconds: float):
+        """Drain the bucket after the exchange reported the limit was exceeded"""
+        with self._lock:
+            self._refill()
+            self.tokens = min(self.tokens, 0.0) - seconds * self.refill_rate
+        self.logger.warning(f"Rate limit exceeded, pausing requests for about {seconds:.1f}s")
+
+
+class KrakenRateLimiter:
+    """Client-side model of Kraken's API rate counters.
+
+    Private calls add their endpoint cost to a counter that decays at a
+    tier-dependent rate and may not exceed the tier maximum. Kraken keeps that
+    counter per API key, so each key gets its own private bucket; the public
+    budget is per client IP and shared by the whole process. Both are modelled
+    as token buckets. Order
+    placement is limited by the matching engine rather than this counter, so
+    AddOrder/CancelOrder cost nothing here.
+
+    ``attach`` hooks a krakenex API object so every request made through it,
+    synchronous or not, is paced. The async exchange client acquires tokens on
+    the event loop instead and hands the request a credit, so the I/O thread
+    does not block waiting for the budget.
+    """
+
+    # tier: (maximum counter, decay per second)
+    PRIVATE_TIERS = {
+        'starter': (15, 0.33),
+        'intermediate': (20, 0.5),
+        'pro': (20, 1.0)
+    }
+    PRIVATE_COSTS = {
+        'Ledgers': 2,
+        'QueryLedgers': 2,
+        'TradesHistory': 2,
+        'AddOrder': 0,
+        'CancelOrder': 0,
+        'CancelAll': 0
+    }
+    PUBLIC_COSTS = {
+        'Time': 0,
+        'SystemStatus': 0
+    }
+
+    def __init__(self, tier: str = 'starter', public_burst: float = 3, public_rate: float = 1.0):
+        self.logger = logging.getLogger("KrakenRateLimiter")
+        if tier not in self.PRIVATE_TIERS:
+            self.logger.warning(f"Unknown Kraken API tier {tier}, using starter limits")
+            tier = 'starter'
+        self.tier = tier
+
+        self.public_bucket = TokenBucket(public_burst, public_rate)
+        self.private_buckets: Dict[str, TokenBucket] = {}
+        self.stats = {scope: {'calls': 0, 'tokens_used': 0.0, 'wait_time': 0.0, 'max_wait': 0.0}
+                      for scope in ('public', 'private')}
+        self.endpoint_calls: Dict[str, int] = {}
+        self._stats_lock = threading.Lock()
+        self._credits = threading.local()
+
+    def private_bucket(self, key: Optional[str] = None) -> TokenBucket:
+        """The private counter of one API key, created on first use"""
+        key = key or ''
+        with self._stats_lock:
+            bucket = self.private_buckets.get(key)
+            if bucket is None:
+                bucket = self.private_buckets[key] = TokenBucket(*self.PRIVATE_TIERS[self.tier])
+            return bucket
+
+    def bucket(self, scope: str, key: Optional[str] = None) -> TokenBucket:
+        return self.private_bucket(key) if scope == 'private' else self.public_bucket
+
+    def cost(self, scope: str, endpoint: str) -> float:
+        costs = self.PRIVATE_COSTS if scope == 'private' else self.PUBLIC_COSTS
+        return costs.get(endpoint, 1)
+
+    def _record(self, scope: str, endpoint: str, cost: float, waited: float):
+        with self._stats_lock:
+            stats = self.stats[scope]
+            stats['calls'] += 1
+            stats['tokens_used'] += cost
+            stats['wait_time'] += waited
+            stats['max_wait'] = max(stats['max_wait'], waited)
+            key = f"{scope}/{endpoint}"
+            self.endpoint_calls[key] = self.endpoint_calls.get(key, 0) + 1
+
+    async def acquire(self, scope: str, endpoint: str, key: Optional[str] = None) -> float:
+        """Wait for the budget of one call to `endpoint`; key selects the private counter"""
+        cost = self.cost(scope, endpoint)
+        waited = await self.bucket(scope, key).acquire(cost) if cost else 0.0
+        self._record(scope, endpoint, cost, waited)
+        return waited
+
+    def acquire_sync(self, scope: str, endpoint: str, key: Optional[str] = None) -> float:
+        """Blocking variant of acquire for requests made from worker threads"""
+        cost = self.cost(scope, endpoint)
+        waited = self.bucket(scope, key).acquire_sync(cost) if cost else 0.0
+        self._record(scope, endpoint, cost, waited)
+        return waited
+
+    def penalize(self, scope: str, seconds: float, key: Optional[str] = None):
+        """Back off every caller of `scope` (of one API key, if private) after Kraken rejected a request"""
+        self.bucket(scope, key).penalize(seconds)
+
+    def run_with_credit(self, scope: str, endpoint: str, fn, *args, **kwargs):
+        """Run fn with one already-paid call to `endpoint`, so the hooked API does not charge it again"""
+        key = (scope, endpoint)
+        credits = self._credit_map()
+        credits[key] = credits.get(key, 0) + 1
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            if credits.get(key, 0) > 0:
+                credits[key] -= 1
+
+    def _credit_map(self) -> dict:
+        credits = getattr(self._credits, 'map', None)
+        if credits is None:
+            credits = self._credits.map = {}
+        return credits
+
+    def _spend_credit(self, scope: str, endpoint: str) -> bool:
+        credits = self._credit_map()
+        if credits.get((scope, endpoint), 0) > 0:
+            credits[(scope, endpoint)] -= 1
+            return True
+        return False
+
+    def attach(self, api):
+        """Pace every query_public/query_private made through a krakenex API object"""
+        if getattr(api, '_rate_limiter', None) is self:
+            return api
+
+        def paced(scope, query):
+            @functools.wraps(query)
+            def wrapper(method, *args, **kwargs):
+                if not self._spend_credit(scope, method):
+                    # Read the key per call; krakenex may load it after construction
+                    self.acquire_sync(scope, method, getattr(api, 'key', None) if scope == 'private' else None)
+                return query(method, *args, **kwargs)
+            return wrapper
+
+        api.query_public = paced('public', api.query_public)
+        api.query_private = paced('private', api.query_private)
+        api._rate_limiter = self
+        return api
+
+    def metrics(self) -> dict:
+        """Tokens used, time spent waiting and remaining budget per scope"""
+        with self._stats_lock:
+            metrics = {scope: dict(stats) for scope, stats in self.stats.items()}
+            endpoints = dict(self.endpoint_calls)
+            private_buckets = dict(self.private_buckets)
+        for scope in metrics:
+            metrics[scope]['wait_time'] = round(metrics[scope]['wait_time'], 3)
+            metrics[scope]['max_wait'] = round(metrics[scope]['max_wait'], 3)
+        metrics['public']['available'] = round(self.public_bucket.available(), 3)
+        metrics['public']['capacity'] = self.public_bucket.capacity
+        # Keys are reported by fingerprint only
+        metrics['private']['capacity'] = self.PRIVATE_TIERS[self.tier][0]
+        metrics['private']['accounts'] = {
+            hashlib.sha256(key.encode()).hexdigest()[:8]: round(bucket.available(), 3)
+            for key, bucket in private_buckets.items()
+        }
+        metrics['tier'] = self.tier
+        metrics['endpoints'] = endpoints
+        return metrics
+
+
+_shared_limiter: Optional[KrakenRateLimiter] = None
+_shared_lock = threading.Lock()
+
+
+def get_rate_limiter(tier: str = 'starter') -> KrakenRateLimiter:
+    """The process-wide limiter; bots share the public budget and each API key's private one"""
+    global _shared_limiter
+    with _shared_lock:
+        if _shared_limiter is None:
+            _shared_limiter = KrakenRateLimiter(tier)
+        return _shared_limiter
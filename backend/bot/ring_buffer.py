@@ -0,0 +1,129 @@
+# backend/bot/ring_buffer.py
+import threading
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+EQUITY_FIELDS = [
+    ('timestamp', 'datetime64[us]'),
+    ('balance', 'f8'),
+    ('equity', 'f8')
+]
+TRADE_FIELDS = [
+    ('timestamp', 'datetime64[us]'),
+    ('symbol', 'O'),
+    ('type', 'O'),
+    ('price', 'f8'),
+    ('quantity', 'f8'),
+    ('value', 'f8'),
+    ('balance_after', 'f8'),
+    ('profit_loss', 'f8'),
+    ('pnl_percentage', 'f8'),
+    ('entry_price', 'f8')
+]
+
+
+class RingBuffer:
+    """Fixed-capacity history of records in a NumPy structured array.
+
+    Every record is written twice, at its slot and at slot + capacity, so the
+    newest n records are always one contiguous slice: ``tail`` returns a view
+    without copying, and appending is O(1) with the oldest record dropped once
+    the buffer is full. Indexing, slicing and iteration yield plain dicts, so
+    the buffer stands in for the lists of dicts it replaces. Fields an entry
+    does not have are stored as NaN, NaT or None and left out of its dict.
+    Appends and the copies handed out as dicts hold a lock, since the demo
+    ledger is written from several threads.
+    """
+
+    def __init__(self, capacity: int, fields: Sequence[Tuple[str, str]]):
+        if capacity < 1:
+            raise ValueError("capacity must be positive")
+        self.capacity = capacity
+        self.dtype = np.dtype(list(fields))
+        self._data = np.zeros(2 * capacity, dtype=self.dtype)
+        self._missing = tuple(self._missing_value(self.dtype[name]) for name in self.dtype.names)
+        self._count = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _missing_value(dtype: np.dtype):
+        if dtype.kind == 'M':
+            return np.datetime64('NaT')
+        if dtype.kind == 'f':
+            return np.nan
+        return None
+
+    def append(self, entry: dict):
+        """Add a record, overwriting the oldest one when full; keys outside the fields are ignored"""
+        row = tuple(entry.get(name, missing) for name, missing in zip(self.dtype.names, self._missing))
+        with self._lock:
+            slot = self._count % self.capacity
+            self._data[slot] = row
+            self._data[slot + self.capacity] = row
+            self._count += 1
+
+    def extend(self, entries: Iterable[dict]):
+        for entry in entries:
+            self.append(entry)
+
+    def clear(self):
+        with self._lock:
+            self._count = 0
+
+    def __len__(self) -> int:
+        return min(self._count, self.capacity)
+
+    def tail(self, n: Optional[int] = None) -> np.ndarray:
+        """View of the newest n records (all of them by default), oldest first.
+
+        Not a copy: later appends overwrite it, so concurrent readers should use records().
+        """
+        size = len(self)
+        n = size if n is None else max(0, min(n, size))
+        end = (self._count - 1) % self.capacity + self.capacity + 1 if size else 0
+        return self._data[end - n:end]
+
+    def records(self, n: Optional[int] = None) -> List[dict]:
+        """The newest n records as dicts, oldest first"""
+        with self._lock:
+            return self._to_dicts(self.tail(n))
+
+    def _to_dicts(self, rows: np.ndarray) -> List[dict]:
+        columns = [rows[name].tolist() for name in self.dtype.names]
+        return [
+            {name: value for name, value in zip(self.dtype.names, values) if not self._is_missing(value)}
+            for values in zip(*columns)
+        ]
+
+    @staticmethod
+    def _is_missing(value) -> bool:
+        return value is None or (isinstance(value, float) and value != value)
+
+    def __getitem__(self, index: Union[int, slice]):
+        with self._lock:
+            rows = self.tail()
+            if isinstance(index, slice):
+                return self._to_dicts(rows[index])
+            if not -len(rows) <= index < len(rows):
+                raise IndexError("ring buffer index out of range")
+            return self._to_dicts(rows[[index]])[0]
+
+    def __iter__(self) -> Iterator[dict]:
+        return iter(self.records())
+
+
+class EquityHistory(RingBuffer):
+    """Equity samples: timestamp, balance and equity"""
+
+    def __init__(self, capacity: int = 1000, entries: Iterable[dict] = ()):
+        super().__init__(capacity, EQUITY_FIELDS)
+        self.extend(entries)
+
+
+class TradeHistory(RingBuffer):
+    """Demo trades, including the P&L fields of sells"""
+
+    def __init__(self, capacity: int = 100, entries: Iterable[dict] = ()):
+        super().__init__(capacity, TRADE_FIELDS)
+        self.extend(entries)
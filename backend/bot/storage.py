@@ -0,0 +1,85 @@
+# backend/bot/storage.py
+import os
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional
+
+
+class SQLiteStorage:
+    """Pooled access to one SQLite database file, shared by every bot in the process.
+
+    Each thread gets one connection, opened on first use and kept for the
+    life of the process, so connection setup and the per-connection
+    prepared-statement cache stay off the hot path. The database runs in WAL
+    journal mode: readers no longer block the writer and the writer no longer
+    blocks readers, across threads and processes. With WAL, synchronous=NORMAL
+    only syncs at checkpoints; a power loss can drop the last commits but
+    cannot corrupt the file.
+    """
+
+    def __init__(self, path: str = 'crypto_trading.db', synchronous: str = 'NORMAL',
+                 busy_timeout: float = 5.0, cached_statements: int = 256):
+        self.logger = logging.getLogger("SQLiteStorage")
+        self.path = path
+        self.synchronous = synchronous
+        self.busy_timeout = busy_timeout
+        self.cached_statements = cached_statements
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+
+    def connection(self) -> sqlite3.Connection:
+        """This thread's connection to the database"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # Only this thread uses it; close() may run on another one
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout, check_same_thread=False,
+                                   cached_statements=self.cached_statements)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(f'PRAGMA synchronous={self.synchronous}')
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        """This thread's connection, committed on success and rolled back on error"""
+        conn = self.connection()
+        with conn:
+            yield conn
+
+    def execute(self, sql: str, params: Iterable = ()) -> int:
+        """Run one write statement in its own transaction; returns the affected row count"""
+        with self.transaction() as conn:
+            return conn.execute(sql, tuple(params)).rowcount
+
+    def executemany(self, sql: str, rows: Iterable) -> int:
+        with self.transaction() as conn:
+            return conn.executemany(sql, rows).rowcount
+
+    def query(self, sql: str, params: Iterable = ()) -> list:
+        return self.connection().execute(sql, tuple(params)).fetchall()
+
+    def close(self):
+        """Close every pooled connection, e.g. at shutdown"""
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+
+
+_shared_storages: Dict[str, SQLiteStorage] = {}
+_shared_lock = threading.Lock()
+
+
+def get_storage(path: str = 'crypto_trading.db', synchronous: Optional[str] = None) -> SQLiteStorage:
+    """The process-wide storage for a database file, so all bots share its connection pool"""
+    with _shared_lock:
+        key = os.path.abspath(path)
+        if key not in _shared_storages:
+            _shared_storages[key] = SQLiteStorage(path, synchronous or os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL'))
+        return _shared_storages[key]
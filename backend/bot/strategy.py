@@ -0,0 +1,330 @@
+# backend/bot/strategy.py
+import json
+import logging
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Trading pairs and allocations of the demo bot
+DEMO_ALLOCATIONS = {
+    "SOLUSD": 0.20,
+    "AVAXUSD": 0.20,
+    "XRPUSD": 0.20,
+    "XDGUSD": 0.15,
+    "SHIBUSD": 0.10,
+    "PEPEUSD": 0.15
+}
+
+# Per-coin tables of the demo signal rules
+
+VOLUME_THRESHOLDS = {
+    'SOLUSD': 0.5,    # More liquid coin, higher threshold
+    'AVAXUSD': 0.5,   # More liquid coin, higher threshold
+    'XRPUSD': 0.3,    # Medium liquidity, medium threshold
+    'XDGUSD': 0.1,    # Lower liquidity, lower threshold
+    'SHIBUSD': 0.01,  # Ultra-low threshold for SHIB
+    'PEPEUSD': 0.01   # Ultra-low threshold for PEPE
+}
+DEFAULT_VOLUME_THRESHOLD = 0.3
+
+# Market cycles each coin may be traded in
+FAVORABLE_MARKETS = {
+    'SOLUSD': ["bull_trend", "ranging", "breakout", "ranging_support", "low_volatility", "mixed"],
+    'AVAXUSD': ["bull_trend", "ranging", "breakout", "ranging_support", "low_volatility", "mixed"],
+    'XRPUSD': ["bull_trend", "ranging", "ranging_support", "breakout", "low_volatility"],
+    'XDGUSD': ["bull_trend", "breakout", "ranging_support"],
+    'SHIBUSD': ["bull_trend", "breakout"],
+    'PEPEUSD': ["bull_trend", "breakout"]
+}
+DEFAULT_FAVORABLE_MARKETS = ["bull_trend"]
+
+MAX_CONFIRMATIONS = 6
+REQUIRED_CONFIRMATIONS = {
+    'SOLUSD': 4,      # Lower risk, require 4/6 confirmations
+    'AVAXUSD': 4,     # Lower risk, require 4/6 confirmations
+    'XRPUSD': 4,      # Medium risk, require 4/6 confirmations
+    'XDGUSD': 5,      # Higher risk, require 5/6 confirmations
+    'SHIBUSD': 5,     # Very high risk, require 5/6 confirmations
+    'PEPEUSD': 5      # Extremely high risk, require 5/6 confirmations
+}
+DEFAULT_REQUIRED_CONFIRMATIONS = 5
+
+CONFIDENCE_BOOST = {
+    'SOLUSD': 0.17,    # Higher confidence in SOL
+    'AVAXUSD': 0.17,   # Higher confidence in AVAX
+    'XRPUSD': 0.16,    # Medium confidence in XRP
+    'XDGUSD': 0.15,    # Lower confidence in DOGE
+    'SHIBUSD': 0.14,   # Lower confidence in SHIB
+    'PEPEUSD': 0.14    # Lower confidence in PEPE
+}
+DEFAULT_CONFIDENCE_BOOST = 0.15
+
+BUY_THRESHOLDS = {
+    'SOLUSD': 0.62,    # Lower risk, lower threshold
+    'AVAXUSD': 0.62,   # Lower risk, lower threshold
+    'XRPUSD': 0.63,    # Medium risk, medium threshold
+    'XDGUSD': 0.64,    # Higher risk, higher threshold
+    'SHIBUSD': 0.65,   # Very high risk, very high threshold
+    'PEPEUSD': 0.65    # Extremely high risk, very high threshold
+}
+DEFAULT_BUY_THRESHOLD = 0.64
+SELL_THRESHOLD = 0.42  # Eager to take profits
+
+ORDER_REQUIREMENTS = {
+    'SOLUSD': {'min_vol': 0.1, 'min_price': 0.01, 'price_decimals': 4, 'vol_decimals': 8},
+    'AVAXUSD': {'min_vol': 0.1, 'min_price': 0.01, 'price_decimals': 4, 'vol_decimals': 8},
+    'XRPUSD': {'min_vol': 10.0, 'min_price': 0.00001, 'price_decimals': 5, 'vol_decimals': 8},
+    'XDGUSD': {'min_vol': 50.0, 'min_price': 0.00001, 'price_decimals': 6, 'vol_decimals': 8},
+    'SHIBUSD': {'min_vol': 50000.0, 'min_price': 0.000001, 'price_decimals': 8, 'vol_decimals': 8},
+    'PEPEUSD': {'min_vol': 50000.0, 'min_price': 0.000001, 'price_decimals': 8, 'vol_decimals': 8}
+}
+DEFAULT_ORDER_REQUIREMENTS = {'min_vol': 0.1, 'min_price': 0.01, 'price_decimals': 8, 'vol_decimals': 8}
+
+MARKET_CONDITIONS = {
+    'high_volatility': 0.05,
+    'low_liquidity': 1000,
+    'excessive_spread': 0.03
+}
+
+# Candles needed for the last row of the rule frames to equal a full-history
+# evaluation: the longest raw-column window is 30, plus the 50 row minimum.
+SIGNAL_LOOKBACK = 60
+MIN_CYCLE_HISTORY = 50
+INITIAL_CAPITAL = 100000.0
+
+
+class StrategyParams:
+    """Per-coin thresholds of the demo signal rules; the defaults are the tables above.
+
+    Overrides are set per coin or, without a symbol, for every coin at once,
+    so parameter sweeps and tuned settings never require editing the tables.
+    """
+
+    # Override name -> (table attribute, default for unknown coins)
+    FIELDS = {
+        'volume_threshold': ('volume_thresholds', DEFAULT_VOLUME_THRESHOLD),
+        'favorable_markets': ('favorable_markets', DEFAULT_FAVORABLE_MARKETS),
+        'required_confirmations': ('required_confirmations', DEFAULT_REQUIRED_CONFIRMATIONS),
+        'confidence_boost': ('confidence_boost', DEFAULT_CONFIDENCE_BOOST),
+        'buy_threshold': ('buy_thresholds', DEFAULT_BUY_THRESHOLD)
+    }
+
+    def __init__(self, volume_thresholds: Optional[dict] = None, favorable_markets: Optional[dict] = None,
+                 required_confirmations: Optional[dict] = None, confidence_boost: Optional[dict] = None,
+                 buy_thresholds: Optional[dict] = None, sell_threshold: float = SELL_THRESHOLD):
+        self.volume_thresholds = dict(VOLUME_THRESHOLDS if volume_thresholds is None else volume_thresholds)
+        self.favorable_markets = dict(FAVORABLE_MARKETS if favorable_markets is None else favorable_markets)
+        self.required_confirmations = dict(REQUIRED_CONFIRMATIONS if required_confirmations is None
+                                           else required_confirmations)
+        self.confidence_boost = dict(CONFIDENCE_BOOST if confidence_boost is None else confidence_boost)
+        self.buy_thresholds = dict(BUY_THRESHOLDS if buy_thresholds is None else buy_thresholds)
+        self.sell_threshold = sell_threshold
+
+    def get(self, name: str, symbol: str):
+        table, default = self.FIELDS[name]
+        return getattr(self, table).get(symbol, default)
+
+    def set(self, name: str, value, symbol: Optional[str] = None):
+        """Override one field for a coin, or for every known coin if symbol is None"""
+        if name == 'sell_threshold':
+            self.sell_threshold = value
+            return
+        table = getattr(self, self.FIELDS[name][0])
+        for coin in ([symbol] if symbol else set(table) | set(DEMO_ALLOCATIONS)):
+            table[coin] = value
+
+    def to_dict(self) -> dict:
+        data = {table: dict(getattr(self, table)) for table, _ in self.FIELDS.values()}
+        data['sell_threshold'] = self.sell_threshold
+        return data
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'StrategyParams':
+        return cls(**{key: value for key, value in data.items()
+                      if key == 'sell_threshold' or key in dict(cls.FIELDS.values())})
+
+
+def load_tuned_params(path: Optional[str]) -> Tuple[StrategyParams, dict]:
+    """Signal params and ExitRules overrides from a param_sweep JSON file; defaults if unset"""
+    if not path:
+        return StrategyParams(), {}
+    try:
+        with open(path) as f:
+            data = json.load(f)
+        return StrategyParams.from_dict(data.get('strategy', {})), dict(data.get('exit_rules', {}))
+    except Exception as e:
+        logging.getLogger("Strategy").error(f"Error loading strategy params from {path}: {str(e)}")
+        return StrategyParams(), {}
+
+
+def market_cycles(df: pd.DataFrame, min_history: int = MIN_CYCLE_HISTORY) -> pd.Series:
+    """Market cycle label of every row, as detect_market_cycle sees it on that candle.
+
+    Expects the sma_20/sma_50 indicator columns. Rows with fewer than
+    ``min_history`` candles behind them are "unknown".
+    """
+    close = df['close']
+    volume = df['volume']
+
+    # Price momentum over multiple timeframes
+    momentum_short = close.pct_change(5)
+    momentum_medium = close.pct_change(20)
+    volatility = close.pct_change().rolling(20).std()
+
+    # Volume trend over multiple timeframes
+    volume_trend_short = volume.rolling(5).mean() / volume.rolling(20).mean()
+
+    # Moving average relationships
+    ma_cross = df['sma_20'] / df['sma_50']
+
+    # Price breakouts
+    recent_high = df['high'].rolling(20).max()
+    recent_low = df['low'].rolling(20).min()
+    breakout_threshold = (recent_high - recent_low) * 0.03  # 3% of the range
+
+    ranging = ((momentum_medium.abs() < 0.015) & (volatility < 0.02) &
+               ((ma_cross - 1.0).abs() < 0.01))
+    conditions = [
+        ((momentum_short > 0.01) & (momentum_medium > 0.03) & (ma_cross > 1.01) &
+         (volume_trend_short > 1.1) & (close > df['sma_50']) & (volatility < 0.025)),
+        ((momentum_short < -0.01) & (momentum_medium < -0.03) & (ma_cross < 0.99) &
+         (volume_trend_short > 1.1) & (close < df['sma_50'])),
+        volatility > 0.03,
+        ranging & (close < df['sma_20']) & (close > df['sma_50']),  # Ranging near support
+        ranging,
+        (close > recent_high - breakout_threshold) & (volume_trend_short > 1.2)
+    ]
+    choices = ["bull_trend", "bear_trend", "high_volatility", "ranging_support", "ranging", "breakout"]
+    cycles = np.select([c.to_numpy() for c in conditions], choices, default="mixed").astype(object)
+    cycles[:min_history - 1] = "unknown"
+    return pd.Series(cycles, index=df.index, name='market_cycle')
+
+
+def signal_frame(df: pd.DataFrame, symbol: str, min_history: int = MIN_CYCLE_HISTORY,
+                 params: Optional[StrategyParams] = None,
+                 cycles: Optional[pd.Series] = None) -> pd.DataFrame:
+    """Demo buy/sell signal of every row of an indicator frame.
+
+    Columns: market_cycle, the six confirmation flags, confirmations,
+    volume_ok, market_ok, confidence and action. Rows with fewer than
+    ``min_history`` candles behind them hold. ``cycles`` may carry
+    precomputed market_cycles(df), which do not depend on the params.
+    """
+    params = params or StrategyParams()
+    volume_threshold = params.get('volume_threshold', symbol)
+    allowed_markets = params.get('favorable_markets', symbol)
+    required = params.get('required_confirmations', symbol)
+    boost = params.get('confidence_boost', symbol)
+    buy_threshold = params.get('buy_threshold', symbol)
+
+    close = df['close']
+    sma20 = df['sma_20']
+    sma50 = df['sma_50']
+    rsi = df['rsi']
+    macd = df['macd']
+    macd_signal = df['macd_signal']
+    volume_ratio = df['volume_ma_ratio']
+    bb_position = df['bb_position'].fillna(0) if 'bb_position' in df.columns else pd.Series(0.0, index=df.index)
+    trend_up = sma20 > sma50
+
+    out = pd.DataFrame(index=df.index)
+    out['market_cycle'] = market_cycles(df, min_history) if cycles is None else cycles
+    out['volume_ok'] = ~(volume_ratio < volume_threshold)
+    out['market_ok'] = out['market_cycle'].isin(allowed_markets)
+
+    # Confirmation chain
+    out['above_mas'] = (close > sma20) & (close > sma50)
+    out['rsi_ok'] = (rsi > 40) & (rsi < 65)
+    out['volume_confirmed'] = volume_ratio > volume_threshold
+    out['macd_bullish'] = macd > macd_signal
+    out['trend_bullish'] = trend_up
+    out['bb_ok'] = (bb_position > -0.4) & (bb_position < 0.4)
+    out['confirmations'] = out[['above_mas', 'rsi_ok', 'volume_confirmed', 'macd_bullish',
+                                'trend_bullish', 'bb_ok']].sum(axis=1)
+
+    buy_setup = (out['confirmations'] >= required) & trend_up
+    profit_taking = ((~trend_up & (macd < macd_signal)) |
+                     (rsi > 70) | (bb_position > 0.8))
+    confidence = np.select([buy_setup, profit_taking], [0.5 + boost, 0.35], default=0.5)
+    confidence = np.clip(confidence, 0.3, 0.7)
+
+    action = np.select([confidence > buy_threshold, confidence < params.sell_threshold], ['buy', 'sell'],
+                       default='hold').astype(object)
+    # Final safety checks: enough confirmations and not extremely overbought
+    action[(action == 'buy') & ((out['confirmations'] < required) | (rsi > 70)).to_numpy()] = 'hold'
+
+    # Filters that hold with neutral confidence before any rule is applied
+    filtered = (~out['volume_ok'] | ~out['market_ok']).to_numpy(copy=True)
+    filtered[:min_history - 1] = True
+    confidence[filtered] = 0.5
+    action[filtered] = 'hold'
+
+    out['confidence'] = confidence
+    out['action'] = action
+    return out
+
+
+def market_condition_frame(df: pd.DataFrame, conditions: Optional[dict] = None) -> pd.DataFrame:
+    """Volatility, liquidity and candle spread checks of every row; `tradable` combines them"""
+    conditions = conditions or MARKET_CONDITIONS
+    out = pd.DataFrame(index=df.index)
+    out['volatility'] = df['close'].pct_change().rolling(20).std()
+    out['spread'] = (df['high'] - df['low']) / df['low']
+    out['tradable'] = ~((out['volatility'] > conditions['high_volatility']) |
+                        (df['volume'] < conditions['low_liquidity']) |
+                        (out['spread'] > conditions['excessive_spread']))
+    return out
+
+
+def position_size(balance: float, equity: float, allocation: float, signal: dict,
+                  max_position_size: float, min_balance: float, min_position_value: float,
+                  initial_capital: float = INITIAL_CAPITAL,
+                  logger: Optional[logging.Logger] = None) -> float:
+    """Demo position size in USD for a signal, or 0 if no position should be taken"""
+    if balance < min_balance:
+        if logger:
+            logger.warning(f"Balance ${balance} below minimum ${min_balance}")
+        return 0
+
+    # Never risk more than 1% of account on any single trade
+    max_risk_amount = balance * 0.01
+
+    # Reduce position size when equity drops
+    equity_ratio = equity / initial_capital
+    if equity_ratio < 0.85:  # Lost 15% or more
+        size_multiplier = 0.3
+        if logger:
+            logger.warning(f"SIGNIFICANT DRAWDOWN: Scaling position to 30% of normal size")
+    elif equity_ratio < 0.95:  # Lost 5-15%
+        size_multiplier = 0.6
+        if logger:
+            logger.warning(f"MODERATE DRAWDOWN: Scaling position to 60% of normal size")
+    else:
+        size_multiplier = 1.0
+
+    # Half the standard allocation, capped at half the max position size
+    base_position_size = min(balance * allocation * 0.5, balance * (max_position_size * 0.5)) * size_multiplier
+
+    # Only increase size for very high confidence buys (above 0.65), by at most 30%
+    confidence_factor = 1.0
+    if 'confidence' in signal and signal['action'] == 'buy':
+        normalized_confidence = (signal['confidence'] - 0.65) * 10
+        if normalized_confidence > 0:
+            confidence_factor = 1.0 + (normalized_confidence * 0.3)
+            if logger:
+                logger.info(f"High conviction signal: Increasing size by {((confidence_factor-1)*100):.1f}%")
+
+    size = base_position_size * confidence_factor
+
+    # Hard cap at 1% account risk
+    if size > max_risk_amount:
+        size = max_risk_amount
+        if logger:
+            logger.info(f"Position size capped at max risk amount: ${size:.2f}")
+
+    if size < min_position_value:
+        if logger:
+            logger.warning(f"Position size ${size:.2f} below minimum ${min_position_value}")
+        return 0
+    return size
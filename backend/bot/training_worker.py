@@ -0,0 +1,36 @@
+# backend/bot/training_worker.py
+import asyncio
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+
+class TrainingWorker:
+    """Runs model fitting on a dedicated worker thread.
+
+    The event loop only awaits the result, so the API and the trading loop keep
+    running while RandomForest/Keras fitting happens. Jobs run one at a time;
+    callers build fresh model instances in the job and swap them in afterwards.
+    """
+
+    def __init__(self, name: str = 'model-training'):
+        self.logger = logging.getLogger("TrainingWorker")
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=name)
+        self.pending = 0
+
+    @property
+    def busy(self) -> bool:
+        return self.pending > 0
+
+    async def run(self, fn, *args, **kwargs):
+        """Run fn(*args, **kwargs) on the worker thread and await its result"""
+        loop = asyncio.get_running_loop()
+        self.pending += 1
+        try:
+            return await loop.run_in_executor(self.executor, functools.partial(fn, *args, **kwargs))
+        finally:
+            self.pending -= 1
+
+    def shutdown(self, wait: bool = False):
+        """Stop accepting jobs; running fits are left to finish unless wait is set"""
+        self.executor.shutdown(wait=wait, cancel_futures=True)
@@ -28,6 +28,7 @@ try:
     from bot.kraken_crypto_bot_ai import EnhancedKrakenCryptoBot
     from bot.demo_bot import DemoKrakenBot
     from bot.bot_manager import BotManager
+    from bot.rate_limiter import get_rate_limiter
     print("Successfully imported trading bots")
     BOT_AVAILABLE = True
 except ImportError as e:
@@ -36,6 +37,7 @@ except ImportError as e:
     BOT_AVAILABLE = False
     EnhancedKrakenCryptoBot = None
     DemoKrakenBot = None
+    get_rate_limiter = None
 
 app = FastAPI()
 
@@ -97,13 +99,16 @@ async def get_demo_status():
     """Get status of the demo bot"""
     try:
         if demo_bot and demo_bot.running:
-            metrics = demo_bot.get_portfolio_metrics() if hasattr(demo_bot, 'get_portfolio_metrics') else {
+            # Refresh prices off the event loop; the metrics and positions below
+            # read the ledger under its lock and return copies safe to serialize
+            await demo_bot.exchange.run_blocking(demo_bot.price_cache.refresh)
+            metrics = await demo_bot.exchange.run_blocking(demo_bot.get_portfolio_metrics) if hasattr(demo_bot, 'get_portfolio_metrics') else {
                 'current_equity': 100000.0,
                 'pnl': 0,
                 'pnl_percentage': 0
             }
             
-            positions = demo_bot.get_demo_positions() if hasattr(demo_bot, 'get_demo_positions') else []
+            positions = await demo_bot.exchange.run_blocking(demo_bot.get_demo_positions) if hasattr(demo_bot, 'get_demo_positions') else []
             
             return {
                 "status": "success",
@@ -111,10 +116,10 @@ async def get_demo_status():
                 "data": {
                     "status": "running",
                     "positions": positions,
-                    "balance": getattr(demo_bot, 'demo_balance', {"ZUSD": 100000.0}),
+                    "balance": metrics.get('balance', {"ZUSD": 100000.0}),
                     "metrics": metrics,
-                    "trades": getattr(demo_bot, 'trade_history', [])[-10:],
-                    "performanceHistory": getattr(demo_bot, 'portfolio_history', [])[-100:]
+                    "trades": demo_bot.trade_history.records(10),
+                    "performanceHistory": demo_bot.portfolio_history.records(100)
                 }
             }
         else:
@@ -230,7 +235,8 @@ async def health_check():
         "status": "healthy",
         "timestamp": datetime.now().isoformat(),
         "demo_bot": "running" if demo_bot and demo_bot.running else "stopped",
-        "live_bot": "running" if bot_manager.live_running else "stopped"
+        "live_bot": "running" if bot_manager.live_running else "stopped",
+        "rate_limits": get_rate_limiter().metrics() if get_rate_limiter else {}
     }
 
 if __name__ == "__main__":
@@ -0,0 +1,42 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+demo_bot = pytest.importorskip('bot.demo_bot')
+
+
+def test_restart_keeps_recovered_ledger(tmp_path, monkeypatch):
+    """A fill survives a new bot instance and its run() position setup"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('DEMO_JOURNAL', str(tmp_path / 'demo_journal.jsonl'))
+    monkeypatch.setattr(demo_bot.DemoKrakenBot, 'get_latest_price', lambda self, symbol: 150.0)
+
+    async def scenario():
+        bot = demo_bot.DemoKrakenBot()
+        trade = bot.execute_trade_demo('SOLUSD', {'action': 'buy', 'confidence': 0.7}, price=150.0)
+        assert trade is not None
+        balance = dict(bot.demo_balance)
+        position = dict(bot.demo_positions['SOLUSD'])
+        trades = len(bot.trade_history)
+        bot.shutdown()
+
+        restarted = demo_bot.DemoKrakenBot()
+        history = len(restarted.portfolio_history)
+        assert await restarted.initialize_position_tracking()
+        try:
+            assert restarted.demo_balance == balance
+            recovered = restarted.demo_positions['SOLUSD']
+            assert recovered['volume'] == pytest.approx(position['volume'])
+            assert recovered['entry_price'] == pytest.approx(position['entry_price'])
+            assert len(restarted.trade_history) == trades
+            assert len(restarted.portfolio_history) == history + 1
+            point = restarted.portfolio_history[-1]
+            assert point['equity'] == pytest.approx(balance['ZUSD'] + position['volume'] * 150.0)
+        finally:
+            restarted.shutdown()
+
+    asyncio.run(scenario())